@@ -1,18 +1,68 @@
 import re
+import sys
+import time
+import argparse
+import numpy as np
 import simulation
+import od_export
+import flight_operations
+
+path_options = {"export","checkpoint","resume"} #options whose arguments include a file path, these are passed on as typed rather than in lower case
 
 class Command_Line_Interface():
     #high level running of the CLI
-    def __init__(self): #create the command line interface
+    def __init__(self,simulation_settings : dict = None): #create the command line interface
+        self.simulation_settings = simulation_settings if simulation_settings is not None else {} #Simulation attributes to override before the network is set up
+        self.simulation : simulation.Simulation = None #set up by the first command which needs the network, then kept warm for every later command
+        self.airport_argument_indices : dict[str,int] = {} #airport index by the form a unique name is typed in at the command line, see get_airport_argument
+        self.batch_mode = False #commands come from a script, so nothing may prompt for input
         self.create_cli_options()
         
     def run(self):
         print("Welcome to Henry's Air Travel Simulator, a program for simulating the flow of aircraft traffic around the world")
         while True:
-            user_input = self.lower_case_input("Please enter a command to begin : ")
+            user_input = input("Please enter a command to begin : ")
             stop_program = self.parse_option_cli(user_input,self.base_cli_options)
             if stop_program:
                 break
+
+    #run every command in lines (eg an open script file or sys.stdin) against one warm simulation, as if each had been typed at the top level
+    #blank lines and lines starting with # are skipped, exit stops the batch without asking for confirmation
+    #a command which raises an error is reported with its line number and the batch carries on, keeping the simulation warm
+    #the latency of each command is printed after it if report_latency, and the latencies (s) of every command run are returned
+    def run_batch(self,lines,report_latency : bool = True) -> list[float]:
+        self.batch_mode = True
+        latencies : list[float] = []
+        num_failed = 0
+        for line_number,line in enumerate(lines,start=1):
+            user_input = line.strip()
+            if len(user_input)==0 or user_input.startswith("#"):
+                continue
+            start_time = time.perf_counter()
+            try:
+                stop_program = self.parse_option_cli(user_input,self.base_cli_options)
+            except Exception as error:
+                print("ERROR : line " + str(line_number) + " (" + user_input + ") failed : " + type(error).__name__ + " : " + str(error))
+                num_failed += 1
+                stop_program = False
+            latencies.append(time.perf_counter()-start_time)
+            if report_latency:
+                print("[" + str(len(latencies)) + "] " + user_input + " : " + format(latencies[-1]*1000,".3f") + " ms")
+            if stop_program:
+                break
+        if report_latency:
+            self.display_latency_summary(latencies,num_failed)
+        self.batch_mode = False
+        return latencies
+
+    #print the count, total and percentiles of command latencies (s), and how many of the commands failed
+    def display_latency_summary(self,latencies : list[float],num_failed : int = 0) -> None:
+        if len(latencies)==0:
+            print("no commands were run")
+            return
+        milliseconds = np.array(latencies)*1000
+        print(str(len(latencies)) + " commands in " + format(milliseconds.sum(),".3f") + " ms, mean = " + format(milliseconds.mean(),".3f") + " ms, median = " + format(np.median(milliseconds),".3f") +
+              " ms, 95th percentile = " + format(np.percentile(milliseconds,95),".3f") + " ms, max = " + format(milliseconds.max(),".3f") + " ms, failed = " + str(num_failed))
     
     #CLI OPTION FUNCTIONS - USE in RESPONSE TO USER INPUT
 
@@ -30,7 +80,16 @@ class Command_Line_Interface():
         "options" : self.base_options,
         "help" : self.base_help,
         "man" : self.base_help,
-        "manual" : self.base_help
+        "manual" : self.base_help,
+        "setup" : self.setup,
+        "airport" : self.airport,
+        "od" : self.od,
+        "nearest" : self.nearest,
+        "road_route" : self.road_route,
+        "export" : self.export,
+        "run" : self.run_operations,
+        "checkpoint" : self.checkpoint,
+        "resume" : self.resume
         }
     
     #parse input from the cli and see if it is valid
@@ -40,11 +99,13 @@ class Command_Line_Interface():
         if len(split_input)==0:
             key_word = ""
         else:
-            key_word = split_input[0]
+            key_word = split_input[0].lower()
         if len(split_input)==0:
             arguments = []
-        else:
+        elif key_word in path_options:
             arguments = split_input[1:]
+        else:
+            arguments = [argument.lower() for argument in split_input[1:]]
         if key_word in option_dict:
            stop_dialogue = option_dict[key_word](False,arguments) #execute the user input
         else:
@@ -66,6 +127,8 @@ class Command_Line_Interface():
         if help:
             print("Exit the program, will provide the option to save your work and confirm first")
             return False
+        elif self.batch_mode: #there is nobody to confirm
+            return self.hard_exit(False,[])
         else:
             user_input = self.lower_case_input("Do you wish to exit, enter y to confirm : ")
             if user_input=="y":
@@ -74,6 +137,164 @@ class Command_Line_Interface():
                 stop_program = False
             return stop_program
 
+    #NETWORK CLI OPTION FUNCTIONS, all share the warm simulation from get_simulation
+
+    #set up the network now rather than on the first command needing it, or again from the input files with "setup reload"
+    def setup(self,help,additional_prompt):
+        if help:
+            print("Set up the transport network, enter setup reload to load it again after the input files have changed")
+            return False
+        if "reload" in additional_prompt:
+            self.simulation = None
+        self.get_simulation()
+        print(len(self.simulation.network.airport_names)," airports loaded")
+        return False
+
+    #display the data of airports
+    def airport(self,help,additional_prompt):
+        if help:
+            print("Display the data of airports, eg airport 0 or airport sydney,nsw,australia (write spaces in names as _)")
+            return False
+        network = self.get_simulation().network
+        for word in additional_prompt:
+            index = self.get_airport_argument(word)
+            if index>=0:
+                network.display_airport_data(index)
+        return False
+
+    #display the distance, demand and road link between an origin and destination
+    def od(self,help,additional_prompt):
+        if help:
+            print("Display the great circle distance, travel demand and road links from an origin to a destination airport, eg od 0 1")
+            return False
+        if len(additional_prompt)!=2:
+            print("od needs an origin and a destination airport")
+            return False
+        network = self.get_simulation().network
+        origin = self.get_airport_argument(additional_prompt[0])
+        destination = self.get_airport_argument(additional_prompt[1])
+        if origin<0 or destination<0:
+            return False
+        record = network.query_od_pairs(origin,destination)[0]
+        print(simulation.unique_airport_name_to_str(network.airport_unique_names[origin])," to ",simulation.unique_airport_name_to_str(network.airport_unique_names[destination]),
+              " Distance = ",record["great_circle_distance"]," km Demand = ",record["demand"]," k pax/year Road = ",record["road"]," Road time = ",record["road_time"]," hrs")
+        return False
+
+    #display the airports closest to a point
+    def nearest(self,help,additional_prompt):
+        if help:
+            print("Display the k airports closest to a latitude and longitude (degrees), eg nearest -33.9 151.2 3, k is 1 if not given")
+            return False
+        if len(additional_prompt) not in (2,3):
+            print("nearest needs a latitude, a longitude and optionally a number of airports")
+            return False
+        try:
+            latitude = float(additional_prompt[0])
+            longitude = float(additional_prompt[1])
+            k = int(additional_prompt[2]) if len(additional_prompt)==3 else 1
+        except ValueError:
+            print(" ".join(additional_prompt)," is not a valid latitude, longitude and number of airports")
+            return False
+        network = self.get_simulation().network
+        indices,distances = network.get_nearest_airports(np.array([latitude]),np.array([longitude]),k)
+        for index,distance in zip(indices[0],distances[0]):
+            print(index," : ",simulation.unique_airport_name_to_str(network.airport_unique_names[index])," ",distance," km")
+        return False
+
+    #display the fastest road route between two airports
+    def road_route(self,help,additional_prompt):
+        if help:
+            print("Display the fastest road route between two airports, eg road_route 0 1")
+            return False
+        if len(additional_prompt)!=2:
+            print("road_route needs an origin and a destination airport")
+            return False
+        network = self.get_simulation().network
+        origin = self.get_airport_argument(additional_prompt[0])
+        destination = self.get_airport_argument(additional_prompt[1])
+        if origin<0 or destination<0:
+            return False
+        travel_time,travel_distance,roads = network.get_road_route(origin,destination)
+        if np.isinf(travel_time):
+            print("no road route exists between these airports")
+        else:
+            print("Time = ",travel_time," hrs Distance = ",travel_distance," km via ",len(roads)," roads")
+        return False
+
+    #write the origin-destination pairs of the network to disk
+    def export(self,help,additional_prompt):
+        if help:
+            print("Write every origin-destination pair with demand to a csv file or a folder of binary columns, eg export od.csv or export od_folder columns 0.5")
+            print("an optional minimum demand (k pax/year) drops the smaller pairs")
+            return False
+        if len(additional_prompt) not in (1,2,3):
+            print("export needs a path and optionally a format (csv or columns) and a minimum demand")
+            return False
+        file_format = additional_prompt[1].lower() if len(additional_prompt)>=2 else "csv"
+        if file_format not in od_export.od_export_formats:
+            print(file_format," is not one of ",od_export.od_export_formats)
+            return False
+        try:
+            min_demand = float(additional_prompt[2]) if len(additional_prompt)==3 else None
+        except ValueError:
+            print(additional_prompt[2]," is not a valid minimum demand")
+            return False
+        num_records = self.get_simulation().network.export_od_pairs(additional_prompt[0],file_format,min_demand)
+        print("wrote ",num_records," origin-destination pairs to ",additional_prompt[0])
+        return False
+
+    #advance the event simulation of flight operations
+    def run_operations(self,help,additional_prompt):
+        if help:
+            print("Advance the simulation of flights and ferry sailings by a number of hours, eg run 24, the fleet is put on the busiest airport pairs the first time")
+            return False
+        if len(additional_prompt)!=1:
+            print("run needs a number of hours")
+            return False
+        try:
+            duration = float(additional_prompt[0])
+        except ValueError:
+            print(additional_prompt[0]," is not a valid number of hours")
+            return False
+        operations = self.get_flight_operations()
+        start_time = time.perf_counter()
+        num_events = operations.run(duration)
+        seconds = time.perf_counter()-start_time
+        statistics = operations.get_statistics()
+        print("processed ",num_events," events in ",round(seconds,3)," s, now at ",statistics["time"]," hrs")
+        print("Flights = ",statistics["flights"]," Passengers carried = ",statistics["passengers_carried"]," Passengers waiting = ",round(statistics["passengers_waiting"])," Ferry sailings = ",statistics["ferry_sailings"])
+        return False
+
+    #save the event simulation of flight operations so it can be resumed later
+    def checkpoint(self,help,additional_prompt):
+        if help:
+            print("Save the simulation of flights and ferry sailings to a file, eg checkpoint ops.npz, continue it later with resume")
+            return False
+        if len(additional_prompt)!=1:
+            print("checkpoint needs a file path")
+            return False
+        operations = self.get_flight_operations()
+        operations.save(additional_prompt[0])
+        print("saved flight operations at ",operations.time/3600," hrs to ",additional_prompt[0])
+        return False
+
+    #continue the event simulation of flight operations from a saved checkpoint
+    def resume(self,help,additional_prompt):
+        if help:
+            print("Continue the simulation of flights and ferry sailings from a file written by checkpoint, eg resume ops.npz")
+            return False
+        if len(additional_prompt)!=1:
+            print("resume needs a file path")
+            return False
+        simulation = self.get_simulation()
+        try:
+            simulation.load_flight_operations(additional_prompt[0])
+        except (OSError,ValueError) as error:
+            print("could not resume from ",additional_prompt[0]," : ",error)
+            return False
+        print("resumed flight operations at ",simulation.flight_operations.time/3600," hrs")
+        return False
+
     #immediately exit the program
     def hard_exit(self,help,additional_prompt):
         if help:
@@ -85,6 +306,34 @@ class Command_Line_Interface():
 
     #HELPER FUNCTIONS, can be used anywhere in the CLI
 
+    #the simulation with its network set up, created on the first call and reused by every later one
+    def get_simulation(self) -> simulation.Simulation:
+        if self.simulation is None:
+            self.simulation = simulation.Simulation()
+            for name,value in self.simulation_settings.items():
+                setattr(self.simulation,name,value)
+            self.simulation.setup_transport_network()
+            network = self.simulation.network
+            self.airport_argument_indices = {simulation.unique_airport_name_to_str(unique_name).lower().replace(" ","_"):index for unique_name,index in network.airport_name_indices_dict.items()}
+        return self.simulation
+
+    #the event simulation of flight operations, started on first use
+    def get_flight_operations(self) -> flight_operations.Flight_Operations:
+        simulation = self.get_simulation()
+        if simulation.flight_operations is None:
+            simulation.setup_flight_operations()
+        return simulation.flight_operations
+
+    #index of an airport typed at the command line, either its index or its unique name as name,state,country in lower case with spaces written as _, -1 if there is no such airport
+    def get_airport_argument(self,word : str) -> int:
+        num_airports = len(self.get_simulation().network.airport_names)
+        if word.isdigit() and int(word)<num_airports:
+            return int(word)
+        index = self.airport_argument_indices.get(word,-1)
+        if index<0:
+            print(word," is not a valid airport, enter an index or name,state,country with spaces written as _")
+        return index
+
     #get user input to a selected prompt in lowercase format
     def lower_case_input(self,prompt):
         user_input = input(prompt)
@@ -119,7 +368,21 @@ class Command_Line_Interface():
                     print(word, " is not a valid option. To see a list of valid options, enter options")
             return False
 
+def main(arguments : list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Henry's Air Travel Simulator")
+    parser.add_argument("--batch",default=None,help="file of commands to run one per line against a single warm simulation, - reads them from stdin")
+    parser.add_argument("--no-latency",action="store_true",help="do not print the latency of each batch command")
+    parser.add_argument("--lazy",action="store_true",help="compute each N x N network matrix only when a command first needs it")
+    arguments = parser.parse_args(arguments)
+    CLI = Command_Line_Interface({"lazy_setup":arguments.lazy})
+    if arguments.batch is None:
+        CLI.run()
+    elif arguments.batch=="-":
+        CLI.run_batch(sys.stdin,not arguments.no_latency)
+    else:
+        with open(arguments.batch) as file:
+            CLI.run_batch(file,not arguments.no_latency)
+
 if __name__ == "__main__":
-    CLI = Command_Line_Interface()
-    CLI.run()
+    main()
 
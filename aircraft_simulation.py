@@ -1,6 +1,9 @@
 import math
 import numpy as np
-import matplotlib.pyplot as plt
+#other project files
+import lazy_import
+
+plt = lazy_import.Lazy_Module("matplotlib.pyplot") #only needed by the plotting functions
 #calculate technical parameters of aircraft flight
 
 #constants
@@ -11,29 +14,40 @@ g = 9.807#for atmosphere calculations we are just going to assume g is a constan
 B787_structure_statistics = [129000,377,57,5.8,0.012,40,13,1.3,20,3]
 #engine_statistics = [fuel_energy,intake_efficiency,turbine_efficiency,air_fuel_ratio,bypass_ratio,max_thrust,max_thrust_density]
 B787_engine_statistics = [43,0.95,0.45,35,9,320,1.2]
+newtons_per_thrust_unit = 1000#the max_thrust figures above are per engine in kN (the B787's GEnx-1B is rated ~320kN), used when thrust has to be combined with forces in N
 #also note B787, max_fuel = 101'000kg, max_passenger = 400, mtow = 255'000kg
+B787_max_fuel_mass = 101000#kg
+B787_max_takeoff_mass = 255000#kg
+#atmospheric model constants
+#Based off calculations  found here https://en.wikipedia.org/wiki/Barometric_formula#Density_equations
+molar_mass_air = 0.02896#molar mass of earths air, kg/mol
+R = 8.314;#the universal gas constant.
+atmosphere_max_altitudes = [11000,20000,32000,47000,51000,71000,86000]#maximum altitude in atmospheric layers
+atmosphere_temperature_lapse_rates = [-0.0065,0,0.001,0.0028,0,-0.0028,-0.002]#temperature lapse rate in that layer, K/m
+atmosphere_base_density = [1.225,0.36391,0.08803,0.01322,0.00143,0.00086,0.000064]#base density at bottom of each layer, kg/m^3
+atmosphere_base_temperature = [288.15,216.65,216.65,228.65,270.65,270.65,214.65]#temperature at the bottom of each layer, kelvin
+atmosphere_base_altitudes = [0]+atmosphere_max_altitudes[:-1]#altitude at the bottom of each layer
+#the same constants as arrays, with an extra "space" layer above the last one where air density is 0
+atmosphere_max_altitudes_np = np.array(atmosphere_max_altitudes,dtype=float)
+atmosphere_lapse_rates_np = np.array(atmosphere_temperature_lapse_rates+[0],dtype=float)
+atmosphere_base_density_np = np.array(atmosphere_base_density+[0],dtype=float)
+atmosphere_base_temperature_np = np.array(atmosphere_base_temperature+[atmosphere_base_temperature[-1]+atmosphere_temperature_lapse_rates[-1]*(atmosphere_max_altitudes[-1]-atmosphere_base_altitudes[-1])],dtype=float)
+atmosphere_base_altitudes_np = np.array(atmosphere_base_altitudes+[atmosphere_max_altitudes[-1]],dtype=float)
+atmosphere_density_exponents_np = np.array([(1 + ((g*molar_mass_air)/(R*lapse_rate))) if lapse_rate!=0 else 0 for lapse_rate in atmosphere_temperature_lapse_rates+[0]],dtype=float)#density exponent in layers with a temperature lapse
+
 #calculates the air density at specific latitudes 
 #Based off calculations  found here https://en.wikipedia.org/wiki/Barometric_formula#Density_equations
 #translated from an equivalent MATLAB calculator I built for my AMME2500 Assignment 3
 def calculate_air_density(altitude : float) -> float:
-    molar_mass_air = 0.02896#molar mass of earths air, kg/mol
-    R = 8.314;#the universal gas constant.
-    max_altitudes = [11000,20000,32000,47000,51000,71000,86000]#maximum altitude in atmospheric layers
-    temperature_lapse_rates = [-0.0065,0,0.001,0.0028,0,-0.0028,-0.002]#temperature lapse rate in that layer, K/m
-    base_density = [1.225,0.36391,0.08803,0.01322,0.00143,0.00086,0.000064]#base density at bottom of each layer, kg/m^3
-    base_temperature = [288.15,216.65,216.65,228.65,270.65,270.65,214.65]#temperature at the bottom of each layer, kelvin
-    num_layers = len(max_altitudes)#number of layers in our atmospheric model
+    num_layers = len(atmosphere_max_altitudes)#number of layers in our atmospheric model
     current_layer = 0#current layer of the atmosphere we are testing
     while current_layer<num_layers:#go through all layers of the atmosphere till we find the correct layer
-        if altitude<max_altitudes[current_layer]:#if we are within the current layer, calculate stuff
-            base_density = base_density[current_layer]#extract base data for current layer
-            base_temperature = base_temperature[current_layer]
-            local_lapse_rate = temperature_lapse_rates[current_layer]
+        if altitude<atmosphere_max_altitudes[current_layer]:#if we are within the current layer, calculate stuff
+            base_density = atmosphere_base_density[current_layer]#extract base data for current layer
+            base_temperature = atmosphere_base_temperature[current_layer]
+            local_lapse_rate = atmosphere_temperature_lapse_rates[current_layer]
             #determine the base altitude of the current layer
-            if current_layer==0:
-                base_altitude = 0
-            else:
-                base_altitude = max_altitudes[current_layer-1];
+            base_altitude = atmosphere_base_altitudes[current_layer]
             if local_lapse_rate==0:#if no temperature lapse, use below equation
                 exponent = (-g*molar_mass_air*(altitude-base_altitude)/(R*base_temperature))
                 air_density = base_density*math.exp(exponent)
@@ -51,6 +65,51 @@ def calculate_air_density(altitude : float) -> float:
     air_density = 0
     return air_density
 
+#find the atmospheric layer of every altitude in an array, layer len(atmosphere_max_altitudes) is space
+def get_atmosphere_layers(altitudes : np.ndarray) -> np.ndarray:
+    return np.searchsorted(atmosphere_max_altitudes_np,altitudes,side='right')
+
+#calculates the air density (kg/m^3) for an array of altitudes (m) at once, giving the same results as calculate_air_density
+def calculate_air_density_array(altitudes : np.ndarray) -> np.ndarray:
+    altitudes = np.asarray(altitudes,dtype=float)
+    layers = get_atmosphere_layers(altitudes)
+    base_density = atmosphere_base_density_np[layers]
+    base_temperature = atmosphere_base_temperature_np[layers]
+    local_lapse_rate = atmosphere_lapse_rates_np[layers]
+    height_in_layer = altitudes-atmosphere_base_altitudes_np[layers]
+    isothermal = local_lapse_rate==0
+    #isothermal layers (and space, which has 0 base density) use the exponential equation, the rest the power law
+    safe_lapse_rate = np.where(isothermal,1,local_lapse_rate)
+    exponential_density = base_density*np.exp(-g*molar_mass_air*np.where(isothermal,height_in_layer,0)/(R*base_temperature))
+    temperature_ratio = (base_temperature/(base_temperature+safe_lapse_rate*height_in_layer))
+    power_density = base_density*(np.where(isothermal,1,temperature_ratio)**atmosphere_density_exponents_np[layers])
+    air_density = np.where(isothermal,exponential_density,power_density)
+    return air_density
+
+#calculates the air temperature (K) for an array of altitudes (m), above the top of the model the temperature at the top is returned
+def calculate_air_temperature_array(altitudes : np.ndarray) -> np.ndarray:
+    altitudes = np.asarray(altitudes,dtype=float)
+    layers = get_atmosphere_layers(altitudes)
+    temperature = atmosphere_base_temperature_np[layers]+atmosphere_lapse_rates_np[layers]*(altitudes-atmosphere_base_altitudes_np[layers])
+    return temperature
+
+#precomputed density and temperature on a fine altitude grid, interpolated linearly for the hottest paths where exact layer equations are not needed
+#grid points land on every layer boundary (all multiples of 1000m) as long as the step divides 1000
+class Atmosphere_Table():
+    def __init__(self,step : float = 10,max_altitude : float = atmosphere_max_altitudes[-1]):
+        self.step = step #altitude between table entries, m
+        self.altitudes = np.arange(0,max_altitude+step,step,dtype=float)
+        self.densities = calculate_air_density_array(self.altitudes)
+        self.temperatures = calculate_air_temperature_array(self.altitudes)
+
+    #interpolated air density for an array of altitudes, 0 above the top of the table, sea level density below 0m
+    def get_density(self,altitudes : np.ndarray) -> np.ndarray:
+        return np.interp(altitudes,self.altitudes,self.densities,right=0)
+
+    #interpolated air temperature for an array of altitudes
+    def get_temperature(self,altitudes : np.ndarray) -> np.ndarray:
+        return np.interp(altitudes,self.altitudes,self.temperatures)
+
     #velocity angle of the plane, function only valid for positive x_velocity
 
 def calculate_velocity_angle(x_velocity : float,y_velocity : float) -> tuple[float,float]:
@@ -149,18 +208,70 @@ class Structure():
         parasitic_drag = air_density*self.wing_area*(airspeed**2)*0.5*self.zero_lift_cd
         return parasitic_drag
     
+    #array version of calculate_lift_coefficient_at_effective_angle_of_attack, evaluating every angle at once with masked piecewise regions
+    #post stall angles (between the critical angle and twice it) are mirrored back about the critical angle instead of recursing, beyond that lift is 0
+    def calculate_lift_coefficient_at_effective_angle_of_attack_array(self,effective_angle_of_attack : np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+        effective_angle_of_attack = np.asarray(effective_angle_of_attack,dtype=float)
+        angle_abs = np.abs(effective_angle_of_attack)
+        post_stall = (angle_abs > self.critical_angle) & (angle_abs < self.critical_angle*2)
+        beyond_stall = angle_abs >= self.critical_angle*2
+        stall = post_stall | beyond_stall
+        angle_abs = np.where(post_stall,(self.critical_angle*2)-angle_abs,angle_abs)
+        #above the linear region lift keeps growing, but more slowly, until the critical angle
+        this_additional_lift_angle = angle_abs-self.max_linear_angle_of_attack
+        additional_lift_fraction = this_additional_lift_angle/self.additional_lift_angle
+        additional_lift_coefficient = this_additional_lift_angle*((1+(1-additional_lift_fraction))/2)*self.linear_lift_coefficient
+        lift_coefficient_abs = np.where(angle_abs <= self.max_linear_angle_of_attack,self.linear_lift_coefficient*angle_abs,additional_lift_coefficient + self.max_linear_lift_coefficient)
+        lift_coefficient = np.where(effective_angle_of_attack<0,-lift_coefficient_abs,lift_coefficient_abs)
+        lift_coefficient = np.where(beyond_stall,0.0,lift_coefficient)
+        return lift_coefficient,stall
+
+    #array version of calculate_lift_coefficient_at_angle_of_attack, also returning the stall flags
+    def calculate_lift_coefficient_at_angle_of_attack_array(self,angle_of_attack : np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+        effective_angle_of_attack = np.asarray(angle_of_attack,dtype=float) + self.angle_of_incidence
+        return self.calculate_lift_coefficient_at_effective_angle_of_attack_array(effective_angle_of_attack)
+
+    #array version of calculate_lift, airspeed, angle of attack and air density are broadcast against each other, so eg (A,1,1),(1,V,1),(1,1,D) arrays give an (A,V,D) grid
+    def calculate_lift_array(self,airspeed : np.ndarray,angle_of_attack : np.ndarray,air_density : np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+        lift_coefficient,stall = self.calculate_lift_coefficient_at_angle_of_attack_array(angle_of_attack)
+        lift = air_density*lift_coefficient*self.wing_area*(np.asarray(airspeed)**2)*0.5
+        return lift,stall
+
+    #array version of calculate_induced_wing_drag
+    def calculate_induced_wing_drag_array(self,airspeed : np.ndarray,angle_of_attack : np.ndarray,air_density : np.ndarray) -> np.ndarray:
+        induced_wing_drag_coefficient = self.calculate_induced_wing_drag_coefficient_at_angle_of_attack(np.asarray(angle_of_attack,dtype=float))
+        induced_wing_drag = air_density*induced_wing_drag_coefficient*self.wing_area*(np.asarray(airspeed)**2)*0.5
+        return induced_wing_drag
+
+    #array version of calculate_fuselage_drag
+    def calculate_fuselage_drag_array(self,airspeed : np.ndarray,angle_of_attack : np.ndarray,air_density : np.ndarray) -> np.ndarray:
+        induced_fuselage_drag_coefficient = self.calculate_induced_fuselage_drag_coefficient_at_angle_of_attack(np.asarray(angle_of_attack,dtype=float))
+        fuselage_drag = air_density*self.fuselage_area*induced_fuselage_drag_coefficient*(np.asarray(airspeed)**2)*0.5
+        return fuselage_drag
+
+    #array version of calculate_parasitic_drag
+    def calculate_parasitic_drag_array(self,airspeed : np.ndarray,air_density : np.ndarray) -> np.ndarray:
+        parasitic_drag = air_density*self.wing_area*(np.asarray(airspeed)**2)*0.5*self.zero_lift_cd
+        return parasitic_drag
+
+    #lift, each component of drag and the stall flags over the full grid of angle of attack x airspeed x air density, each output has shape (angles,airspeeds,densities)
+    def calculate_lift_and_drag_grid(self,angles_of_attack : np.ndarray,airspeeds : np.ndarray,air_densities : np.ndarray) -> tuple[np.ndarray,np.ndarray,np.ndarray,np.ndarray,np.ndarray]:
+        angles_of_attack = np.asarray(angles_of_attack,dtype=float).reshape(-1,1,1)
+        airspeeds = np.asarray(airspeeds,dtype=float).reshape(1,-1,1)
+        air_densities = np.asarray(air_densities,dtype=float).reshape(1,1,-1)
+        grid_shape = (angles_of_attack.shape[0],airspeeds.shape[1],air_densities.shape[2])
+        lift,stall = self.calculate_lift_array(airspeeds,angles_of_attack,air_densities)
+        lift_induced_wing_drag = self.calculate_induced_wing_drag_array(airspeeds,angles_of_attack,air_densities)
+        lift_induced_fuselage_drag = self.calculate_fuselage_drag_array(airspeeds,angles_of_attack,air_densities)
+        parasitic_drag = self.calculate_parasitic_drag_array(airspeeds,air_densities)
+        return np.broadcast_to(lift,grid_shape),np.broadcast_to(lift_induced_wing_drag,grid_shape),np.broadcast_to(lift_induced_fuselage_drag,grid_shape),np.broadcast_to(parasitic_drag,grid_shape),np.broadcast_to(stall,grid_shape)
+
     #plots lift coefficient by angle of attack
     def plot_lift_coefficient(self,start_angle : float,end_angle : float,increment : float) -> float:
-        angles = np.arange(start_angle,end_angle+increment,increment)
-        angles_degrees = list(angles)
-        angles : list[float] = list(np.radians(angles))
-        lift_coefficients : list[float] = []
-        for angle in angles:
-            lift_coefficient = self.calculate_lift_coefficient_at_angle_of_attack(angle)
-            lift_coefficients.append(lift_coefficient)
+        angles_degrees = np.arange(start_angle,end_angle+increment,increment)
+        angles = np.radians(angles_degrees)
+        lift_coefficients,stall = self.calculate_lift_coefficient_at_angle_of_attack_array(angles)
         #now plot
-        #print(angles_degrees)
-        #print(lift_coefficients)
         plt.figure(1)
         plt.plot(angles_degrees,lift_coefficients)
         plt.xlabel('Angle (degrees)')
@@ -169,26 +280,15 @@ class Structure():
     
     #plots lift and the components of drag by angle of attack
     def plot_lift_and_drag(self,airspeed : float,altitude : float,start_angle : float,end_angle : float,increment : float):
-        angles = np.arange(start_angle,end_angle+increment,increment)
-        angles_degrees = list(angles)
-        angles : list[float] = list(np.radians(angles))
-        lifts : list[float] = [] 
-        lift_induced_wing_drags : list[float] = []
-        lift_induced_fuselage_drags : list[float] = []
-        parasitic_drags : list[float] = []
-        lift_to_drags : list[float] = []
+        angles_degrees = np.arange(start_angle,end_angle+increment,increment)
+        angles = np.radians(angles_degrees)
         air_density = calculate_air_density(altitude)
-        for angle in angles:
-            lift = self.calculate_lift(airspeed,angle,air_density)
-            lift_induced_wing_drag = self.calculate_induced_wing_drag(airspeed,angle,air_density)
-            lift_induced_fuselage_drag = self.calculate_fuselage_drag(airspeed,angle,air_density)
-            parasitic_drag = self.calculate_parasitic_drag(airspeed,air_density)
-            lift_to_drag = lift/(parasitic_drag+lift_induced_wing_drag+lift_induced_fuselage_drag)
-            lifts.append(lift)
-            lift_induced_wing_drags.append(lift_induced_wing_drag)
-            lift_induced_fuselage_drags.append(lift_induced_fuselage_drag)
-            parasitic_drags.append(parasitic_drag)
-            lift_to_drags.append(lift_to_drag)
+        lifts,lift_induced_wing_drags,lift_induced_fuselage_drags,parasitic_drags,stall = self.calculate_lift_and_drag_grid(angles,[airspeed],[air_density])
+        lifts = lifts[:,0,0]
+        lift_induced_wing_drags = lift_induced_wing_drags[:,0,0]
+        lift_induced_fuselage_drags = lift_induced_fuselage_drags[:,0,0]
+        parasitic_drags = parasitic_drags[:,0,0]
+        lift_to_drags = lifts/(parasitic_drags+lift_induced_wing_drags+lift_induced_fuselage_drags)
         #now plot
         plt.figure(1)
         plt.plot(angles_degrees,lifts)
@@ -243,6 +343,22 @@ class Engine():
             max_thrust = (intake_air_density/self.density_at_max_thrust)*self.max_thrust
         return max_thrust
 
+    #array version of calculate_exhaust_velocity
+    def calculate_exhaust_velocity_array(self,intake_airspeed : np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+        intake_airspeed = np.asarray(intake_airspeed,dtype=float)
+        energy_incoming_air =(intake_airspeed**2)*0.5#energy of incoming air in J/kg
+        exhaust_energy = (((energy_incoming_air*self.intake_efficiency)*self.total_air_fuel_ratio)+(self.fuel_energy*1000000)*self.turbine_efficiency)/(self.total_air_fuel_ratio+1)#energy of exhaust stream in J/kg
+        exhaust_velocity = np.sqrt(2*exhaust_energy)#calculate the exhaust velocity of exhaust stream
+        exhaust_velocity_gain = exhaust_velocity-(intake_airspeed*self.total_air_fuel_ratio/(self.total_air_fuel_ratio+1))#calculate the gain in velocity
+        effective_exhaust_velocity = exhaust_velocity_gain*(self.total_air_fuel_ratio+1)#calculate the effective exhaust velocity
+        return exhaust_velocity_gain,effective_exhaust_velocity
+
+    #array version of calculate_max_thrust
+    def calculate_max_thrust_array(self,intake_air_density : np.ndarray) -> np.ndarray:
+        intake_air_density = np.asarray(intake_air_density,dtype=float)
+        max_thrust = np.where(intake_air_density>self.density_at_max_thrust,self.max_thrust,(intake_air_density/self.density_at_max_thrust)*self.max_thrust)
+        return max_thrust
+
 class Plane():
     def __init__(self,structure : Structure,engine : Engine,num_engines : int):
         self.structure = structure
@@ -254,6 +370,17 @@ class Plane():
         weight_force = (load_mass+self.structure.empty_mass)*g
         return weight_force
 
+    #maximum thrust in N of all engines combined at an array of air densities
+    def calculate_max_thrust_force_array(self,air_density : np.ndarray) -> np.ndarray:
+        max_thrust_force = self.engine.calculate_max_thrust_array(air_density)*self.num_engines*newtons_per_thrust_unit
+        return max_thrust_force
+
+    #fuel burnt (kg/s) by all engines combined to produce a thrust force (N) at an airspeed, fuel is burnt at one kg per effective exhaust velocity of momentum
+    def calculate_fuel_flow_array(self,thrust_force : np.ndarray,airspeed : np.ndarray) -> np.ndarray:
+        exhaust_velocity_gain,effective_exhaust_velocity = self.engine.calculate_exhaust_velocity_array(airspeed)
+        fuel_flow = np.asarray(thrust_force,dtype=float)/effective_exhaust_velocity
+        return fuel_flow
+
 
 
     #calculate x,y forces excluding thrust
@@ -281,24 +408,78 @@ class Plane():
         x_lift = lift*math.sin(velocity_angle) #horizontal component of lift
         return x_lift,y_lift,x_drag,y_drag
 
+    #array version of calculate_lift_and_drag_x_y, all inputs are broadcast against each other, the stall flags are returned as well
+    def calculate_lift_and_drag_x_y_array(self,velocity : np.ndarray,velocity_angle : np.ndarray,pitch : np.ndarray,air_density : np.ndarray) -> tuple[np.ndarray,np.ndarray,np.ndarray,np.ndarray,np.ndarray]:
+        angle_of_attack = self.structure.calculate_angle_of_attack(np.asarray(pitch,dtype=float),np.asarray(velocity_angle,dtype=float))
+        lift,stall = self.structure.calculate_lift_array(velocity,angle_of_attack,air_density)
+        lift_induced_wing_drag = self.structure.calculate_induced_wing_drag_array(velocity,angle_of_attack,air_density)
+        lift_induced_fuselage_drag = self.structure.calculate_fuselage_drag_array(velocity,angle_of_attack,air_density)
+        parasitic_drag = self.structure.calculate_parasitic_drag_array(velocity,air_density)
+        total_drag = lift_induced_fuselage_drag + lift_induced_wing_drag + parasitic_drag
+        y_drag = total_drag*np.sin(velocity_angle) #vertical component of drag
+        x_drag = total_drag*np.cos(velocity_angle) #horizontal component of drag
+        y_lift = lift*np.cos(velocity_angle) #vertical component of lift
+        x_lift = lift*np.sin(velocity_angle) #horizontal component of lift
+        return x_lift,y_lift,x_drag,y_drag,stall
+
+    #array version of calculate_balance_of_forces_xy (x,y forces excluding thrust), also returning the stall flags
+    #atmosphere may be an Atmosphere_Table to interpolate air density instead of evaluating the layer equations
+    def calculate_balance_of_forces_xy_array(self,load_mass : np.ndarray,velocity : np.ndarray,velocity_angle : np.ndarray,pitch : np.ndarray,altitude : np.ndarray,atmosphere : Atmosphere_Table = None) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+        if atmosphere is None:
+            air_density = calculate_air_density_array(altitude)
+        else:
+            air_density = atmosphere.get_density(altitude)
+        weight_force = self.calculate_weight_force(np.asarray(load_mass,dtype=float))
+        x_lift,y_lift,x_drag,y_drag,stall = self.calculate_lift_and_drag_x_y_array(velocity,velocity_angle,pitch,air_density)
+        net_x = -x_lift - x_drag
+        net_y = y_lift - y_drag - weight_force
+        return net_x,net_y,stall
+
+    #pitch (radians) and combined thrust (N) holding steady level flight for arrays of load_mass (kg, everything carried besides the empty aircraft), velocity (m/s) and altitude (m), which are broadcast against each other
+    #with thrust along the pitch, level flight needs thrust*cos(pitch) = drag and lift + thrust*sin(pitch) = weight, so the pitch is the root of lift + drag*tan(pitch) - weight,
+    #found by Newton steps kept inside a bisection bracket from zero lift to the critical angle, every point iterating at once
+    #returns pitch, thrust, feasible, stall (more lift needed than the wing can make before the critical angle) and over_max_thrust (needs more than calculate_max_thrust gives at that density)
+    def calculate_level_flight_trim_array(self,load_mass : np.ndarray,velocity : np.ndarray,altitude : np.ndarray,atmosphere : Atmosphere_Table = None,tolerance : float = 1e-9,max_iterations : int = 60) -> tuple[np.ndarray,np.ndarray,np.ndarray,np.ndarray,np.ndarray]:
+        load_mass,velocity,altitude = np.broadcast_arrays(np.asarray(load_mass,dtype=float),np.asarray(velocity,dtype=float),np.asarray(altitude,dtype=float))
+        air_density = calculate_air_density_array(altitude) if atmosphere is None else atmosphere.get_density(altitude)
+        weight_force = self.calculate_weight_force(load_mass)
+        #vertical force left over at a pitch, increasing with pitch over the bracket
+        def get_residual(pitch):
+            x_lift,y_lift,x_drag,y_drag,stall = self.calculate_lift_and_drag_x_y_array(velocity,0.0,pitch,air_density)
+            return y_lift+x_drag*np.tan(pitch)-weight_force
+        low = np.full(load_mass.shape,-self.structure.angle_of_incidence) #no lift
+        high = np.full(load_mass.shape,self.structure.critical_angle-self.structure.angle_of_incidence) #most lift before stalling
+        stall = get_residual(high)<0
+        pitch = (low+high)/2
+        step = 1e-7 #radians, for the finite difference slope
+        for iteration in range(max_iterations):
+            residual = get_residual(pitch)
+            converged = np.abs(residual)<=tolerance*weight_force
+            if np.all(converged|stall):
+                break
+            low = np.where(residual<0,pitch,low)
+            high = np.where(residual<0,high,pitch)
+            slope = (get_residual(pitch+step)-residual)/step
+            with np.errstate(divide='ignore',invalid='ignore'):
+                newton_pitch = pitch-residual/slope
+            #fall back to bisection wherever Newton would leave the bracket
+            inside = (newton_pitch>low)&(newton_pitch<high)
+            pitch = np.where(converged,pitch,np.where(inside,newton_pitch,(low+high)/2))
+        pitch = np.where(stall,np.nan,pitch)
+        x_lift,y_lift,x_drag,y_drag,stall_flags = self.calculate_lift_and_drag_x_y_array(velocity,0.0,pitch,air_density)
+        thrust = x_drag/np.cos(pitch)
+        stall = stall|stall_flags
+        over_max_thrust = ~(thrust<=self.calculate_max_thrust_force_array(air_density))&~stall
+        feasible = ~stall&~over_max_thrust
+        return pitch,thrust,feasible,stall,over_max_thrust
+
     #displays a plot of how lift and drag vertical and horizontal components vary by pitch offset from the velocity angle
     def plot_lift_drag_x_y_by_angle(self,velocity : float,velocity_angle : float,start_pitch_offset : float,end_pitch_offset : float,pitch_offset_increment : float,altitude : float):
-        angles = np.arange(velocity_angle+start_pitch_offset,velocity_angle+end_pitch_offset,pitch_offset_increment)
+        angles_degrees = np.arange(velocity_angle+start_pitch_offset,velocity_angle+end_pitch_offset,pitch_offset_increment)
         velocity_angle = math.radians(velocity_angle)
-        angles_degrees = list(angles)
-        angles : list[float] = list(np.radians(angles))
-        x_lifts : list[float] = []
-        y_lifts : list[float] = []
-        x_drags : list[float] = []
-        y_drags : list[float] = []
+        angles = np.radians(angles_degrees)
         air_density = calculate_air_density(altitude)
-        for angle in angles:
-            x_lift,y_lift,x_drag,y_drag = self.calculate_lift_and_drag_x_y(velocity,velocity_angle,angle,air_density)
-            #print(x_lift,' ',y_lift,' ',x_drag,' ',y_drag)
-            x_lifts.append(x_lift)
-            y_lifts.append(y_lift)
-            x_drags.append(x_drag)
-            y_drags.append(y_drag)
+        x_lifts,y_lifts,x_drags,y_drags,stall = self.calculate_lift_and_drag_x_y_array(velocity,velocity_angle,angles,air_density)
         #now plot
         plt.figure(1)
         plt.plot(angles_degrees,x_lifts)
@@ -322,7 +503,16 @@ class Plane():
         plt.show(block=False)
         
 
-#some examples
-B787_structure = Structure(*B787_structure_statistics)
-B787_engine = Engine(*B787_engine_statistics)
-B787 = Plane(B787_structure,B787_engine,2)
+#some examples, built the first time they are used (module level __getattr__ is only called for names not yet defined) and then kept as ordinary module attributes
+example_builders = {"B787_structure":lambda: Structure(*B787_structure_statistics),
+                    "B787_engine":lambda: Engine(*B787_engine_statistics),
+                    "B787":lambda: Plane(__getattr__("B787_structure"),__getattr__("B787_engine"),2)}
+
+def __getattr__(name : str):
+    if name in example_builders:
+        value = globals().get(name)
+        if value is None:
+            value = example_builders[name]()
+            globals()[name] = value
+        return value
+    raise AttributeError("module " + __name__ + " has no attribute " + name)
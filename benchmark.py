@@ -0,0 +1,184 @@
+#external packages
+import os
+import sys
+import json
+import time
+import math
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+
+#other project files, network must be imported before simulation
+import lazy_import
+import network as net
+import simulation as sim
+import aircraft_simulation as air
+
+pd = lazy_import.Lazy_Module("pandas") #only needed to write the synthetic csvs
+
+#benchmark each stage of network setup and the aircraft force functions on synthetic networks of increasing size
+#run as python benchmark.py --sizes 100 1000 10000 --output bench.json, results are written as JSON
+
+default_sizes = [100,300,1000,3000,10000,30000,50000]
+default_max_matrix_bytes = 8*(1<<30) #skip N x N stages whose matrices would need more memory than this
+matrices_per_pairwise_stage = 4 #distance, metric, demand and one temporary, used to estimate pairwise stage memory
+roads_per_airport = 3
+ferries_per_network = 4
+network_stages = ("load_all_airports","load_all_ferries","load_all_roads","calculate_great_circle_distances","calculate_distance_metric","calculate_economic_data","calculate_travel_demand")
+pairwise_stages = ("calculate_great_circle_distances","calculate_distance_metric","calculate_travel_demand")
+aircraft_stages = ("calculate_air_density","calculate_air_density_array","calculate_balance_of_forces_xy","calculate_balance_of_forces_xy_array")
+max_scalar_evaluations = 20000 #scalar aircraft functions are timed on at most this many points and scaled up
+
+#write a synthetic network in the same csv format as the real inputs, airports are scattered over australia-sized bounds and joined to their nearest neighbours by longitude
+def generate_synthetic_network(folder : str,num_airports : int,seed : int = 0) -> tuple[str,str,str]:
+    rng = np.random.default_rng(seed)
+    airport_folder = os.path.join(folder,"airport_csvs")
+    ferry_folder = os.path.join(folder,"ferry_csvs")
+    road_folder = os.path.join(folder,"road_csvs")
+    for subfolder in (airport_folder,ferry_folder,road_folder):
+        os.makedirs(subfolder,exist_ok=True)
+    names = np.array(["Airport " + str(i) for i in range(num_airports)],dtype=object)
+    states = np.array(["S" + str(i%8) for i in range(num_airports)],dtype=object)
+    latitudes = rng.uniform(-44,-10,num_airports)
+    longitudes = rng.uniform(113,154,num_airports)
+    airports = pd.DataFrame({"Name":names,"Location":[str(round(lat,5)) + ", " + str(round(lon,5)) for lat,lon in zip(latitudes,longitudes)],"State":states,"Country":"Synthetia",
+                             "Population (k)":np.round(rng.lognormal(3,1.5,num_airports),1),"GDP/head ($k)":np.round(rng.uniform(20,80,num_airports),1),"Fuel Premium ($/L)":"","Labour Cost Factor":""})
+    airports.to_csv(os.path.join(airport_folder,"Synthetic Airports.csv"),index=False)
+    ferry_names = ["Ferry " + str(i) for i in range(ferries_per_network)]
+    ferries = pd.DataFrame({"Ferry Name":ferry_names,"Transport Time":rng.uniform(0.5,9,ferries_per_network).round(1),"Car Load + Unload Time":1.0,"Pax Load Time":0.5,
+                            "Car Cost":50,"Pax Cost":10,"Frequency":rng.integers(7,70,ferries_per_network),"Distance (km)":rng.integers(20,400,ferries_per_network)})
+    ferries.to_csv(os.path.join(ferry_folder,"Synthetic Ferries.csv"),index=False)
+    order = np.argsort(longitudes)
+    starts = np.concatenate([order[:-offset] for offset in range(1,roads_per_airport+1) if offset<num_airports] or [np.array([],dtype=int)])
+    ends = np.concatenate([order[offset:] for offset in range(1,roads_per_airport+1) if offset<num_airports] or [np.array([],dtype=int)])
+    num_roads = len(starts)
+    has_ferry = np.zeros(num_roads,dtype=bool)
+    has_ferry[rng.choice(num_roads,size=min(ferries_per_network,num_roads),replace=False)] = True
+    ferry_column = np.full(num_roads,"",dtype=object)
+    ferry_column[has_ferry] = ferry_names[:has_ferry.sum()]
+    roads = pd.DataFrame({"Start Node":names[starts],"Start State":states[starts],"Start Country":"Synthetia","End Node":names[ends],"End State":states[ends],"End Country":"Synthetia",
+                          "Distance (km)":rng.integers(20,1500,num_roads),"Speed (km/h)":rng.choice([70,80,90,100,110],num_roads),"Has Ferry":np.where(has_ferry,"Yes","No"),"Ferries":ferry_column})
+    roads.to_csv(os.path.join(road_folder,"Synthetic Roads.csv"),index=False)
+    return airport_folder,ferry_folder,road_folder
+
+#run a function repeats times taking the best wall time, then once more under tracemalloc for peak allocated memory (tracemalloc slows python heavy code, so it is kept out of the timing)
+def measure(function,measure_memory : bool = True,repeats : int = 1) -> dict:
+    seconds = math.inf
+    for repeat in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        seconds = min(seconds,time.perf_counter()-start_time)
+    result = {"seconds":seconds}
+    if measure_memory:
+        tracemalloc.start()
+        function()
+        current_bytes,peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_bytes"] = peak_bytes
+    return result
+
+#time every stage of network setup on a synthetic network of num_airports airports
+def benchmark_network(num_airports : int,max_matrix_bytes : int,measure_memory : bool,repeats : int = 1,seed : int = 0) -> dict[str,dict]:
+    folder = tempfile.mkdtemp(prefix="air_travel_benchmark_")
+    try:
+        airport_folder,ferry_folder,road_folder = generate_synthetic_network(folder,num_airports,seed)
+        simulation = sim.Simulation()
+        simulation.error_logging = False
+        simulation.use_network_cache = False
+        network = net.Network(simulation)
+        stage_calls = {"load_all_airports":lambda: network.load_all_airports(airport_folder),"load_all_ferries":lambda: network.load_all_ferries(ferry_folder),"load_all_roads":lambda: network.load_all_roads(road_folder),
+                       "calculate_great_circle_distances":network.calculate_great_circle_distances,"calculate_distance_metric":network.calculate_distance_metric,
+                       "calculate_economic_data":network.calculate_economic_data,"calculate_travel_demand":network.calculate_travel_demand}
+        pairwise_bytes = matrices_per_pairwise_stage*8*num_airports*num_airports
+        results = {}
+        for stage in network_stages:
+            if stage in pairwise_stages and pairwise_bytes>max_matrix_bytes:
+                results[stage] = {"skipped":"needs ~" + str(pairwise_bytes) + " bytes of N x N matrices"}
+                continue
+            results[stage] = measure(stage_calls[stage],measure_memory,repeats)
+            results[stage]["num_airports"] = num_airports
+            results[stage]["array_bytes"] = sum(value.nbytes for value in vars(network).values() if isinstance(value,np.ndarray))
+        return results
+    finally:
+        shutil.rmtree(folder,ignore_errors=True)
+
+#time the aircraft force functions on num_points random flight conditions, scalar functions are timed on a subset and scaled up
+def benchmark_aircraft(num_points : int,measure_memory : bool,repeats : int = 1,seed : int = 0) -> dict[str,dict]:
+    rng = np.random.default_rng(seed)
+    plane = air.B787
+    load_mass = rng.uniform(20000,120000,num_points)
+    velocity = rng.uniform(80,260,num_points)
+    velocity_angle = rng.uniform(-0.1,0.1,num_points)
+    pitch = rng.uniform(-0.1,0.3,num_points)
+    altitude = rng.uniform(0,13000,num_points)
+    num_scalar = min(num_points,max_scalar_evaluations)
+    scalar_scale = num_points/num_scalar
+    def scalar_density():
+        for i in range(num_scalar):
+            air.calculate_air_density(altitude[i])
+    def scalar_forces():
+        for i in range(num_scalar):
+            plane.calculate_balance_of_forces_xy(load_mass[i],velocity[i],velocity_angle[i],pitch[i],altitude[i])
+    stage_calls = {"calculate_air_density":scalar_density,"calculate_air_density_array":lambda: air.calculate_air_density_array(altitude),
+                   "calculate_balance_of_forces_xy":scalar_forces,"calculate_balance_of_forces_xy_array":lambda: plane.calculate_balance_of_forces_xy_array(load_mass,velocity,velocity_angle,pitch,altitude)}
+    results = {}
+    for stage in aircraft_stages:
+        results[stage] = measure(stage_calls[stage],measure_memory,repeats)
+        if stage in ("calculate_air_density","calculate_balance_of_forces_xy"):
+            results[stage]["seconds"] *= scalar_scale
+        results[stage]["num_points"] = num_points
+    return results
+
+#exponent k in time ~ size^k, from a least squares fit in log-log space
+def get_scaling_exponent(sizes : list[int],seconds : list[float]) -> float:
+    points = [(size,second) for size,second in zip(sizes,seconds) if second>0]
+    if len(points)<2:
+        return None
+    log_sizes = np.log([point[0] for point in points])
+    log_seconds = np.log([point[1] for point in points])
+    return float(np.polyfit(log_sizes,log_seconds,1)[0])
+
+#run every benchmark at every size and collect the results by stage
+def run_benchmarks(sizes : list[int],max_matrix_bytes : int = default_max_matrix_bytes,measure_memory : bool = True,repeats : int = 1,verbose : bool = True) -> dict:
+    stages : dict[str,dict] = {}
+    for size in sizes:
+        if verbose:
+            print("benchmarking ",size," airports",file=sys.stderr)
+        size_results = benchmark_network(size,max_matrix_bytes,measure_memory,repeats)
+        size_results.update(benchmark_aircraft(size,measure_memory,repeats))
+        for stage,result in size_results.items():
+            stage_results = stages.setdefault(stage,{"sizes":[],"seconds":[],"peak_bytes":[],"skipped_sizes":[]})
+            if "skipped" in result:
+                stage_results["skipped_sizes"].append(size)
+                continue
+            stage_results["sizes"].append(size)
+            stage_results["seconds"].append(result["seconds"])
+            stage_results["peak_bytes"].append(result.get("peak_bytes"))
+    for stage_results in stages.values():
+        stage_results["scaling_exponent"] = get_scaling_exponent(stage_results["sizes"],stage_results["seconds"])
+    report = {"environment":{"python":platform.python_version(),"numpy":np.__version__,"pandas":pd.__version__,"machine":platform.machine(),"processor":platform.processor(),"cpu_count":os.cpu_count()},
+              "sizes":sizes,"repeats":repeats,"stages":stages}
+    return report
+
+def main(arguments : list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark network setup and aircraft force functions on synthetic networks")
+    parser.add_argument("--sizes",type=int,nargs="+",default=default_sizes,help="numbers of airports to benchmark")
+    parser.add_argument("--max-matrix-gb",type=float,default=default_max_matrix_bytes/(1<<30),help="skip N x N stages needing more memory than this")
+    parser.add_argument("--repeats",type=int,default=3,help="runs of each stage, the best time is reported")
+    parser.add_argument("--no-memory",action="store_true",help="skip the tracemalloc pass measuring peak memory")
+    parser.add_argument("--output",default=None,help="file to write the JSON report to, stdout if not given")
+    parser.add_argument("--quiet",action="store_true",help="do not print progress to stderr")
+    arguments = parser.parse_args(arguments)
+    report = run_benchmarks(arguments.sizes,int(arguments.max_matrix_gb*(1<<30)),not arguments.no_memory,arguments.repeats,not arguments.quiet)
+    output = json.dumps(report,indent=2)
+    if arguments.output is None:
+        print(output)
+    else:
+        with open(arguments.output,'w') as file:
+            file.write(output)
+
+if __name__ == "__main__":
+    main()
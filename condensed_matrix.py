@@ -0,0 +1,114 @@
+#external packages
+import numpy as np
+
+#symmetric N x N matrix storing only the entries above the diagonal as one condensed vector (in row order), plus a single value shared by the whole diagonal
+#with float32 storage this takes roughly a quarter of the memory of the full float64 matrix
+#indexing follows numpy for the cases the network code uses : matrix[i,j] (ints or broadcastable index arrays), matrix[i] for a row and matrix[a:b] for a dense band of rows
+class Condensed_Matrix():
+    def __init__(self,size : int,data : np.ndarray,diagonal : float = 0.0):
+        self.size = size #number of rows (and columns)
+        self.shape = (size,size)
+        self.data : np.ndarray = data #entries (i,j) with i<j, row by row, length size*(size-1)/2
+        self.dtype = data.dtype
+        self.diagonal = diagonal #value of every diagonal entry
+        self.row_starts : np.ndarray = get_condensed_row_starts(size) #position in data of entry (i,i+1)
+
+    #build from the full symmetric matrix (only the upper triangle is read)
+    @classmethod
+    def from_dense(cls,matrix : np.ndarray,dtype=np.float64):
+        size = matrix.shape[0]
+        condensed = cls(size,np.empty(size*(size-1)//2,dtype=dtype),float(matrix[0,0]) if size>0 else 0.0)
+        for row in range(size-1):
+            condensed.data[condensed.row_starts[row]:condensed.row_starts[row+1]] = matrix[row,row+1:]
+        return condensed
+
+    #build band by band from get_tile(rows,columns), which returns the (rows,columns) block of the full matrix, so the full matrix never exists
+    @classmethod
+    def from_tiles(cls,size : int,get_tile,dtype=np.float64,diagonal : float = 0.0,block_rows : int = 256):
+        condensed = cls(size,np.empty(size*(size-1)//2,dtype=dtype),diagonal)
+        for row_start in range(0,size,block_rows):
+            row_end = min(row_start+block_rows,size)
+            tile = get_tile(slice(row_start,row_end),slice(row_start,size))
+            for row in range(row_start,min(row_end,size-1)):
+                condensed.data[condensed.row_starts[row]:condensed.row_starts[row+1]] = tile[row-row_start,row-row_start+1:]
+        return condensed
+
+    #a new condensed matrix with function applied to every entry (including the diagonal), function must work elementwise on float64 arrays
+    def map(self,function,dtype=None):
+        dtype = self.dtype if dtype is None else dtype
+        data = np.empty(len(self.data),dtype=dtype)
+        chunk = 1<<22 #apply in chunks so float64 temporaries stay small
+        for start in range(0,len(self.data),chunk):
+            data[start:start+chunk] = function(self.data[start:start+chunk].astype(np.float64))
+        diagonal = float(function(np.array([self.diagonal],dtype=np.float64))[0])
+        return Condensed_Matrix(self.size,data,diagonal)
+
+    #position in data of entries (i,j), i!=j
+    def get_condensed_indices(self,i : np.ndarray,j : np.ndarray) -> np.ndarray:
+        low = np.minimum(i,j)
+        high = np.maximum(i,j)
+        return self.row_starts[low]+(high-low-1)
+
+    #values at broadcastable arrays of row and column indices
+    def get_values(self,i : np.ndarray,j : np.ndarray) -> np.ndarray:
+        i,j = np.broadcast_arrays(np.asarray(i,dtype=np.int64),np.asarray(j,dtype=np.int64))
+        off_diagonal = i!=j
+        values = np.full(i.shape,self.diagonal,dtype=np.float64)
+        values[off_diagonal] = self.data[self.get_condensed_indices(i[off_diagonal],j[off_diagonal])]
+        return values
+
+    #one full row as a float64 array
+    def get_row(self,row : int) -> np.ndarray:
+        values = np.empty(self.size,dtype=np.float64)
+        values[:row] = self.data[self.row_starts[:row]+(row-1-np.arange(row))] #entries (j,row) for j<row, stored in earlier rows
+        values[row] = self.diagonal
+        values[row+1:] = self.data[self.row_starts[row]:self.row_starts[row]+self.size-row-1]
+        return values
+
+    #a dense (len(rows),N) float64 band of rows
+    def get_rows(self,rows : slice) -> np.ndarray:
+        row_indices = range(*rows.indices(self.size))
+        band = np.empty((len(row_indices),self.size),dtype=np.float64)
+        for position,row in enumerate(row_indices):
+            band[position] = self.get_row(row)
+        return band
+
+    #overwrite row (and so also column) row with values, a length N array whose entry row is ignored
+    def set_row(self,row : int,values : np.ndarray) -> None:
+        self.data[self.row_starts[:row]+(row-1-np.arange(row))] = values[:row]
+        self.data[self.row_starts[row]:self.row_starts[row]+self.size-row-1] = values[row+1:]
+
+    #a new condensed matrix one row and column larger, with the new row (and column) set to values, a length N+1 array whose last entry is ignored
+    def add_row_and_column(self,values : np.ndarray):
+        size = self.size+1
+        resized = Condensed_Matrix(size,np.empty(size*(size-1)//2,dtype=self.dtype),self.diagonal)
+        for row in range(self.size):
+            resized.data[resized.row_starts[row]:resized.row_starts[row+1]-1] = self.data[self.row_starts[row]:self.row_starts[row+1]]
+        resized.set_row(self.size,values)
+        return resized
+
+    def __getitem__(self,key):
+        if isinstance(key,tuple):
+            return self.get_values(key[0],key[1])
+        elif isinstance(key,slice):
+            return self.get_rows(key)
+        else:
+            return self.get_row(int(key))
+
+    def __len__(self) -> int:
+        return self.size
+
+    #bytes used by the stored entries
+    @property
+    def nbytes(self) -> int:
+        return int(self.data.nbytes)
+
+    #the full matrix, only for small matrices and checking
+    def to_dense(self) -> np.ndarray:
+        return self.get_rows(slice(0,self.size))
+
+#position in the condensed vector of entry (i,i+1) for every row i of a size x size matrix, with one extra entry marking the end (the formula gives the length there too)
+def get_condensed_row_starts(size : int) -> np.ndarray:
+    rows = np.arange(size+1,dtype=np.int64)
+    row_starts = rows*size-(rows*(rows+1))//2
+    return row_starts
@@ -0,0 +1,270 @@
+#external packages
+import os
+import heapq
+import hashlib
+import math
+import numpy as np
+
+#other project files
+import road_graph
+
+#contraction hierarchy over the road/ferry graph, for fastest road route queries between two airports without searching the whole graph
+#nodes are contracted one at a time (least important first), adding a shortcut between two neighbours of the contracted node whenever the route through it is the only fastest one
+#a query is then a bidirectional dijkstra that only ever moves to more important nodes, meeting at the most important node of the route, and shortcuts are unpacked back into roads
+#arc a joins arc_tail[a] and arc_head[a], it is either a road (arc_road[a]>=0) or a shortcut through arc_middle[a] made of arc_first[a] (tail-middle) and arc_second[a] (middle-head)
+
+hierarchy_cache_folder = "road_hierarchy_cache"
+hierarchy_format_version = 1 #increase whenever the contraction or file layout changes so old cached hierarchies stop matching
+default_witness_settle_limit = 64 #nodes a witness search may settle before assuming there is no witness route (which only adds an unneeded shortcut)
+
+class Contraction_Hierarchy():
+    def __init__(self,num_nodes : int,rank : np.ndarray,up_offsets : np.ndarray,up_heads : np.ndarray,up_arcs : np.ndarray,arc_tail : np.ndarray,arc_head : np.ndarray,arc_time : np.ndarray,arc_distance : np.ndarray,arc_road : np.ndarray,arc_middle : np.ndarray,arc_first : np.ndarray,arc_second : np.ndarray):
+        self.num_nodes = num_nodes
+        self.rank = rank #contraction order of every node, higher is more important
+        #upward graph in compressed sparse row form, node i reaches the more important nodes up_heads[up_offsets[i]:up_offsets[i+1]] along the arcs up_arcs[up_offsets[i]:up_offsets[i+1]]
+        self.up_offsets = up_offsets
+        self.up_heads = up_heads
+        self.up_arcs = up_arcs
+        #per arc attributes, roads and shortcuts
+        self.arc_tail = arc_tail
+        self.arc_head = arc_head
+        self.arc_time = arc_time #hrs
+        self.arc_distance = arc_distance #km
+        self.arc_road = arc_road #road index, -1 for shortcuts
+        self.arc_middle = arc_middle #node a shortcut passes through, -1 for roads
+        self.arc_first = arc_first #arc from tail to middle, -1 for roads
+        self.arc_second = arc_second #arc from middle to head, -1 for roads
+        self.build_query_lists()
+
+    #the upward graph and arcs as python lists, which queries index much faster than numpy arrays one element at a time
+    def build_query_lists(self) -> None:
+        up_offsets = self.up_offsets.tolist()
+        up_heads = self.up_heads.tolist()
+        up_arcs = self.up_arcs.tolist()
+        arc_time = self.arc_time.tolist()
+        arc_distance = self.arc_distance.tolist()
+        self.upward_lists = [[(up_heads[k],arc_time[up_arcs[k]],arc_distance[up_arcs[k]],up_arcs[k]) for k in range(up_offsets[node],up_offsets[node+1])] for node in range(self.num_nodes)]
+        self.arc_lists = (self.arc_tail.tolist(),self.arc_road.tolist(),self.arc_middle.tolist(),self.arc_first.tolist(),self.arc_second.tolist())
+
+    #contract every node of a road graph, roads cost edge_times (hrs) and edge_distances (km), eg from road_routing.get_road_travel_times/get_road_travel_distances
+    @classmethod
+    def from_road_graph(cls,graph : road_graph.Road_Graph,edge_times : np.ndarray,edge_distances : np.ndarray,witness_settle_limit : int = default_witness_settle_limit):
+        num_nodes = graph.num_nodes
+        arc_tail : list[int] = []
+        arc_head : list[int] = []
+        arc_time : list[float] = []
+        arc_distance : list[float] = []
+        arc_road : list[int] = []
+        arc_middle : list[int] = []
+        arc_first : list[int] = []
+        arc_second : list[int] = []
+        def add_arc(tail,head,time,distance,road,middle,first,second) -> int:
+            arc_tail.append(tail)
+            arc_head.append(head)
+            arc_time.append(time)
+            arc_distance.append(distance)
+            arc_road.append(road)
+            arc_middle.append(middle)
+            arc_first.append(first)
+            arc_second.append(second)
+            return len(arc_tail)-1
+        #remaining graph, neighbour -> fastest arc, parallel roads keep only the fastest (then shortest)
+        adjacency : list[dict[int,int]] = [{} for node in range(num_nodes)]
+        for road,(start,end,time,distance) in enumerate(zip(graph.road_start.tolist(),graph.road_end.tolist(),np.asarray(edge_times,dtype=float).tolist(),np.asarray(edge_distances,dtype=float).tolist())):
+            if start==end:
+                continue
+            existing = adjacency[start].get(end)
+            if existing is not None and (arc_time[existing],arc_distance[existing])<=(time,distance):
+                continue
+            arc = add_arc(start,end,time,distance,road,-1,-1,-1)
+            adjacency[start][end] = arc
+            adjacency[end][start] = arc
+
+        #shortcuts needed to contract node, as (u,w,time,distance,arc u-node,arc node-w)
+        def get_shortcuts(node : int) -> list[tuple[int,int,float,float,int,int]]:
+            neighbours = list(adjacency[node].items())
+            shortcuts = []
+            if len(neighbours)<2:
+                return shortcuts
+            max_second_time = max(arc_time[arc] for neighbour,arc in neighbours)
+            for position,(u,arc_u) in enumerate(neighbours[:-1]):
+                time_u = arc_time[arc_u]
+                targets = neighbours[position+1:]
+                witness_times = get_witness_times(u,node,{w for w,arc_w in targets},time_u+max_second_time)
+                for w,arc_w in targets:
+                    via_time = time_u+arc_time[arc_w]
+                    if witness_times.get(w,math.inf)>via_time:
+                        shortcuts.append((u,w,via_time,arc_distance[arc_u]+arc_distance[arc_w],arc_u,arc_w))
+            return shortcuts
+
+        #dijkstra from source through the remaining graph avoiding the node being contracted, stopped past max_time or after witness_settle_limit nodes
+        def get_witness_times(source : int,avoid : int,targets : set[int],max_time : float) -> dict[int,float]:
+            times = {source:0.0}
+            heap = [(0.0,source)]
+            settled = 0
+            remaining_targets = len(targets)
+            while heap and settled<witness_settle_limit and remaining_targets>0:
+                time,node = heapq.heappop(heap)
+                if time>times.get(node,math.inf):
+                    continue
+                if time>max_time:
+                    break
+                settled += 1
+                if node in targets:
+                    remaining_targets -= 1
+                for neighbour,arc in adjacency[node].items():
+                    if neighbour==avoid:
+                        continue
+                    new_time = time+arc_time[arc]
+                    if new_time<times.get(neighbour,math.inf):
+                        times[neighbour] = new_time
+                        heapq.heappush(heap,(new_time,neighbour))
+            return times
+
+        #importance of contracting a node next, shortcuts added less roads removed plus how many of its neighbours are already contracted (spreading contraction evenly)
+        contracted_neighbours = [0]*num_nodes
+        def get_priority(node : int) -> int:
+            return len(get_shortcuts(node))-len(adjacency[node])+contracted_neighbours[node]
+
+        heap = [(get_priority(node),node) for node in range(num_nodes)]
+        heapq.heapify(heap)
+        rank = np.empty(num_nodes,dtype=np.int64)
+        upward : list[list[tuple[int,int]]] = [[] for node in range(num_nodes)]
+        next_rank = 0
+        while heap:
+            priority,node = heapq.heappop(heap)
+            #priorities go stale as the graph changes, so recheck before contracting (lazy updates)
+            priority = get_priority(node)
+            if heap and priority>heap[0][0]:
+                heapq.heappush(heap,(priority,node))
+                continue
+            for u,w,time,distance,arc_u,arc_w in get_shortcuts(node):
+                existing = adjacency[u].get(w)
+                if existing is not None and arc_time[existing]<=time:
+                    continue
+                arc = add_arc(u,w,time,distance,-1,node,arc_u,arc_w)
+                adjacency[u][w] = arc
+                adjacency[w][u] = arc
+            #every neighbour left is contracted later, so each arc to one is an upward arc
+            upward[node] = list(adjacency[node].items())
+            for neighbour in adjacency[node]:
+                del adjacency[neighbour][node]
+                contracted_neighbours[neighbour] += 1
+            adjacency[node] = {}
+            rank[node] = next_rank
+            next_rank += 1
+        up_offsets = np.concatenate(([0],np.cumsum([len(node_upward) for node_upward in upward]))).astype(np.int64)
+        up_heads = np.array([neighbour for node_upward in upward for neighbour,arc in node_upward],dtype=np.int64)
+        up_arcs = np.array([arc for node_upward in upward for neighbour,arc in node_upward],dtype=np.int64)
+        return cls(num_nodes,rank,up_offsets,up_heads,up_arcs,np.array(arc_tail,dtype=np.int64),np.array(arc_head,dtype=np.int64),np.array(arc_time,dtype=float),
+                   np.array(arc_distance,dtype=float),np.array(arc_road,dtype=np.int64),np.array(arc_middle,dtype=np.int64),np.array(arc_first,dtype=np.int64),np.array(arc_second,dtype=np.int64))
+
+    #fastest road route between two nodes, as travel time (hrs), distance (km) and the roads driven in order, inf and no roads if there is no road route
+    def query(self,source : int,target : int) -> tuple[float,float,np.ndarray]:
+        if source==target:
+            return 0.0,0.0,np.empty(0,dtype=np.int64)
+        upward_lists = self.upward_lists
+        #search state of each direction, 0 forward from source and 1 backward from target
+        times = ({source:0.0},{target:0.0})
+        distances = ({source:0.0},{target:0.0})
+        parents = ({source:(-1,-1)},{target:(-1,-1)}) #node -> (previous node,arc)
+        heaps = ([(0.0,source)],[(0.0,target)])
+        best_time = math.inf
+        meeting_node = -1
+        while True:
+            forward_top = heaps[0][0][0] if heaps[0] else math.inf
+            backward_top = heaps[1][0][0] if heaps[1] else math.inf
+            if min(forward_top,backward_top)>=best_time:
+                break
+            side = 0 if forward_top<=backward_top else 1
+            time,node = heapq.heappop(heaps[side])
+            if time>times[side][node]:
+                continue
+            side_times = times[side]
+            side_distances = distances[side]
+            other_times = times[1-side]
+            distance = side_distances[node]
+            for head,arc_time,arc_distance,arc in upward_lists[node]:
+                new_time = time+arc_time
+                if new_time<side_times.get(head,math.inf):
+                    side_times[head] = new_time
+                    side_distances[head] = distance+arc_distance
+                    parents[side][head] = (node,arc)
+                    heapq.heappush(heaps[side],(new_time,head))
+                    if head in other_times and new_time+other_times[head]<best_time:
+                        best_time = new_time+other_times[head]
+                        meeting_node = head
+            if node in other_times and time+other_times[node]<best_time:
+                best_time = time+other_times[node]
+                meeting_node = node
+        if meeting_node<0:
+            return math.inf,math.inf,np.empty(0,dtype=np.int64)
+        #arcs from source up to the meeting node, then from the meeting node down to target, each with the node it is driven from
+        steps = []
+        node = meeting_node
+        while node!=source:
+            previous,arc = parents[0][node]
+            steps.append((arc,previous))
+            node = previous
+        steps.reverse()
+        node = meeting_node
+        while node!=target:
+            previous,arc = parents[1][node]
+            steps.append((arc,node))
+            node = previous
+        roads = []
+        for arc,start in steps:
+            roads.extend(self.unpack_arc(arc,start))
+        return best_time,distances[0][meeting_node]+distances[1][meeting_node],np.array(roads,dtype=np.int64)
+
+    #roads making up an arc driven from the start node (one of its ends), in order
+    def unpack_arc(self,arc : int,start : int) -> list[int]:
+        arc_tail,arc_road,arc_middle,arc_first,arc_second = self.arc_lists
+        roads = []
+        stack = [(arc,start)]
+        while stack:
+            arc,start = stack.pop()
+            if arc_road[arc]>=0:
+                roads.append(arc_road[arc])
+                continue
+            middle = arc_middle[arc]
+            if start==arc_tail[arc]:
+                first,second = arc_first[arc],arc_second[arc]
+            else:
+                first,second = arc_second[arc],arc_first[arc]
+            stack.append((second,middle))
+            stack.append((first,start))
+        return roads
+
+    #write the hierarchy to a single .npz file
+    def save(self,filepath : str) -> None:
+        temporary_filepath = filepath + ".tmp.npz" #written whole then renamed, so a crash never leaves a partial hierarchy behind
+        np.savez(temporary_filepath,num_nodes=np.array(self.num_nodes),rank=self.rank,up_offsets=self.up_offsets,up_heads=self.up_heads,up_arcs=self.up_arcs,
+                 arc_tail=self.arc_tail,arc_head=self.arc_head,arc_time=self.arc_time,arc_distance=self.arc_distance,arc_road=self.arc_road,arc_middle=self.arc_middle,arc_first=self.arc_first,arc_second=self.arc_second)
+        os.replace(temporary_filepath,filepath)
+
+    #read a hierarchy written by save
+    @classmethod
+    def load(cls,filepath : str):
+        with np.load(filepath) as arrays:
+            return cls(int(arrays["num_nodes"]),arrays["rank"],arrays["up_offsets"],arrays["up_heads"],arrays["up_arcs"],arrays["arc_tail"],arrays["arc_head"],arrays["arc_time"],
+                       arrays["arc_distance"],arrays["arc_road"],arrays["arc_middle"],arrays["arc_first"],arrays["arc_second"])
+
+#hash of everything a hierarchy depends on, the roads and what they cost
+def get_hierarchy_key(graph : road_graph.Road_Graph,edge_times : np.ndarray,edge_distances : np.ndarray,witness_settle_limit : int) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(("version=" + str(hierarchy_format_version) + "\nnodes=" + str(graph.num_nodes) + "\nwitness_settle_limit=" + str(witness_settle_limit) + "\n").encode())
+    for array in (graph.road_start,graph.road_end,np.asarray(edge_times,dtype=float),np.asarray(edge_distances,dtype=float)):
+        hasher.update(np.ascontiguousarray(array).tobytes())
+    return hasher.hexdigest()
+
+#get the contraction hierarchy of a road graph, loading it from the cache folder if it has been built before and building (then saving) it otherwise
+def get_contraction_hierarchy(graph : road_graph.Road_Graph,edge_times : np.ndarray,edge_distances : np.ndarray,cache_folder : str = hierarchy_cache_folder,witness_settle_limit : int = default_witness_settle_limit) -> Contraction_Hierarchy:
+    key = get_hierarchy_key(graph,edge_times,edge_distances,witness_settle_limit)
+    filepath = os.path.join(cache_folder,key + ".npz")
+    if os.path.isfile(filepath):
+        return Contraction_Hierarchy.load(filepath)
+    hierarchy = Contraction_Hierarchy.from_road_graph(graph,edge_times,edge_distances,witness_settle_limit)
+    os.makedirs(cache_folder,exist_ok=True)
+    hierarchy.save(filepath)
+    return hierarchy
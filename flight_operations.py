@@ -0,0 +1,290 @@
+#external packages
+import os
+import numpy as np
+
+#other project files
+import route_performance
+import od_export
+
+#discrete event simulation of flight operations over a network, aircraft fly rotations between two airports and ferries sail at their weekly frequency
+#aircraft, routes (passenger flows between a directed pair of airports) and ferries are held as columns of arrays indexed by id rather than as objects
+#every pending event is one int64 key : time (whole seconds) in the high bits, then the event kind, then the aircraft or ferry id, so sorting keys sorts events by time with ties broken by kind then id
+#the priority queue is the sorted array of pending keys, popped and pushed a window of events at a time rather than one event at a time (see run_until)
+#each aircraft and ferry only ever has one pending event, and aircraft only affect each other through the passengers waiting on a shared route
+#so every event in a window can be processed together with array operations while giving exactly the results of processing them one by one in key order
+
+departure_event = 0 #an aircraft boards the waiting passengers of its route and takes off
+arrival_event = 1 #an aircraft lands and its passengers leave
+turnaround_event = 2 #an aircraft is ready again after its turnaround and takes the return route
+ferry_sailing_event = 3 #a ferry sails
+event_names = ("departure","arrival","turnaround","ferry_sailing")
+entity_bits = 24 #at most 16.7M aircraft (and ferries)
+kind_bits = 3
+time_shift = entity_bits+kind_bits
+entity_mask = (1<<entity_bits)-1
+kind_mask = (1<<kind_bits)-1
+max_entities = 1<<entity_bits
+max_event_time = (1<<(63-time_shift))-1 #s, about 2177 years, keeps every event within an int64 for checkpoints
+on_ground_state = 0
+airborne_state = 1
+seconds_per_hour = 3600
+seconds_per_week = 7*24*3600
+seconds_per_year = 365.25*24*3600
+default_turnaround_time = 1.0 #hrs on the ground between an arrival and the next departure
+default_seats = 250 #seats per aircraft
+checkpoint_format_version = 1
+route_columns = ("route_origin","route_destination","route_reverse","route_block_time","route_demand_rate","route_waiting","route_updated","route_carried")
+aircraft_columns = ("aircraft_route","aircraft_seats","aircraft_state","aircraft_load","aircraft_flights","aircraft_passengers","aircraft_block_time")
+ferry_columns = ("ferry_interval","ferry_sailings")
+
+#event engine attached to a simulation's network, add aircraft with add_aircraft (or assign_fleet_by_demand) then advance it with run
+class Flight_Operations():
+    def __init__(self,network,turnaround_time : float = default_turnaround_time):
+        self.network = network
+        self.turnaround_time = turnaround_time #hrs
+        self.time : int = 0 #s since the start of the simulation, every event before it has been processed
+        self.events = np.zeros(0,dtype=np.int64) #sorted keys of the pending events, see get_event_key
+        self.event_counts = np.zeros(len(event_names),dtype=np.int64) #events processed of each kind
+        #routes, one per directed pair of airports flown by an aircraft, passengers arrive continuously at the route's share of yearly demand and wait for a departure
+        self.route_origin = np.zeros(0,dtype=np.int64)
+        self.route_destination = np.zeros(0,dtype=np.int64)
+        self.route_reverse = np.zeros(0,dtype=np.int64) #route flying the other way
+        self.route_block_time = np.zeros(0,dtype=np.int64) #s from departure to arrival, including taxiing, as in route_performance
+        self.route_demand_rate = np.zeros(0,dtype=np.float64) #passengers arriving per s
+        self.route_waiting = np.zeros(0,dtype=np.float64) #expected passengers waiting at route_updated, a fraction of one passenger carries over
+        self.route_updated = np.zeros(0,dtype=np.int64) #s when route_waiting was last brought up to date
+        self.route_carried = np.zeros(0,dtype=np.int64) #passengers delivered
+        self.route_indices_dict : dict[tuple[int,int],int] = {} #route of each (origin,destination) airport index pair
+        #aircraft
+        self.aircraft_route = np.zeros(0,dtype=np.int64) #route being flown, or flown next while on the ground
+        self.aircraft_seats = np.zeros(0,dtype=np.int64)
+        self.aircraft_state = np.zeros(0,dtype=np.int8) #on_ground_state or airborne_state
+        self.aircraft_load = np.zeros(0,dtype=np.int64) #passengers on board
+        self.aircraft_flights = np.zeros(0,dtype=np.int64) #flights completed
+        self.aircraft_passengers = np.zeros(0,dtype=np.int64) #passengers delivered
+        self.aircraft_block_time = np.zeros(0,dtype=np.int64) #s flown
+        #ferries, in network ferry order
+        frequency = np.asarray(network.ferry_frequency,dtype=np.float64)
+        if len(frequency)>max_entities:
+            raise ValueError("the network has " + str(len(frequency)) + " ferries, at most " + str(max_entities) + " can be simulated")
+        self.ferry_interval = np.where(frequency>0,np.round(seconds_per_week/np.where(frequency>0,frequency,1)),0).astype(np.int64) #s between sailings, 0 for ferries which never sail
+        self.ferry_sailings = np.zeros(len(frequency),dtype=np.int64) #sailings completed
+        sailing_ferries = np.flatnonzero(self.ferry_interval>0)
+        self.schedule_events(get_event_key(self.ferry_interval[sailing_ferries],ferry_sailing_event,sailing_ferries))
+
+    #add aircraft flying rotations between origins and destinations (unique name tuples or indices, broadcast against each other), returning their ids
+    #each aircraft first departs from its origin departure_times hrs from now (0 if not given), pairs with an unknown or identical origin and destination are skipped
+    def add_aircraft(self,origins,destinations,seats = default_seats,departure_times = None) -> np.ndarray:
+        origins,destinations = np.broadcast_arrays(self.network.get_airport_indices(origins),self.network.get_airport_indices(destinations))
+        seats = np.broadcast_to(np.asarray(seats,dtype=np.int64),origins.shape)
+        departure_times = np.broadcast_to(np.asarray(0.0 if departure_times is None else departure_times,dtype=np.float64),origins.shape)
+        valid = (origins>=0)&(destinations>=0)&(origins!=destinations)
+        if not np.all(valid):
+            self.network.error_print(str(int(np.sum(~valid))) + " aircraft have an unknown origin or destination, or the same origin and destination, and were not added")
+        origins,destinations,seats,departure_times = origins[valid],destinations[valid],seats[valid],departure_times[valid]
+        first_aircraft = len(self.aircraft_route)
+        if first_aircraft+len(origins)>max_entities:
+            raise ValueError("at most " + str(max_entities) + " aircraft can be simulated")
+        routes = self.get_routes(origins,destinations)
+        self.aircraft_route = np.concatenate((self.aircraft_route,routes))
+        self.aircraft_seats = np.concatenate((self.aircraft_seats,seats))
+        for name in ("aircraft_state","aircraft_load","aircraft_flights","aircraft_passengers","aircraft_block_time"):
+            column = getattr(self,name)
+            setattr(self,name,np.concatenate((column,np.zeros(len(origins),dtype=column.dtype))))
+        aircraft = np.arange(first_aircraft,first_aircraft+len(origins),dtype=np.int64)
+        departure_seconds = self.time+np.round(departure_times*seconds_per_hour).astype(np.int64)
+        self.schedule_events(get_event_key(departure_seconds,departure_event,aircraft))
+        return aircraft
+
+    #put one aircraft on each of the num_aircraft airport pairs with the most demand in either direction, flying first from the busier end, returning their ids
+    #pairs are found by streaming the network's origin-destination pairs, so the full pair table is never built
+    def assign_fleet_by_demand(self,num_aircraft : int,seats = default_seats) -> np.ndarray:
+        if num_aircraft<=0:
+            return np.zeros(0,dtype=np.int64)
+        kept_records = 2*num_aircraft #each airport pair appears at most twice, so these always hold the top num_aircraft pairs
+        best = np.zeros(0,dtype=od_export.od_export_record_dtype)
+        for chunk in od_export.iterate_od_chunks(self.network):
+            best = np.concatenate((best,chunk))
+            if len(best)>kept_records:
+                best = best[np.argpartition(-best["demand"],kept_records-1)[:kept_records]]
+        best = best[np.argsort(-best["demand"],kind='stable')]
+        num_airports = len(self.network.airport_names)
+        pairs = np.minimum(best["origin"],best["destination"]).astype(np.int64)*num_airports+np.maximum(best["origin"],best["destination"])
+        _,first = np.unique(pairs,return_index=True) #the busier direction of each pair
+        chosen = best[np.sort(first)[:num_aircraft]]
+        return self.add_aircraft(chosen["origin"],chosen["destination"],seats)
+
+    #route ids of directed airport pairs, creating the routes (and their reverses) which do not exist yet
+    def get_routes(self,origins : np.ndarray,destinations : np.ndarray) -> np.ndarray:
+        new_pairs = {}
+        for pair in zip(origins.tolist(),destinations.tolist()):
+            if pair not in self.route_indices_dict and pair not in new_pairs:
+                new_pairs[pair] = len(self.route_origin)+len(new_pairs)
+                new_pairs[(pair[1],pair[0])] = new_pairs[pair]+1
+        if new_pairs:
+            new_origins = np.fromiter((pair[0] for pair in new_pairs),dtype=np.int64,count=len(new_pairs))
+            new_destinations = np.fromiter((pair[1] for pair in new_pairs),dtype=np.int64,count=len(new_pairs))
+            records = self.network.calculate_od_records(new_origins,new_destinations)
+            first_route = len(self.route_origin)
+            new_routes = np.arange(first_route,first_route+len(new_pairs),dtype=np.int64)
+            block_time = np.round((records["great_circle_distance"]*1000/route_performance.cruise_speed)+route_performance.taxi_time*seconds_per_hour).astype(np.int64)
+            new_columns = {"route_origin":new_origins,"route_destination":new_destinations,"route_reverse":new_routes^1, #reverse routes are created in adjacent pairs
+                           "route_block_time":np.maximum(block_time,1),"route_demand_rate":records["demand"]*1000/seconds_per_year,
+                           "route_waiting":np.zeros(len(new_pairs)),"route_updated":np.full(len(new_pairs),self.time,dtype=np.int64),"route_carried":np.zeros(len(new_pairs),dtype=np.int64)}
+            for name in route_columns:
+                setattr(self,name,np.concatenate((getattr(self,name),new_columns[name].astype(getattr(self,name).dtype))))
+            self.route_indices_dict.update(new_pairs)
+        get_route = self.route_indices_dict.__getitem__
+        return np.fromiter((get_route(pair) for pair in zip(origins.tolist(),destinations.tolist())),dtype=np.int64,count=len(origins))
+
+    #advance the simulation by duration hrs, returning the number of events processed
+    def run(self,duration : float) -> int:
+        return self.run_until(self.time+int(round(duration*seconds_per_hour)))
+
+    #process every event up to and including end_time (s since the start), returning the number of events processed
+    #events are taken from the front of the queue one window at a time, the window being as long as the shortest delay before any follow on event (a flight, a turnaround or a ferry interval)
+    #so nothing scheduled by an event in the window falls inside it, except the departure a turnaround schedules for the same time, which process_window handles itself
+    def run_until(self,end_time : int) -> int:
+        if end_time>max_event_time:
+            raise ValueError("end time " + str(end_time) + " s is past the last time events can be scheduled at, " + str(max_event_time) + " s")
+        lookahead = self.get_lookahead()
+        end_key = (end_time+1)<<time_shift
+        processed = int(self.event_counts.sum())
+        while len(self.events)>0 and self.events[0]<end_key:
+            window_end = min(int(self.events[0]>>time_shift)+lookahead,end_time+1) #s, first time after the window
+            count = int(np.searchsorted(self.events,window_end<<time_shift))
+            window = self.events[:count]
+            self.events = self.events[count:]
+            self.schedule_events(self.process_window(window>>time_shift,(window>>entity_bits)&kind_mask,window&entity_mask,window_end))
+        self.time = max(self.time,end_time)
+        return int(self.event_counts.sum())-processed
+
+    #shortest positive delay (s) between an event and the event it schedules, turnarounds only count when they take time
+    def get_lookahead(self) -> int:
+        delays = [self.route_block_time,self.ferry_interval[self.ferry_interval>0]]
+        turnaround_seconds = self.get_turnaround_seconds()
+        if turnaround_seconds>0:
+            delays.append(np.array([turnaround_seconds],dtype=np.int64))
+        delays = np.concatenate(delays)
+        return int(delays.min()) if len(delays)>0 else 1
+
+    #turnaround time in whole s
+    def get_turnaround_seconds(self) -> int:
+        return int(round(self.turnaround_time*seconds_per_hour))
+
+    #process a window of events (times in s, kinds and aircraft or ferry ids) ending before window_end (s), returning the keys of the events they schedule after it
+    #arrivals are processed first, then turnarounds (including those of aircraft which arrived in the window with no turnaround time), then every departure in time then id order
+    def process_window(self,times : np.ndarray,kinds : np.ndarray,entities : np.ndarray,window_end : int) -> np.ndarray:
+        new_keys = []
+        counts = np.bincount(kinds,minlength=len(event_names))
+        #arrivals
+        aircraft = entities[kinds==arrival_event]
+        arrival_times = times[kinds==arrival_event]
+        routes = self.aircraft_route[aircraft]
+        load = self.aircraft_load[aircraft]
+        np.add.at(self.route_carried,routes,load) #several aircraft can fly the same route
+        self.aircraft_passengers[aircraft] += load
+        self.aircraft_load[aircraft] = 0
+        self.aircraft_flights[aircraft] += 1
+        self.aircraft_block_time[aircraft] += self.route_block_time[routes]
+        self.aircraft_state[aircraft] = on_ground_state
+        turnaround_times = arrival_times+self.get_turnaround_seconds()
+        in_window = turnaround_times<window_end
+        new_keys.append(get_event_key(turnaround_times[~in_window],turnaround_event,aircraft[~in_window]))
+        counts[turnaround_event] += int(np.count_nonzero(in_window))
+        #turnarounds, each schedules a departure at the same time
+        aircraft = np.concatenate((entities[kinds==turnaround_event],aircraft[in_window]))
+        turnaround_times = np.concatenate((times[kinds==turnaround_event],turnaround_times[in_window]))
+        self.aircraft_route[aircraft] = self.route_reverse[self.aircraft_route[aircraft]]
+        counts[departure_event] += len(aircraft)
+        #departures, in the order they would be popped one by one since aircraft sharing a route board its waiting passengers in turn
+        #that is by time, then queued departures before those scheduled by turnarounds (which are only pushed once the turnaround, a later kind, is popped), then by id
+        queued = kinds==departure_event
+        aircraft = np.concatenate((entities[queued],aircraft))
+        departure_times = np.concatenate((times[queued],turnaround_times))
+        from_turnaround = np.arange(len(aircraft))>=np.count_nonzero(queued)
+        order = np.lexsort((aircraft,from_turnaround,departure_times))
+        aircraft,departure_times = aircraft[order],departure_times[order]
+        routes = self.aircraft_route[aircraft]
+        boarding = np.zeros(len(aircraft),dtype=np.int64)
+        for departures in get_route_rounds(routes): #each round holds at most one departure per route, so its boarding can be done together
+            boarding[departures] = self.board_passengers(routes[departures],departure_times[departures],self.aircraft_seats[aircraft[departures]])
+        self.aircraft_load[aircraft] = boarding
+        self.aircraft_state[aircraft] = airborne_state
+        new_keys.append(get_event_key(departure_times+self.route_block_time[routes],arrival_event,aircraft))
+        #ferry sailings
+        ferries = entities[kinds==ferry_sailing_event]
+        self.ferry_sailings[ferries] += 1
+        new_keys.append(get_event_key(times[kinds==ferry_sailing_event]+self.ferry_interval[ferries],ferry_sailing_event,ferries))
+        self.event_counts += counts
+        return np.concatenate(new_keys)
+
+    #board the passengers waiting on distinct routes at times (s) onto aircraft with seats, returning the passengers boarded
+    #passengers arrive continuously, so the expected number waiting is brought up to date first and whole passengers board, the fraction left over keeps waiting
+    def board_passengers(self,routes : np.ndarray,times : np.ndarray,seats : np.ndarray) -> np.ndarray:
+        waiting = self.route_waiting[routes]+self.route_demand_rate[routes]*(times-self.route_updated[routes])
+        boarding = np.minimum(seats,np.floor(waiting).astype(np.int64))
+        self.route_waiting[routes] = waiting-boarding
+        self.route_updated[routes] = times
+        return boarding
+
+    #add event keys to the queue, keeping it sorted
+    def schedule_events(self,keys : np.ndarray) -> None:
+        keys = np.sort(np.asarray(keys,dtype=np.int64))
+        self.events = np.insert(self.events,np.searchsorted(self.events,keys),keys)
+
+    #totals over the simulation so far
+    def get_statistics(self) -> dict[str,float]:
+        waiting = self.route_waiting+self.route_demand_rate*(self.time-self.route_updated)
+        statistics = {"time":self.time/seconds_per_hour,"pending_events":len(self.events),"aircraft":len(self.aircraft_route),"routes":len(self.route_origin),
+                      "airborne_aircraft":int(np.count_nonzero(self.aircraft_state==airborne_state)),"flights":int(self.aircraft_flights.sum()),
+                      "passengers_carried":int(self.route_carried.sum()),"passengers_waiting":float(waiting.sum()),"block_hours":float(self.aircraft_block_time.sum())/seconds_per_hour,
+                      "ferry_sailings":int(self.ferry_sailings.sum())}
+        for name,count in zip(event_names,self.event_counts.tolist()):
+            statistics[name + "_events"] = count
+        return statistics
+
+    #write the full state, including the pending events, to a single .npz file, so a long simulation can be resumed with load
+    def save(self,filepath : str) -> None:
+        temporary_filepath = filepath + ".tmp.npz" #written whole then renamed, so a crash never leaves a partial checkpoint behind
+        arrays = {name:getattr(self,name) for name in route_columns+aircraft_columns+ferry_columns}
+        np.savez(temporary_filepath,version=checkpoint_format_version,time=self.time,turnaround_time=self.turnaround_time,num_airports=len(self.network.airport_names),
+                 events=self.events,event_counts=self.event_counts,**arrays)
+        os.replace(temporary_filepath,filepath)
+
+    #resume a checkpoint written by save against the same network
+    @classmethod
+    def load(cls,network,filepath : str):
+        with np.load(filepath) as arrays:
+            if int(arrays["version"])!=checkpoint_format_version:
+                raise ValueError("flight operations checkpoint " + filepath + " has format version " + str(int(arrays["version"])) + ", expected " + str(checkpoint_format_version))
+            if int(arrays["num_airports"])!=len(network.airport_names) or len(arrays["ferry_interval"])!=len(network.ferry_names):
+                raise ValueError("flight operations checkpoint " + filepath + " was written for a different network")
+            operations = cls.__new__(cls)
+            operations.network = network
+            operations.turnaround_time = float(arrays["turnaround_time"])
+            operations.time = int(arrays["time"])
+            operations.events = arrays["events"].copy()
+            operations.event_counts = arrays["event_counts"].copy()
+            for name in route_columns+aircraft_columns+ferry_columns:
+                setattr(operations,name,arrays[name].copy())
+        operations.route_indices_dict = {pair:route for route,pair in enumerate(zip(operations.route_origin.tolist(),operations.route_destination.tolist()))}
+        return operations
+
+#split positions into rounds where round r holds the r-th position of every route, each round in increasing position order
+#so processing the rounds in turn processes every route's positions in order
+def get_route_rounds(routes : np.ndarray) -> list[np.ndarray]:
+    if len(routes)==0:
+        return []
+    by_route = np.argsort(routes,kind='stable')
+    sorted_routes = routes[by_route]
+    group_starts = np.flatnonzero(np.concatenate(([True],sorted_routes[1:]!=sorted_routes[:-1])))
+    ranks = np.empty(len(routes),dtype=np.int64)
+    ranks[by_route] = np.arange(len(routes))-np.repeat(group_starts,np.diff(np.append(group_starts,len(routes))))
+    by_rank = np.argsort(ranks,kind='stable')
+    return np.split(by_rank,np.searchsorted(ranks[by_rank],np.arange(1,ranks.max()+1)))
+
+#queue key of events of kind for aircraft or ferry ids at times (s)
+def get_event_key(times : np.ndarray,kind : int,entities : np.ndarray) -> np.ndarray:
+    return (np.asarray(times,dtype=np.int64)<<time_shift)|(kind<<entity_bits)|np.asarray(entities,dtype=np.int64)
+
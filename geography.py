@@ -1,9 +1,13 @@
 import math as m
 import numpy as np
-import tqdm
 import time
+#other project files
+import lazy_import
+
+tqdm = lazy_import.Lazy_Module("tqdm")
 
 radius = 6371;#radius of the earth in km, assuming a perfect sphere
+default_tile_size = 256#rows/columns of the distance matrix computed per tile, 256x256 float64 temporaries (512kB each) stay within cache
 
 #calculate the great circle distance between one point on the globe and all other points on the globe
 def get_great_circle_distance(local_latitude,local_longitude,array_latitude,array_longitude):
@@ -31,18 +35,96 @@ def get_great_circle_distance_array(latitude : np.ndarray,longitude : np.ndarray
     
     return distance_array
 
-def great_circle_test(num_examples,min_latitude,max_latitude,min_longitude,max_longitude):
+#calculate the great circle distance between broadcastable arrays of points (radians) using the haversine formula, which unlike arccos stays accurate for nearby points and never returns NaN
+def get_haversine_distance(latitude_a,longitude_a,latitude_b,longitude_b):
+    #source for formula is https://en.wikipedia.org/wiki/Haversine_formula
+    haversine = (np.sin((latitude_b-latitude_a)/2)**2)+(np.cos(latitude_a)*np.cos(latitude_b)*(np.sin((longitude_b-longitude_a)/2)**2))
+    haversine = np.clip(haversine,0,1)
+    distance = 2*radius*np.arctan2(np.sqrt(haversine),np.sqrt(1-haversine))
+    return distance
+
+#sin/cos vectors reused by every tile of the distance matrix, half angles let the haversine terms be built from products rather than differences of angles
+class Great_Circle_Terms():
+    def __init__(self,latitude : np.ndarray,longitude : np.ndarray):
+        latitude = np.asarray(latitude,dtype=np.float64)
+        longitude = np.asarray(longitude,dtype=np.float64)
+        self.sin_half_latitude = np.sin(latitude/2)
+        self.cos_half_latitude = np.cos(latitude/2)
+        self.sin_half_longitude = np.sin(longitude/2)
+        self.cos_half_longitude = np.cos(longitude/2)
+        self.cos_latitude = np.cos(latitude)
+
+    #great circle distance (km) between the row points and column points as a float64 tile
+    def get_tile(self,rows : slice,columns : slice) -> np.ndarray:
+        #sin((b-a)/2) = sin(b/2)cos(a/2)-cos(b/2)sin(a/2)
+        sin_half_dlat = np.multiply.outer(self.cos_half_latitude[rows],self.sin_half_latitude[columns])
+        sin_half_dlat -= np.multiply.outer(self.sin_half_latitude[rows],self.cos_half_latitude[columns])
+        sin_half_dlon = np.multiply.outer(self.cos_half_longitude[rows],self.sin_half_longitude[columns])
+        sin_half_dlon -= np.multiply.outer(self.sin_half_longitude[rows],self.cos_half_longitude[columns])
+        haversine = np.square(sin_half_dlat,out=sin_half_dlat)
+        sin_half_dlon = np.square(sin_half_dlon,out=sin_half_dlon)
+        sin_half_dlon *= self.cos_latitude[rows,np.newaxis]
+        sin_half_dlon *= self.cos_latitude[np.newaxis,columns]
+        haversine += sin_half_dlon
+        np.clip(haversine,0,1,out=haversine)
+        distance = np.arctan2(np.sqrt(haversine),np.sqrt(1-haversine),out=haversine)
+        distance *= 2*radius
+        return distance
+
+#calculates the great circle distance between all point pairs (radians) tile by tile, only entries on or above the diagonal are computed and then mirrored
+#out may be any preallocated (N,N) array (eg a np.memmap), and dtype sets the storage precision when out is not given, peak temporary memory is a few tiles regardless of N
+def get_great_circle_distance_matrix(latitude : np.ndarray,longitude : np.ndarray,out : np.ndarray = None,dtype=np.float64,tile_size : int = default_tile_size,verbose=True) -> np.ndarray:
+    length = len(latitude)
+    if out is None:
+        out = np.empty((length,length),dtype=dtype)
+    elif out.shape!=(length,length):
+        raise ValueError("output buffer has shape " + str(out.shape) + ", expected " + str((length,length)))
+    terms = Great_Circle_Terms(latitude,longitude)
+    for row_start in tqdm.tqdm(range(0,length,tile_size),desc="Calculating Great Circle Distances",disable = verbose==False):
+        fill_great_circle_tile_row(terms,out,row_start,tile_size)
+    return out
+
+#compute the tiles of one row of tiles from the diagonal rightwards, writing them and their mirror images into out
+#the tile rows write disjoint entries, so they can be filled in any order or in parallel
+def fill_great_circle_tile_row(terms : Great_Circle_Terms,out : np.ndarray,row_start : int,tile_size : int = default_tile_size) -> None:
+    length = out.shape[0]
+    rows = slice(row_start,min(row_start+tile_size,length))
+    for column_start in range(row_start,length,tile_size):
+        columns = slice(column_start,min(column_start+tile_size,length))
+        tile = terms.get_tile(rows,columns)
+        if column_start==row_start: #diagonal tiles are mirrored too, so every entry (i,j) is the value computed with row min(i,j) and the matrix is exactly symmetric
+            lower = np.tril_indices(tile.shape[0],-1)
+            tile[lower] = tile.T[lower]
+        out[rows,columns] = tile
+        if column_start!=row_start:
+            out[columns,rows] = tile.T
+
+#wrapper for get_great_circle_distance_matrix, serving to convert degrees to radians
+def get_great_circle_distance_matrix_degrees(latitude : np.ndarray,longitude : np.ndarray,out : np.ndarray = None,dtype=np.float64,tile_size : int = default_tile_size,verbose=True) -> np.ndarray:
+    latitude = np.radians(latitude)
+    longitude = np.radians(longitude)
+    distance_array = get_great_circle_distance_matrix(latitude,longitude,out,dtype,tile_size,verbose)
+    return distance_array
+
+#compare the row by row arccos implementation against the tiled haversine kernel on randomly placed airports
+def great_circle_test(num_examples,min_latitude,max_latitude,min_longitude,max_longitude,dtype=np.float64):
     max_latitude = np.radians(max_latitude)
     min_latitude = np.radians(min_latitude)
     max_longitude = np.radians(max_longitude)
     min_longitude = np.radians(min_longitude)
     latitudes = (np.random.random_sample(size=num_examples)*(max_latitude-min_latitude))+min_latitude
     longitudes = (np.random.random_sample(size=num_examples)*(max_longitude-min_longitude))+min_longitude
-    start_time = time.time()
-    output = get_great_circle_distance_array(latitudes,longitudes)
-    end_time = time.time()
-    print('time to calculate pairs of ',num_examples,' airports = ',(end_time-start_time),' seconds')
+    start_time = time.perf_counter()
+    output = get_great_circle_distance_array(latitudes,longitudes,verbose=False)
+    end_time = time.perf_counter()
+    row_time = end_time-start_time
+    start_time = time.perf_counter()
+    tiled_output = get_great_circle_distance_matrix(latitudes,longitudes,dtype=dtype,verbose=False)
+    end_time = time.perf_counter()
+    tiled_time = end_time-start_time
+    print('time to calculate pairs of ',num_examples,' airports (row by row arccos) = ',row_time,' seconds')
+    print('time to calculate pairs of ',num_examples,' airports (tiled haversine) = ',tiled_time,' seconds, speedup = ',row_time/tiled_time)
+    print('NaN results (row by row arccos) = ',np.count_nonzero(np.isnan(output)),', NaN results (tiled haversine) = ',np.count_nonzero(np.isnan(tiled_output)))
+    print('max difference between implementations = ',np.nanmax(np.abs(output-tiled_output)),' km')
     print('result')
-    print(np.round(output))
-    
-
+    print(np.round(tiled_output))
@@ -0,0 +1,128 @@
+#external packages
+import json
+import time
+import tracemalloc
+import numpy as np
+
+#record where the time and memory of network setup goes, stage by stage
+#each stage records wall time, cpu time, peak memory allocated above what was allocated when it started (if memory tracking is on) and the numpy arrays it created
+#stages nest, a stage's peak includes the peaks of the stages inside it
+
+#context manager used for every stage while profiling is disabled, so a disabled profiler costs one method call per stage
+class Null_Stage():
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exception_type,exception,traceback) -> bool:
+        return False
+
+null_stage = Null_Stage()
+
+#a stage being timed by a Profiler
+class Profiled_Stage():
+    def __init__(self,profiler,name : str,target : object):
+        self.profiler = profiler
+        self.name = name
+        self.target = target #object whose numpy array attributes are reported once the stage finishes
+
+    def __enter__(self):
+        self.profiler.start_stage(self)
+        return self
+
+    def __exit__(self,exception_type,exception,traceback) -> bool:
+        self.profiler.end_stage(self)
+        return False
+
+class Profiler():
+    def __init__(self,enabled : bool = False,track_memory : bool = True):
+        self.enabled = enabled
+        self.track_memory = track_memory #measure peak allocations with tracemalloc, which slows down python heavy stages
+        self.records : list[dict] = [] #one record per finished stage, in the order they started
+        self.open_stages : list[Profiled_Stage] = []
+        self.started_tracemalloc = False
+
+    #context manager timing the code inside it as a stage called name, arrays on target created or replaced during the stage are reported
+    def stage(self,name : str,target : object = None):
+        if not self.enabled:
+            return null_stage
+        return Profiled_Stage(self,name,target)
+
+    def start_stage(self,stage : Profiled_Stage) -> None:
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        stage.record = {"name":stage.name,"depth":len(self.open_stages),"parent":self.open_stages[-1].name if self.open_stages else None}
+        self.records.append(stage.record)
+        stage.arrays_before = get_array_ids(stage.target)
+        if self.track_memory:
+            current_bytes,peak_bytes = tracemalloc.get_traced_memory()
+            if self.open_stages: #fold the enclosing stage's peak so far into it before resetting the peak for this stage
+                self.open_stages[-1].peak_seen = max(self.open_stages[-1].peak_seen,peak_bytes)
+            tracemalloc.reset_peak()
+            stage.start_bytes = current_bytes
+            stage.peak_seen = current_bytes
+        self.open_stages.append(stage)
+        stage.start_cpu_time = time.process_time()
+        stage.start_time = time.perf_counter()
+
+    def end_stage(self,stage : Profiled_Stage) -> None:
+        wall_time = time.perf_counter()-stage.start_time
+        cpu_time = time.process_time()-stage.start_cpu_time
+        self.open_stages.pop()
+        stage.record["wall_time"] = wall_time
+        stage.record["cpu_time"] = cpu_time
+        if self.track_memory:
+            current_bytes,peak_bytes = tracemalloc.get_traced_memory()
+            stage.peak_seen = max(stage.peak_seen,peak_bytes)
+            stage.record["peak_allocated_bytes"] = stage.peak_seen-stage.start_bytes
+            stage.record["retained_bytes"] = current_bytes-stage.start_bytes
+            if self.open_stages:
+                self.open_stages[-1].peak_seen = max(self.open_stages[-1].peak_seen,stage.peak_seen)
+        stage.record["arrays"] = get_new_arrays(stage.target,stage.arrays_before)
+        if not self.open_stages and self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    #the records of every finished stage with the given name
+    def get_stage(self,name : str) -> list[dict]:
+        return [record for record in self.records if record["name"]==name]
+
+    #total wall time of every stage with the given name
+    def get_total_wall_time(self,name : str) -> float:
+        return sum(record.get("wall_time",0) for record in self.get_stage(name))
+
+    #the report as a JSON string, also written to filepath if given
+    def to_json(self,filepath : str = None) -> str:
+        report = json.dumps({"stages":self.records},indent=2)
+        if filepath is not None:
+            with open(filepath,'w') as file:
+                file.write(report)
+        return report
+
+    #print one line per stage, indented by nesting depth
+    def display_report(self) -> None:
+        for record in self.records:
+            line = "  "*record["depth"] + record["name"] + " : wall " + str(round(record.get("wall_time",0),4)) + "s, cpu " + str(round(record.get("cpu_time",0),4)) + "s"
+            if "peak_allocated_bytes" in record:
+                line += ", peak " + str(round(record["peak_allocated_bytes"]/(1<<20),2)) + "MB"
+            print(line)
+
+    #forget every recorded stage
+    def clear(self) -> None:
+        self.records = []
+
+#ids of the numpy array attributes of an object
+def get_array_ids(target : object) -> dict[str,int]:
+    if target is None:
+        return {}
+    return {name:id(value) for name,value in vars(target).items() if isinstance(value,np.ndarray)}
+
+#shape, dtype and size of the numpy array attributes of an object which are not in arrays_before (by name and identity)
+def get_new_arrays(target : object,arrays_before : dict[str,int]) -> dict[str,dict]:
+    if target is None:
+        return {}
+    new_arrays = {}
+    for name,value in vars(target).items():
+        if isinstance(value,np.ndarray) and arrays_before.get(name)!=id(value):
+            new_arrays[name] = {"shape":list(value.shape),"dtype":str(value.dtype),"nbytes":int(value.nbytes)}
+    return new_arrays
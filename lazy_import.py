@@ -0,0 +1,15 @@
+#external packages
+import importlib
+
+#stand in for a module which is only imported the first time one of its attributes is used
+#heavy packages (pandas, tqdm, matplotlib) are bound to these at the top of a file, so importing the project stays fast when they are never needed
+class Lazy_Module():
+    def __init__(self,name : str):
+        self.name = name #full module name, eg "matplotlib.pyplot"
+        self.module = None #the real module once imported
+
+    #only called for attributes this object does not have itself, ie those of the real module
+    def __getattr__(self,attribute : str):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module,attribute)
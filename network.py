@@ -1,68 +1,380 @@
 #external packages
-import pandas as pd
+import os
+import math
+import copy
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
 import numpy as np
-import tqdm
 
 #other project files
+import lazy_import
 import geography as geo
 import simulation as sim
 import utility
+import network_cache
+import road_graph
+import spatial_index
+import route_performance
+import parallel_setup
+import od_query
+import od_export
+import contraction_hierarchy
+import road_routing
+import sparse_demand
+import condensed_matrix
+
+pd = lazy_import.Lazy_Module("pandas") #only needed once csvs are read
+tqdm = lazy_import.Lazy_Module("tqdm")
+
+#columns read from each input csv, with the type they are parsed as
+airport_csv_dtypes = {"Name":str,"Location":str,"State":str,"Country":str,"Population (k)":float,"GDP/head ($k)":float}
+ferry_csv_dtypes = {"Ferry Name":str,"Transport Time":float,"Car Load + Unload Time":float,"Pax Load Time":float,"Car Cost":float,"Pax Cost":float,"Frequency":float,"Distance (km)":float}
+road_csv_dtypes = {"Start Node":str,"Start State":str,"Start Country":str,"End Node":str,"End State":str,"End Country":str,"Distance (km)":float,"Speed (km/h)":float,"Has Ferry":str,"Ferries":str}
+
+demand_block_rows = 512 #origins processed per band when calculating travel demand
+sparse_demand_block_rows = 128 #origins processed per band when calculating sparse travel demand, smaller since each band also holds distances and selection masks
+airport_folder = 'airport_csvs' #folders the network is loaded from by setup_network
+ferry_folder = 'ferry_csvs'
+road_folder = 'road_csvs'
+distance_metric_sources = ("great_circle","road_distance","road_time") #what the distance metric driving travel demand can be based on
+matrix_storages = ("memory","memmap","condensed") #where the N x N matrices can be stored, condensed keeps only the upper triangle of symmetric matrices
+road_time_equivalent_speed = 80 #km/h, converts road travel time into an equivalent distance when the distance metric is based on road time
+
+#write any changes to a memory mapped matrix out to its file, nothing to do for matrices in RAM
+def flush_matrix(matrix : np.ndarray) -> None:
+    if isinstance(matrix,np.memmap):
+        matrix.flush()
+
+#read the columns of a csv file we use with explicit dtypes
+def read_csv_table(filepath : str,dtypes : dict[str,type]) -> "pd.DataFrame":
+    return pd.read_csv(filepath,usecols=list(dtypes),dtype=dtypes)
+
+#a road travel time/distance matrix with one more node which no road reaches
+def add_unreachable_node(matrix : np.ndarray) -> np.ndarray:
+    size = matrix.shape[0]
+    resized = np.full((size+1,size+1),np.inf)
+    resized[:size,:size] = matrix
+    resized[size,size] = 0
+    return resized
+
+#class attribute of Network computing a setup stage the first time its result is read, for stages a lazy setup (see Simulation.lazy_setup) has skipped
+#the stage stores its result as an ordinary instance attribute, which python finds before this descriptor, so it only ever runs once and assigning the attribute works as usual
+#test whether a stage has run with name in vars(network), hasattr would run it
+class Lazy_Stage():
+    def __init__(self,stage : str,compute=None):
+        self.stage = stage #name the stage is profiled under, and the Network method run when compute is not given
+        self.compute = compute if compute is not None else (lambda network: getattr(network,stage)())
+
+    def __set_name__(self,owner,name : str) -> None:
+        self.name = name
+
+    def __get__(self,network,owner=None):
+        if network is None:
+            return self
+        with network.profiler.stage(self.stage,network):
+            self.compute(network)
+        if self.name not in vars(network):
+            raise AttributeError("stage " + self.stage + " did not produce " + self.name)
+        return vars(network)[self.name]
 
 #network class to store the transport network
 class Network():
+    #results of the setup stages which lazy setup leaves until they are first read
+    great_circle_distance_array = Lazy_Stage("calculate_great_circle_distances")
+    road_travel_time_array = Lazy_Stage("calculate_road_travel")
+    road_travel_distance_array = Lazy_Stage("calculate_road_travel")
+    road_distance_metric_array = Lazy_Stage("calculate_distance_metric")
+    all_demand_pairs_np = Lazy_Stage("calculate_travel_demand")
+    sparse_demand = Lazy_Stage("calculate_sparse_travel_demand",lambda network: network.calculate_sparse_travel_demand(network.demand_top_k,network.demand_share_threshold))
     
     #create the network class
-    def __init__(self,parent : sim.Simulation) -> None:
+    def __init__(self,parent : "sim.Simulation") -> None:
         self.error_logging = parent.error_logging #take the error logging from the parent simulation
+        self.use_network_cache = parent.use_network_cache #reuse a compiled network from disk when the inputs have not changed
+        self.network_cache_folder = parent.network_cache_folder
+        self.distance_metric_source = parent.distance_metric_source #one of distance_metric_sources
+        self.num_workers = parent.num_workers #processes used by parallel stages, None uses every core
+        self.profiler = parent.profiler #records the time and memory used by each setup stage when enabled
+        self.matrix_storage = parent.matrix_storage #"memory" holds the N x N matrices in RAM, "memmap" backs them with .npy files in matrix_folder
+        self.matrix_folder = parent.matrix_folder
+        self.matrix_dtype = parent.matrix_dtype #storage precision of the N x N matrices, np.float32 halves their memory
+        self.demand_mode = parent.demand_mode #"dense" for the full all_demand_pairs_np matrix, "sparse" for the top destinations of each origin in sparse_demand
+        self.demand_top_k = parent.demand_top_k #destinations kept per origin in sparse mode, None keeps all
+        self.demand_share_threshold = parent.demand_share_threshold #smallest share of an origin's demand kept in sparse mode, None keeps all
+        self.parallel_setup = parent.parallel_setup #load csvs on a thread pool and compute the N x N matrices across num_workers processes
+        self.lazy_setup = parent.lazy_setup #load the csvs during setup but leave every N x N matrix (and demand) until it is first read
+        self.shared_matrices : parallel_setup.Shared_Matrices = None #set while a parallel setup is computing the matrices
+        self.od_query_cache = od_query.OD_Query_Cache(parent.od_query_cache_size) #records of recently queried origin-destination pairs
+        self.km_per_mil = 100#annual passenger (thousand)km per million dollars GDP, typically about 5'000km per pax per 50k so 100'000 is normal, this will be broke into categories later
+        self.constant_km = 50#extra km's added onto each trip
     
-    #load up all the network data
+    #load up all the network data, from the compiled network cache if the input files and constants are unchanged
     def setup_network(self) -> None:
-        self.load_all_airports()
-        self.load_all_ferries()
-        self.load_all_roads()
-        self.calculate_airport_statistics()
-        self.calculate_travel_demand()
+        profiler = self.profiler
+        if self.use_network_cache:
+            with profiler.stage("load_network_cache",self):
+                cache_key = self.get_network_cache_key()
+                cache_hit = network_cache.has_entry(self.network_cache_folder,cache_key)
+                if cache_hit:
+                    network_cache.load_entry(self.network_cache_folder,cache_key,self)
+                    self.build_spatial_index() #cheap to rebuild, so it is never cached
+            if cache_hit:
+                return
+        with profiler.stage("load_all_airports",self):
+            self.load_all_airports(airport_folder)
+        with profiler.stage("load_all_ferries",self):
+            self.load_all_ferries(ferry_folder)
+        with profiler.stage("load_all_roads",self):
+            self.load_all_roads(road_folder)
+        if self.lazy_setup: #the matrix stages run when their results are first read, and the network is only cached once fully computed
+            with profiler.stage("calculate_economic_data",self):
+                self.calculate_economic_data()
+            return
+        if self.demand_mode=="sparse":
+            with profiler.stage("calculate_economic_data",self):
+                self.calculate_economic_data()
+            with profiler.stage("calculate_sparse_travel_demand",self): #road travel, if the metric needs it, is streamed with the demand
+                self.calculate_sparse_travel_demand(self.demand_top_k,self.demand_share_threshold)
+        else:
+            #condensed matrices are built by Condensed_Matrix itself, so they are always computed serially
+            parallel = self.parallel_setup and self.matrix_storage!="condensed"
+            with parallel_setup.Shared_Matrices(self,self.num_workers) if parallel else contextlib.nullcontext():
+                with profiler.stage("calculate_airport_statistics",self):
+                    self.calculate_airport_statistics()
+                with profiler.stage("calculate_travel_demand",self):
+                    self.calculate_travel_demand()
+        if self.use_network_cache:
+            with profiler.stage("save_network_cache",self):
+                network_cache.save_entry(self.network_cache_folder,cache_key,self)
+
+    #key identifying the compiled network for the current input files and model constants
+    def get_network_cache_key(self) -> str:
+        constants = {"km_per_mil":self.km_per_mil,"constant_km":self.constant_km,"distance_metric_source":self.distance_metric_source,
+                     "demand_mode":self.demand_mode,"demand_top_k":self.demand_top_k,"demand_share_threshold":self.demand_share_threshold,
+                     "matrix_storage":self.matrix_storage,"matrix_dtype":np.dtype(self.matrix_dtype).name}
+        cache_key = network_cache.get_input_hash([airport_folder,ferry_folder,road_folder],constants)
+        return cache_key
+
+    #read csv files with the given column dtypes, in the order of filepaths
+    #in a parallel setup the files are all read at once on a thread pool, otherwise each is read only when the previous one has been loaded
+    def read_csv_tables(self,filepaths : list[str],dtypes : dict[str,type]):
+        if not self.parallel_setup or len(filepaths)<=1:
+            return (read_csv_table(filepath,dtypes) for filepath in filepaths)
+        with ThreadPoolExecutor(self.num_workers) as executor: #map keeps the order of filepaths whichever file finishes first
+            return list(executor.map(lambda filepath: read_csv_table(filepath,dtypes),filepaths))
 
     #load all the airports from files in the airport folder
     def load_all_airports(self,airport_folder='airport_csvs'):
         self.create_airport_variables() #create the variables which store airport properties
         airport_filepaths = utility.get_filepaths_in_folder(airport_folder) #get every file in the airports folder
-        for airport_filepaths in tqdm.tqdm(airport_filepaths,desc="Loading Airport Data",disable=self.error_logging==False): #load the airports from every file
-            self.load_airports(airport_filepaths)
+        airport_tables = self.read_csv_tables(airport_filepaths,airport_csv_dtypes)
+        for airport_filepath,df in tqdm.tqdm(zip(airport_filepaths,airport_tables),total=len(airport_filepaths),desc="Loading Airport Data",disable=self.error_logging==False): #load the airports from every file
+            self.load_airports(airport_filepath,df)
         self.store_coordinates_np()
         self.store_economics_np()
 
     #calculate statistics relating to the airports which will remain constant over our simulation run
     def calculate_airport_statistics(self):
-        self.calculate_great_circle_distances()
-        self.calculate_distance_metric()
-        self.calculate_economic_data()
-        self.km_per_mil = 100#annual passenger (thousand)km per million dollars GDP, typically about 5'000km per pax per 50k so 100'000 is normal, this will be broke into categories later
-        self.constant_km = 50#extra km's added onto each trip
+        with self.profiler.stage("calculate_great_circle_distances",self):
+            self.calculate_great_circle_distances()
+        if self.distance_metric_source!="great_circle":
+            with self.profiler.stage("calculate_road_travel",self):
+                self.calculate_road_travel()
+        with self.profiler.stage("calculate_distance_metric",self):
+            self.calculate_distance_metric()
+        with self.profiler.stage("calculate_economic_data",self):
+            self.calculate_economic_data()
 
-    #calculate travel demand between all origin destination pairs
-    def calculate_travel_demand(self):
+    #calculate travel demand between all origin destination pairs, filling the output row-band by row-band so only one band of temporaries exists at a time
+    #block_rows = None computes the whole matrix in a single band, out may be a preallocated (N,N) array to fill instead of allocating a new one
+    def calculate_travel_demand(self,block_rows : int = demand_block_rows,out : np.ndarray = None) -> None:
         num_airports = len(self.airport_gdps_np)
-        all_total_demand_to_others = []
-        for i in tqdm.tqdm(range(num_airports),desc="Calculating Origin-Destination Travel Demand Between City Pairs",disable=self.error_logging==False): #calculate origin-destination travel demand
-            relative_demand_to_others = self.airport_gdps_np*self.road_distance_metric_array[i,:]
-            relative_demand_to_others[i] = 0 #remove demand to self
-            total_relative_demand = np.sum(relative_demand_to_others)
-            demand_fraction_to_others = relative_demand_to_others/total_relative_demand #calculate the fraction of demand from a origin going to each destination
-            distance_adjusted_demand_fraction_to_others = np.divide(demand_fraction_to_others,self.great_circle_distance_array[i,:]+self.constant_km)
-            distance_adjusted_demand_fraction_to_others[i] = 0 #remove demand to self
-            total_demand = self.km_per_mil*self.airport_gdps_np[i]#total annual long distance passenger demand, in pax-km
-            total_demand_to_others = distance_adjusted_demand_fraction_to_others*total_demand #total demand to each city, k pax/year
-            all_total_demand_to_others.append(total_demand_to_others)
-        
-        self.all_demand_pairs_np = np.row_stack(all_total_demand_to_others)
+        if block_rows is None:
+            block_rows = max(num_airports,1)
+        if out is None and self.shared_matrices is not None:
+            self.shared_matrices.create("all_demand_pairs_np")
+            self.shared_matrices.run_bands("travel_demand",block_rows,"Calculating Origin-Destination Travel Demand Between City Pairs")
+            return
+        if out is None:
+            out = self.create_pairwise_matrix("all_demand_pairs_np")
+        for row_start in tqdm.tqdm(range(0,num_airports,block_rows),desc="Calculating Origin-Destination Travel Demand Between City Pairs",disable=self.error_logging==False): #calculate origin-destination travel demand
+            rows = slice(row_start,min(row_start+block_rows,num_airports))
+            self.calculate_travel_demand_rows(rows,out[rows])
+        flush_matrix(out)
+        self.all_demand_pairs_np = out
+
+    #calculate travel demand from the origins in rows to every destination, writing into out (a (len(rows),N) array)
+    #the distance metric and great circle distance rows of the band default to those rows of the full matrices
+    def calculate_travel_demand_rows(self,rows : slice,out : np.ndarray,distance_metric_rows : np.ndarray = None,great_circle_distance_rows : np.ndarray = None) -> np.ndarray:
+        if distance_metric_rows is None:
+            distance_metric_rows = self.road_distance_metric_array[rows]
+        if great_circle_distance_rows is None:
+            great_circle_distance_rows = self.great_circle_distance_array[rows]
+        band_diagonal = (np.arange(out.shape[0]),np.arange(rows.start,rows.start+out.shape[0])) #position of each origin's demand to itself within the band
+        np.multiply(distance_metric_rows,self.airport_gdps_np,out=out)
+        out[band_diagonal] = 0 #remove demand to self
+        total_relative_demand = np.sum(out,axis=1,keepdims=True)
+        total_relative_demand[total_relative_demand==0] = 1 #an origin with no reachable destinations (eg no road route to anywhere) has no demand rather than NaN
+        out /= total_relative_demand #calculate the fraction of demand from a origin going to each destination
+        out /= great_circle_distance_rows+self.constant_km
+        out[band_diagonal] = 0 #remove demand to self
+        total_demand = self.km_per_mil*self.airport_gdps_np[rows]#total annual long distance passenger demand, in pax-km
+        out *= total_demand[:,np.newaxis] #total demand to each city, k pax/year
+        return out
+
+    #calculate travel demand keeping only each origin's top_k destinations and/or those with at least share_threshold of its demand, storing it as self.sparse_demand
+    #distances and demand are streamed one band of origins at a time, so the dense N x N matrices are never built and memory stays O(N*k)
+    #a road based distance metric is streamed too, searching the road graph from each origin of the band, rather than from the N x N road travel matrices
+    #those are only read if something else has already computed them
+    def calculate_sparse_travel_demand(self,top_k : int = None,share_threshold : float = None,block_rows : int = sparse_demand_block_rows) -> None:
+        num_airports = len(self.airport_gdps_np)
+        great_circle_terms = geo.Great_Circle_Terms(np.radians(self.airport_latitudes_np),np.radians(self.airport_longitudes_np))
+        stream_road_travel = self.distance_metric_source!="great_circle" and "road_travel_time_array" not in vars(self)
+        if stream_road_travel:
+            road_times = road_routing.get_road_travel_times(self.road_graph,self.ferry_transport_time,self.ferry_load_time_car,self.ferry_frequency)
+            road_distances = road_routing.get_road_travel_distances(self.road_graph,self.ferry_distance)
+            road_graph_lists = road_routing.get_graph_lists(self.road_graph,road_times,road_distances)
+        all_columns = slice(0,num_airports)
+        band_counts : list[np.ndarray] = []
+        band_indices : list[np.ndarray] = []
+        band_data : list[np.ndarray] = []
+        residual = np.zeros(num_airports)
+        for row_start in tqdm.tqdm(range(0,num_airports,block_rows),desc="Calculating Sparse Origin-Destination Travel Demand",disable=self.error_logging==False):
+            rows = slice(row_start,min(row_start+block_rows,num_airports))
+            great_circle_distance_rows = great_circle_terms.get_tile(rows,all_columns)
+            if stream_road_travel:
+                road_travel_rows = road_routing.get_road_travel_rows(road_graph_lists,range(rows.start,rows.stop))
+                distance_metric_rows = self.get_distance_metric(great_circle_distance_rows,rows,*road_travel_rows)
+            else:
+                distance_metric_rows = self.get_distance_metric(great_circle_distance_rows,rows)
+            band = self.calculate_travel_demand_rows(rows,np.empty(great_circle_distance_rows.shape),distance_metric_rows,great_circle_distance_rows)
+            counts,indices,data,residual[rows] = sparse_demand.select_band_entries(band,top_k,share_threshold)
+            band_counts.append(counts)
+            band_indices.append(indices)
+            band_data.append(data)
+        indptr = np.concatenate(([0],np.cumsum(np.concatenate(band_counts)))).astype(np.int64) if band_counts else np.zeros(1,dtype=np.int64)
+        indices = np.concatenate(band_indices).astype(np.int64) if band_indices else np.zeros(0,dtype=np.int64)
+        data = np.concatenate(band_data) if band_data else np.zeros(0)
+        self.sparse_demand = sparse_demand.Sparse_Demand(num_airports,indptr,indices,data,residual)
 
     def calculate_great_circle_distances(self):
-        self.great_circle_distance_array = geo.get_great_circle_distance_array_degrees(self.airport_latitudes_np,self.airport_longitudes_np,self.error_logging)
+        if self.matrix_storage=="condensed":
+            great_circle_terms = geo.Great_Circle_Terms(np.radians(self.airport_latitudes_np),np.radians(self.airport_longitudes_np))
+            self.great_circle_distance_array = condensed_matrix.Condensed_Matrix.from_tiles(len(self.airport_latitudes_np),great_circle_terms.get_tile,self.matrix_dtype)
+            return
+        if self.shared_matrices is not None:
+            self.shared_matrices.create("great_circle_distance_array")
+            self.shared_matrices.run_bands("great_circle",geo.default_tile_size,"Calculating Great Circle Distances")
+            return
+        out = self.create_pairwise_matrix("great_circle_distance_array")
+        self.great_circle_distance_array = geo.get_great_circle_distance_matrix_degrees(self.airport_latitudes_np,self.airport_longitudes_np,out,verbose=self.error_logging)
+        flush_matrix(self.great_circle_distance_array)
+
+    #allocate an N x N matrix of matrix_dtype for the airports, in RAM or as a memory mapped .npy file in matrix_folder depending on matrix_storage
+    #condensed storage only applies to symmetric matrices, so asymmetric ones (demand) are held in RAM
+    def create_pairwise_matrix(self,name : str) -> np.ndarray:
+        num_airports = len(self.airport_latitudes_np)
+        if self.matrix_storage=="memmap":
+            os.makedirs(self.matrix_folder,exist_ok=True)
+            matrix = np.lib.format.open_memmap(os.path.join(self.matrix_folder,name + ".npy"),mode='w+',dtype=self.matrix_dtype,shape=(num_airports,num_airports))
+        elif self.matrix_storage in ("memory","condensed"):
+            matrix = np.empty((num_airports,num_airports),dtype=self.matrix_dtype)
+        else:
+            raise ValueError("matrix storage " + str(self.matrix_storage) + " is not one of " + str(matrix_storages))
+        return matrix
+
+    #read an N x N matrix attribute (eg "all_demand_pairs_np") back one band of rows at a time, yielding the rows slice and a copy of those rows
+    #with memmap storage only the band being read needs to be resident
+    def iterate_matrix_rows(self,name : str,block_rows : int = demand_block_rows):
+        matrix = getattr(self,name)
+        num_rows = matrix.shape[0]
+        for row_start in range(0,num_rows,block_rows):
+            rows = slice(row_start,min(row_start+block_rows,num_rows))
+            yield rows,np.array(matrix[rows])
     
+    #build the contraction hierarchy over the road/ferry graph for point to point road routes, or load it from cache_folder if these roads have been contracted before
+    #roads cost the same travel time (including ferry crossings and waits) and distance as in calculate_road_travel
+    def build_road_hierarchy(self,cache_folder : str = contraction_hierarchy.hierarchy_cache_folder) -> None:
+        road_times = road_routing.get_road_travel_times(self.road_graph,self.ferry_transport_time,self.ferry_load_time_car,self.ferry_frequency)
+        road_distances = road_routing.get_road_travel_distances(self.road_graph,self.ferry_distance)
+        self.road_hierarchy = contraction_hierarchy.get_contraction_hierarchy(self.road_graph,road_times,road_distances,cache_folder)
+
+    #fastest road route between two airports (unique name tuples or indices), as travel time (hrs), distance (km) and the road indices driven in order
+    #the travel time is inf and there are no roads if no road route exists, the road hierarchy is built on the first call
+    def get_road_route(self,origin,destination) -> tuple[float,float,np.ndarray]:
+        origin_index = int(self.get_airport_indices(origin)[0])
+        destination_index = int(self.get_airport_indices(destination)[0])
+        if origin_index<0 or destination_index<0:
+            self.error_print("Road route requested between unknown airports " + str(origin) + " and " + str(destination))
+            return math.inf,math.inf,np.empty(0,dtype=np.int64)
+        if getattr(self,"road_hierarchy",None) is None:
+            self.build_road_hierarchy()
+        return self.road_hierarchy.query(origin_index,destination_index)
+
+    #calculate the fastest road travel time (hrs) between every pair of airports, including ferry crossings, and the road distance (km) of that route
+    def calculate_road_travel(self):
+        road_times = road_routing.get_road_travel_times(self.road_graph,self.ferry_transport_time,self.ferry_load_time_car,self.ferry_frequency)
+        road_distances = road_routing.get_road_travel_distances(self.road_graph,self.ferry_distance)
+        self.road_travel_time_array,self.road_travel_distance_array = road_routing.get_all_pairs_road_travel(self.road_graph,road_times,road_distances,self.num_workers,self.error_logging)
+        if self.shared_matrices is not None: #the distance metric bands read them
+            self.shared_matrices.share("road_travel_time_array")
+            self.shared_matrices.share("road_travel_distance_array")
+
     #metric defining how willingness to travel (total km*pax to destination given all else equal) scales with distance, at the moment just using a reciprocal metric (so km traveled declines linerally with total km)
-    def calculate_distance_metric(self):
-        self.road_distance_metric_array =  np.reciprocal((self.great_circle_distance_array+50))
+    #distance is the great circle distance by default, or the road distance/time when distance_metric_source selects it, airports with no road route between them get a metric of 0
+    def calculate_distance_metric(self,block_rows : int = demand_block_rows):
+        if self.matrix_storage=="condensed":
+            #the metric is symmetric like the distances it comes from, so it is condensed too
+            if self.distance_metric_source=="great_circle":
+                self.road_distance_metric_array = self.great_circle_distance_array.map(lambda distances: self.get_distance_metric(distances,None))
+            else:
+                self.road_distance_metric_array = condensed_matrix.Condensed_Matrix.from_tiles(len(self.airport_latitudes_np),lambda rows,columns: self.get_distance_metric(None,rows)[:,columns],self.matrix_dtype,float(self.get_distance_metric(None,slice(0,1))[0,0]))
+            return
+        if self.shared_matrices is not None:
+            self.shared_matrices.create("road_distance_metric_array")
+            self.shared_matrices.run_bands("distance_metric",block_rows,"Calculating Distance Metric")
+            return
+        out = self.create_pairwise_matrix("road_distance_metric_array")
+        num_airports = out.shape[0]
+        for row_start in range(0,num_airports,block_rows):
+            rows = slice(row_start,min(row_start+block_rows,num_airports))
+            out[rows] = self.get_distance_metric(self.great_circle_distance_array[rows],rows)
+        flush_matrix(out)
+        self.road_distance_metric_array = out
+
+    #the distance metric for the origins in rows, given their great circle distances to every destination
+    #road travel rows default to those rows of the N x N road travel matrices
+    def get_distance_metric(self,great_circle_distance_rows : np.ndarray,rows : slice,road_travel_time_rows : np.ndarray = None,road_travel_distance_rows : np.ndarray = None) -> np.ndarray:
+        if self.distance_metric_source=="great_circle":
+            distance_metric =  np.reciprocal((great_circle_distance_rows+50))
+        elif self.distance_metric_source=="road_distance":
+            if road_travel_distance_rows is None:
+                road_travel_distance_rows = self.road_travel_distance_array[rows]
+            distance_metric =  np.reciprocal((road_travel_distance_rows+50))
+        elif self.distance_metric_source=="road_time":
+            if road_travel_time_rows is None:
+                road_travel_time_rows = self.road_travel_time_array[rows]
+            distance_metric =  np.reciprocal((road_travel_time_rows*road_time_equivalent_speed+50))
+        else:
+            raise ValueError("distance metric source " + str(self.distance_metric_source) + " is not one of " + str(distance_metric_sources))
+        return distance_metric
+
+    #interpolate block time (hrs), fuel (kg) and cost ($) of flying every airport pair with one payload (kg) from a route performance table, in row bands
+    #the results are symmetric like the great circle distances, so they are condensed in condensed mode
+    def calculate_route_performance(self,performance_table : route_performance.Performance_Table,payload : float,block_rows : int = demand_block_rows) -> None:
+        names = ("route_block_time_array","route_fuel_array","route_cost_array")
+        if self.matrix_storage=="condensed":
+            for position,name in enumerate(names):
+                setattr(self,name,self.great_circle_distance_array.map(lambda distances: performance_table.get_performance(distances,payload)[position]))
+            return
+        outs = [self.create_pairwise_matrix(name) for name in names]
+        for rows,distance_rows in self.iterate_matrix_rows("great_circle_distance_array",block_rows):
+            for out,performance_rows in zip(outs,performance_table.get_performance(distance_rows,payload)):
+                out[rows] = performance_rows
+        for name,out in zip(names,outs):
+            flush_matrix(out)
+            setattr(self,name,out)
 
     #calculate all economic parameters relating to aircraft catchment area
     def calculate_economic_data(self):
@@ -88,53 +400,57 @@ class Network():
     def store_coordinates_np(self):
         self.airport_longitudes_np = np.array(self.airport_longitudes,dtype=float)#longitude stored as a 1D numpy array
         self.airport_latitudes_np = np.array(self.airport_latitudes,dtype=float)#latitude stored as a 1D numpy array
+        self.build_spatial_index()
+
+    #build the spatial index over the airport coordinates, called whenever they change
+    def build_spatial_index(self) -> None:
+        self.airport_spatial_index = spatial_index.Spherical_Index(self.airport_latitudes_np,self.airport_longitudes_np)
+
+    #indices and great circle distances (km) of the k airports nearest each point (degrees), as (Q,k) arrays, closest first
+    def get_nearest_airports(self,latitudes,longitudes,k : int = 1) -> tuple[np.ndarray,np.ndarray]:
+        return self.airport_spatial_index.query_nearest(latitudes,longitudes,k)
+
+    #airports within radius (km) of each point (degrees), as (indptr,indices,distances) in compressed sparse row form, closest first
+    def get_airports_within(self,latitudes,longitudes,radius : float) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+        return self.airport_spatial_index.query_radius(latitudes,longitudes,radius)
 
     #store economic statistics about airport catchment area in a numpy array
     def store_economics_np(self):
         self.airport_populations_np = np.array(self.airport_populations)
         self.airport_gdp_per_heads_np = np.array(self.airport_gdp_per_heads)
 
-    #load all the airports in one particular file
-    def load_airports(self,filepath):
-        df = pd.read_csv(filepath)
+    #load all the airports in one particular file, reading only the columns we use with explicit dtypes
+    #df may be the file already read by read_csv_tables
+    def load_airports(self,filepath,df : "pd.DataFrame" = None):
+        if df is None:
+            df = read_csv_table(filepath,airport_csv_dtypes)
         self.get_airport_names(df)
         self.get_airport_coordinates(df)
         self.get_airport_economics(df)
 
-    #extract coordinates of airports in a dataframe and store as appropriate
-    def get_airport_coordinates(self,df : pd.DataFrame):
-        num_airports = len(df)
-        for i in range(num_airports):
-            location : str = utility.convert_object_to_str(df.loc[i,"Location"])
-            coordinates : list[str] = location.split(',')
-            latitude : float = float(coordinates[0])
-            longitude : float = float(coordinates[1])
-            self.airport_longitudes.append(longitude)
-            self.airport_latitudes.append(latitude)
+    #extract coordinates of airports in a dataframe and store as appropriate, the quoted "lat, lon" location column is split for every row at once
+    def get_airport_coordinates(self,df : "pd.DataFrame"):
+        coordinates = df["Location"].fillna("").str.split(',',n=1,expand=True)
+        self.airport_latitudes.extend(coordinates[0].astype(float).tolist())
+        self.airport_longitudes.extend(coordinates[1].astype(float).tolist())
 
     #extract names,states,countries of airports in a dataframe and store as appropriate
     def get_airport_names(self,df):
-        num_airports = len(df)
-        for i in range(num_airports):
-            name : str = utility.convert_object_to_str(df.loc[i,"Name"])
-            state : str = utility.convert_object_to_str(df.loc[i,"State"])
-            country : str = utility.convert_object_to_str(df.loc[i,"Country"])
-            unique_name : tuple[str,str,str] = (name,state,country)
-            self.airport_names.append(name)
-            self.airport_states.append(state)
-            self.airport_countries.append(country)
-            self.airport_unique_names.append(unique_name)
-            index : int = len(self.airport_names)-1
-            self.airport_name_indices_dict[unique_name] = index
+        names : list[str] = df["Name"].fillna("").tolist()
+        states : list[str] = df["State"].fillna("").tolist()
+        countries : list[str] = df["Country"].fillna("").tolist()
+        unique_names : list[tuple[str,str,str]] = list(zip(names,states,countries))
+        first_index : int = len(self.airport_names)
+        self.airport_names.extend(names)
+        self.airport_states.extend(states)
+        self.airport_countries.extend(countries)
+        self.airport_unique_names.extend(unique_names)
+        self.airport_name_indices_dict.update(zip(unique_names,range(first_index,first_index+len(unique_names))))
     
     #import economic data about the airport's catchment zone
-    def get_airport_economics(self,df : pd.DataFrame):
-        num_airports = len(df)
-        for i in range(num_airports):
-            airport_population = float(df.loc[i,"Population (k)"])
-            airport_gdp_per_captia = float(df.loc[i,"GDP/head ($k)"])
-            self.airport_populations.append(airport_population)
-            self.airport_gdp_per_heads.append(airport_gdp_per_captia)      
+    def get_airport_economics(self,df : "pd.DataFrame"):
+        self.airport_populations.extend(df["Population (k)"].astype(float).tolist())
+        self.airport_gdp_per_heads.extend(df["GDP/head ($k)"].astype(float).tolist())
 
     #get the index of an airport from it's unique name
     def get_airport_index(self,unique_name : str) -> tuple[bool,int]:
@@ -174,8 +490,9 @@ class Network():
     def load_all_ferries(self,ferry_folder='ferry_csvs') -> None:
         self.create_ferry_variables() #create the variables which store ferry properties
         ferry_filepaths = utility.get_filepaths_in_folder(ferry_folder) #get every file in the ferry folder
-        for ferry_filepath in tqdm.tqdm(ferry_filepaths,desc="Loading Ferry Data",disable=self.error_logging==False): #load the ferries from every file
-            self.load_ferries(ferry_filepath)     
+        ferry_tables = self.read_csv_tables(ferry_filepaths,ferry_csv_dtypes)
+        for ferry_filepath,df in tqdm.tqdm(zip(ferry_filepaths,ferry_tables),total=len(ferry_filepaths),desc="Loading Ferry Data",disable=self.error_logging==False): #load the ferries from every file
+            self.load_ferries(ferry_filepath,df)
 
     #create the variables which store ferry properties
     def create_ferry_variables(self) -> None:
@@ -187,27 +504,23 @@ class Network():
         self.ferry_car_cost : list[float] = [] #cost ($) for a car to use the ferry
         self.ferry_pax_cost : list[float] = [] #cost ($) for single passengers (non-vehicle and bus) to use the ferry
         self.ferry_frequency : list[int] = [] #ferry trips per week
+        self.ferry_distance : list[float] = [] #distance sailed, km
 
     #load all the ferries in a CSV file
-    def load_ferries(self,ferry_filepath : str) -> None:
-        df = pd.read_csv(ferry_filepath)
-        num_ferries = len(df)
-        for i in range(num_ferries):
-            name : str = utility.convert_object_to_str(df.loc[i,"Ferry Name"])
-            transport_time : float = float(df.loc[i,"Transport Time"])
-            load_time_car : float = float(df.loc[i,"Car Load + Unload Time"])
-            load_time_pax : float = float(df.loc[i,"Pax Load Time"])
-            cost_car : float = float(df.loc[i,"Car Cost"])
-            pax_cost : float = float(df.loc[i,"Pax Cost"])
-            frequency : float = float(df.loc[i,"Frequency"])
-            self.ferry_names.append(name)
-            self.ferry_transport_time.append(transport_time)
-            self.ferry_load_time_car.append(load_time_car)
-            self.ferry_load_time_pax.append(load_time_pax)
-            self.ferry_car_cost.append(cost_car)
-            self.ferry_pax_cost.append(pax_cost)
-            self.ferry_frequency.append(frequency)
-            index = len(self.ferry_names)-1
+    def load_ferries(self,ferry_filepath : str,df : "pd.DataFrame" = None) -> None:
+        if df is None:
+            df = read_csv_table(ferry_filepath,ferry_csv_dtypes)
+        names : list[str] = df["Ferry Name"].fillna("").tolist()
+        first_index : int = len(self.ferry_names)
+        self.ferry_names.extend(names)
+        self.ferry_transport_time.extend(df["Transport Time"].astype(float).tolist())
+        self.ferry_load_time_car.extend(df["Car Load + Unload Time"].astype(float).tolist())
+        self.ferry_load_time_pax.extend(df["Pax Load Time"].astype(float).tolist())
+        self.ferry_car_cost.extend(df["Car Cost"].astype(float).tolist())
+        self.ferry_pax_cost.extend(df["Pax Cost"].astype(float).tolist())
+        self.ferry_frequency.extend(df["Frequency"].astype(float).tolist())
+        self.ferry_distance.extend(df["Distance (km)"].astype(float).tolist())
+        for index,name in enumerate(names,start=first_index):
             #check if ferry is unique
             if name in self.ferry_id_by_name_dict:
                 error_message = "Ferry name = " + name + " has already been used, ferry names must be unique"
@@ -219,8 +532,21 @@ class Network():
     def load_all_roads(self,roads_folder='road_csvs'):
         self.create_road_variables() #create the variables which store airport properties
         roads_filepaths = utility.get_filepaths_in_folder(roads_folder) #get every file in the roads folder
-        for roads_filepath in tqdm.tqdm(roads_filepaths,desc="Loading Road Network Data",disable=self.error_logging==False): #load the roads from every file
-            self.load_roads(roads_filepath)
+        road_tables = self.read_csv_tables(roads_filepaths,road_csv_dtypes)
+        for roads_filepath,df in tqdm.tqdm(zip(roads_filepaths,road_tables),total=len(roads_filepaths),desc="Loading Road Network Data",disable=self.error_logging==False): #load the roads from every file
+            self.load_roads(roads_filepath,df)
+        self.build_road_graph()
+
+    #build the compressed sparse row road graph used by routing and analysis code, once all roads are loaded
+    def build_road_graph(self) -> None:
+        num_roads = len(self.road_start_indices)
+        road_lists = [self.road_end_indices,self.road_distance,self.road_speed,self.road_time,self.road_has_ferry,self.road_ferry_index]
+        if any(len(road_list)!=num_roads for road_list in road_lists):
+            self.error_print("Road data is incomplete, the road graph has not been built")
+            self.road_graph = None
+        else:
+            self.road_hierarchy = None #built from the previous road graph, see build_road_hierarchy
+            self.road_graph = road_graph.Road_Graph(len(self.airport_names),self.road_start_indices,self.road_end_indices,self.road_distance,self.road_time,self.road_speed,self.road_has_ferry,self.road_ferry_index)
 
     #create the variables which store road properties
     def create_road_variables(self) -> None:
@@ -242,8 +568,9 @@ class Network():
         self.road_attached_nodes_dict : dict[tuple[str,str,str],list[tuple[int,int]]] = {} #dictionary allowing fast lookup of nodes (indice) and connecting road connected to a node recorded by unique name
         self.road_attached_nodes_dict_int : dict[int,list[tuple[int,int]]] = {}#as above, but with starting node and road recorded with index
 
-    def load_roads(self,filepath : str) -> None:
-        df = pd.read_csv(filepath)
+    def load_roads(self,filepath : str,df : "pd.DataFrame" = None) -> None:
+        if df is None:
+            df = read_csv_table(filepath,road_csv_dtypes)
         all_nodes_valid : bool = self.get_road_names(df)
         if not all_nodes_valid:
             self.error_print("Not all roads are valid airport pairs, terminating early")
@@ -256,108 +583,353 @@ class Network():
             else:
                 self.get_road_statistics(df)
 
+    #find the index of every (name,state,country) combination in the provided columns with a single join against the airport table, -1 where there is no such airport
+    def get_airport_indices_np(self,names : "pd.Series",states : "pd.Series",countries : "pd.Series") -> np.ndarray:
+        airports = pd.DataFrame({"name":self.airport_names,"state":self.airport_states,"country":self.airport_countries,"index":np.arange(len(self.airport_names))})
+        airports = airports.drop_duplicates(subset=["name","state","country"],keep="last") #the name dictionary keeps the last airport with a repeated unique name
+        query = pd.DataFrame({"name":names.to_numpy(dtype=object),"state":states.to_numpy(dtype=object),"country":countries.to_numpy(dtype=object)})
+        joined = query.merge(airports,how="left",on=["name","state","country"],sort=False)
+        indices : np.ndarray = joined["index"].fillna(-1).to_numpy(dtype=int)
+        return indices
+
     #extract names,states,countries of start and end nodes of roads in a dataframe and store as appropriate, return a boolean which will be false if not possible for all nodes
-    def get_road_names(self,df : pd.DataFrame) -> bool:
-        num_roads = len(df)
-        all_nodes_valid = True
-        for i in range(num_roads):
-            start_name : str = utility.convert_object_to_str(df.loc[i,"Start Node"])
-            start_state : str = utility.convert_object_to_str(df.loc[i,"Start State"])
-            start_country : str = utility.convert_object_to_str(df.loc[i,"Start Country"])
-            unique_name_start : tuple[str,str,str] = (start_name,start_state,start_country)
-            end_name : str = utility.convert_object_to_str(df.loc[i,"End Node"])
-            end_state : str = utility.convert_object_to_str(df.loc[i,"End State"])
-            end_country : str = utility.convert_object_to_str(df.loc[i,"End Country"])
-            unique_name_end : tuple[str,str,str] = (end_name,end_state,end_country)
-            nodes_valid = self.check_road_nodes_valid(unique_name_start,unique_name_end,i)
-            if not nodes_valid:
-                all_nodes_valid = False
+    def get_road_names(self,df : "pd.DataFrame") -> bool:
+        start_names = df["Start Node"].fillna("")
+        start_states = df["Start State"].fillna("")
+        start_countries = df["Start Country"].fillna("")
+        end_names = df["End Node"].fillna("")
+        end_states = df["End State"].fillna("")
+        end_countries = df["End Country"].fillna("")
+        start_indices = self.get_airport_indices_np(start_names,start_states,start_countries)
+        end_indices = self.get_airport_indices_np(end_names,end_states,end_countries)
+        same_nodes = ((start_names==end_names)&(start_states==end_states)&(start_countries==end_countries)).to_numpy()
+        valid = (start_indices>=0)&(end_indices>=0)&(~same_nodes)
+        unique_names_start : list[tuple[str,str,str]] = list(zip(start_names.tolist(),start_states.tolist(),start_countries.tolist()))
+        unique_names_end : list[tuple[str,str,str]] = list(zip(end_names.tolist(),end_states.tolist(),end_countries.tolist()))
+        for row in np.flatnonzero(~valid):
+            self.print_road_node_errors(unique_names_start[row],unique_names_end[row],start_indices[row]>=0,end_indices[row]>=0,int(row))
+        valid_rows = np.flatnonzero(valid)
+        self.add_roads([unique_names_start[row] for row in valid_rows],[unique_names_end[row] for row in valid_rows],start_indices[valid_rows],end_indices[valid_rows])
+        all_nodes_valid : bool = bool(valid.all())
         return all_nodes_valid
-    
-    #check if start and end nodes are both existing unique airports, if so add them to the relevant data structures
-    def check_road_nodes_valid(self,start_name : tuple[str,str,str],end_name : tuple[str,str,str],row : int) -> bool:
-        valid : bool = True
-        if (start_name not in self.airport_name_indices_dict):
-            self.error_print("Node = " + utility.unique_airport_name_to_str(start_name) + " is not a valid airport at row " + str(row+2))
-            valid = False
-        if (end_name not in self.airport_name_indices_dict):
-            self.error_print("Node = " + utility.get_filepaths_in_folderunique_airport_name_to_str(end_name) + " is not a valid airport at row " + str(row+2))
-            valid = False
+
+    #report why the start and end nodes of a road are not both existing unique airports
+    def print_road_node_errors(self,start_name : tuple[str,str,str],end_name : tuple[str,str,str],start_valid : bool,end_valid : bool,row : int) -> None:
+        if not start_valid:
+            self.error_print("Node = " + sim.unique_airport_name_to_str(start_name) + " is not a valid airport at row " + str(row+2))
+        if not end_valid:
+            self.error_print("Node = " + sim.unique_airport_name_to_str(end_name) + " is not a valid airport at row " + str(row+2))
         if (start_name==end_name):
-            self.error_print("Starting and Ending Nodes " + utility.unique_airport_name_to_str(start_name) + " and " + utility.unique_airport_name_to_str(end_name) + "the same at row " + str(row+2))
-            valid = False
-        if not valid:
-            return valid
-        else:
-            #look up the index of the start and end node
-            node_start_index : int = self.airport_name_indices_dict[start_name]
-            node_end_index : int = self.airport_name_indices_dict[end_name]
-            #create a unique name for the road in both start-end and end-start format, also store the related indices
-            road_name_forward : tuple[str,str,str,str,str,str] = (start_name[0],start_name[1],start_name[2],end_name[0],end_name[1],end_name[2])
-            road_name_reverse : tuple[str,str,str,str,str,str] = (end_name[0],end_name[1],end_name[2],start_name[0],start_name[1],start_name[2])
-            road_node_indices_forward : tuple[int,int] = (node_start_index,node_end_index)
-            road_node_indices_reverse : tuple[int,int] = (node_end_index,node_start_index)
-            #if start and end node airports are both valid and unique, store their detail in the road data structures
-            self.road_start_unique_name.append(start_name) 
-            self.road_end_unique_name.append(end_name)
-            self.road_start_indices.append(node_start_index)
-            self.road_end_indices.append(node_end_index)   
-            self.road_name_forward.append(road_name_forward) 
-            self.road_name_reverse.append(road_name_reverse) 
-            road_index : int = len(self.road_start_unique_name)-1
-            self.road_start_end_indices_dict[road_node_indices_forward] = road_index
-            self.road_end_start_indices_dict[road_node_indices_reverse] = road_index 
-            self.road_name_forward_indices_dict[road_name_forward] = road_index 
-            self.road_name_reverse_indices_dict[road_name_reverse] = road_index
-            #implement road network creation by name and index here
-            #starting at start node
+            self.error_print("Starting and Ending Nodes " + sim.unique_airport_name_to_str(start_name) + " and " + sim.unique_airport_name_to_str(end_name) + " the same at row " + str(row+2))
+
+    #add roads whose start and end nodes are both existing unique airports to the relevant data structures
+    def add_roads(self,start_names : list[tuple[str,str,str]],end_names : list[tuple[str,str,str]],node_start_indices : np.ndarray,node_end_indices : np.ndarray) -> None:
+        node_start_indices : list[int] = node_start_indices.tolist()
+        node_end_indices : list[int] = node_end_indices.tolist()
+        first_road_index : int = len(self.road_start_unique_name)
+        road_indices = range(first_road_index,first_road_index+len(start_names))
+        #create a unique name for the road in both start-end and end-start format, also store the related indices
+        road_names_forward : list[tuple[str,str,str,str,str,str]] = [start_name+end_name for start_name,end_name in zip(start_names,end_names)]
+        road_names_reverse : list[tuple[str,str,str,str,str,str]] = [end_name+start_name for start_name,end_name in zip(start_names,end_names)]
+        self.road_start_unique_name.extend(start_names)
+        self.road_end_unique_name.extend(end_names)
+        self.road_start_indices.extend(node_start_indices)
+        self.road_end_indices.extend(node_end_indices)
+        self.road_name_forward.extend(road_names_forward)
+        self.road_name_reverse.extend(road_names_reverse)
+        self.road_start_end_indices_dict.update(zip(zip(node_start_indices,node_end_indices),road_indices))
+        self.road_end_start_indices_dict.update(zip(zip(node_end_indices,node_start_indices),road_indices))
+        self.road_name_forward_indices_dict.update(zip(road_names_forward,road_indices))
+        self.road_name_reverse_indices_dict.update(zip(road_names_reverse,road_indices))
+        #road network creation by name and index, each road is attached to both its start and end node
+        for start_name,end_name,node_start_index,node_end_index,road_index in zip(start_names,end_names,node_start_indices,node_end_indices,road_indices):
             if node_start_index not in self.road_attached_nodes_dict_int:
                 self.road_attached_nodes_dict_int[node_start_index] = []
                 self.road_attached_nodes_dict[start_name] = []
             self.road_attached_nodes_dict_int[node_start_index].append((node_end_index,road_index))
             self.road_attached_nodes_dict[start_name].append((node_end_index,road_index))
-            #starting at end node             
             if node_end_index not in self.road_attached_nodes_dict_int:
                 self.road_attached_nodes_dict_int[node_end_index] = []
                 self.road_attached_nodes_dict[end_name] = []
             self.road_attached_nodes_dict_int[node_end_index].append((node_start_index,road_index))
-            self.road_attached_nodes_dict[end_name].append((node_start_index,road_index))  
-            return valid
+            self.road_attached_nodes_dict[end_name].append((node_start_index,road_index))
     
     #link roads with ferries
-    def link_roads_with_ferries(self,df : pd.DataFrame) -> bool:
-        num_roads = len(df)
-        all_ferries_valid = True
-        for i in range(num_roads):
-            has_ferry_str : str = utility.convert_object_to_str(df.loc[i,"Has Ferry"])
-            has_ferry : bool = has_ferry_str.lower()=="yes"
-            self.road_has_ferry.append(has_ferry)
-            if not has_ferry:
-                self.road_ferry_index.append([-1]) #default ferry index is -1
-            else:
-                ferry_names_raw = utility.convert_object_to_str(df.loc[i,"Ferries"])
-                ferry_names : list[str] = ferry_names_raw.split(',')
-                ferry_indices : list[int] = []
-                for ferry_name in ferry_names:
-                    if ferry_name in self.ferry_id_by_name_dict:
-                        ferry_indices.append(self.ferry_id_by_name_dict[ferry_name])
-                    else:
-                        message = "Ferry Name = " + ferry_name + " is not a recorded ferry"
-                        self.error_print(message)
-                        ferry_indices.append(-1) #default ferry index is -1
-                        all_ferries_valid = False
-            
-                self.road_ferry_index.append(ferry_indices)
-
+    def link_roads_with_ferries(self,df : "pd.DataFrame") -> bool:
+        has_ferry = (df["Has Ferry"].fillna("").str.lower()=="yes")
+        self.road_has_ferry.extend(has_ferry.tolist())
+        ferry_names = df.loc[has_ferry,"Ferries"].fillna("").str.split(',').explode() #one entry per (road,ferry) pair, indexed by road row
+        ferry_ids = ferry_names.map(self.ferry_id_by_name_dict)
+        invalid_ferries = ferry_ids.isna()
+        for ferry_name in ferry_names[invalid_ferries]:
+            message = "Ferry Name = " + ferry_name + " is not a recorded ferry"
+            self.error_print(message)
+        ferry_indices_by_row = ferry_ids.fillna(-1).astype(int).groupby(level=0,sort=False).agg(list) #default ferry index is -1
+        road_ferry_index : list[list[int]] = [[-1] for i in range(len(df))]
+        for row,ferry_indices in ferry_indices_by_row.items():
+            road_ferry_index[row] = ferry_indices
+        self.road_ferry_index.extend(road_ferry_index)
+        all_ferries_valid : bool = not bool(invalid_ferries.any())
         return all_ferries_valid
     
     #load other statistics relating to a road 
-    def get_road_statistics(self, df : pd.DataFrame) -> None:
-        num_roads = len(df)
-        for i in range(num_roads):
-            road_distance : float = float(df.loc[i,"Distance (km)"]) 
-            road_speed : float = float(df.loc[i,"Speed (km/h)"])
-            road_time : float = road_distance/road_speed
-            self.road_distance.append(road_distance)
-            self.road_speed.append(road_speed)
-            self.road_time.append(road_time)
+    def get_road_statistics(self, df : "pd.DataFrame") -> None:
+        road_distance = df["Distance (km)"].to_numpy(dtype=float)
+        road_speed = df["Speed (km/h)"].to_numpy(dtype=float)
+        road_time = road_distance/road_speed
+        self.road_distance.extend(road_distance.tolist())
+        self.road_speed.extend(road_speed.tolist())
+        self.road_time.extend(road_time.tolist())
+
+    #change the population (k) and/or GDP per head ($k) of airports, patching their GDP and recomputing only the demand rows that depend on them
+    #every origin normalises its demand over the GDP of all destinations it can reach, so any origin with a non zero distance metric to a changed airport is recomputed
+    #in sparse demand mode the whole sparse demand is rebuilt instead, see update_travel_demand
+    def update_airport_economics(self,indices,populations=None,gdp_per_heads=None) -> None:
+        indices = np.atleast_1d(np.asarray(indices,dtype=np.int64))
+        if populations is not None:
+            populations = np.broadcast_to(np.asarray(populations,dtype=float),indices.shape)
+            self.airport_populations_np[indices] = populations
+            for index,population in zip(indices.tolist(),populations.tolist()):
+                self.airport_populations[index] = population
+        if gdp_per_heads is not None:
+            gdp_per_heads = np.broadcast_to(np.asarray(gdp_per_heads,dtype=float),indices.shape)
+            self.airport_gdp_per_heads_np[indices] = gdp_per_heads
+            for index,gdp_per_head in zip(indices.tolist(),gdp_per_heads.tolist()):
+                self.airport_gdp_per_heads[index] = gdp_per_head
+        self.airport_gdps_np[indices] = np.multiply(self.airport_gdp_per_heads_np[indices],self.airport_populations_np[indices])
+        self.update_travel_demand(indices)
+
+    #move airports, patching only their rows and columns of the great circle distance and distance metric matrices before recomputing the dependent demand rows
+    def update_airport_locations(self,indices,latitudes,longitudes) -> None:
+        indices = np.atleast_1d(np.asarray(indices,dtype=np.int64))
+        latitudes = np.broadcast_to(np.asarray(latitudes,dtype=float),indices.shape)
+        longitudes = np.broadcast_to(np.asarray(longitudes,dtype=float),indices.shape)
+        self.airport_latitudes_np[indices] = latitudes
+        self.airport_longitudes_np[indices] = longitudes
+        for index,latitude,longitude in zip(indices.tolist(),latitudes.tolist(),longitudes.tolist()):
+            self.airport_latitudes[index] = latitude
+            self.airport_longitudes[index] = longitude
+        self.build_spatial_index()
+        if self.demand_mode=="sparse": #sparse mode keeps no distance matrices, the whole sparse demand is rebuilt from the coordinates
+            self.update_travel_demand(indices)
+            return
+        great_circle_terms = geo.Great_Circle_Terms(np.radians(self.airport_latitudes_np),np.radians(self.airport_longitudes_np))
+        for index in indices.tolist():
+            self.update_pairwise_row(index,great_circle_terms)
+        self.update_travel_demand(indices)
+
+    #add one airport, growing every per-airport array and N x N matrix by one and computing just the new row and column before recomputing the dependent demand rows
+    #the new airport has no roads, and the compiled network cache is not updated since the input csvs have not changed
+    #in sparse demand mode there are no N x N matrices and the whole sparse demand is rebuilt, see update_travel_demand
+    def add_airport(self,name : str,state : str,country : str,latitude : float,longitude : float,population : float,gdp_per_head : float) -> int:
+        unique_name : tuple[str,str,str] = (name,state,country)
+        index : int = len(self.airport_names)
+        self.airport_names.append(name)
+        self.airport_states.append(state)
+        self.airport_countries.append(country)
+        self.airport_unique_names.append(unique_name)
+        self.airport_name_indices_dict[unique_name] = index
+        self.airport_latitudes.append(float(latitude))
+        self.airport_longitudes.append(float(longitude))
+        self.airport_populations.append(float(population))
+        self.airport_gdp_per_heads.append(float(gdp_per_head))
+        self.store_coordinates_np()
+        self.store_economics_np()
+        self.calculate_economic_data()
+        self.build_road_graph()
+        if "road_travel_time_array" in vars(self): #the new airport cannot be reached by road
+            self.road_travel_time_array = add_unreachable_node(self.road_travel_time_array)
+            self.road_travel_distance_array = add_unreachable_node(self.road_travel_distance_array)
+        #stages a lazy setup has not run yet are left alone, they are computed at the new size when first read
+        #each stage reads the ones before it, so a computed stage always has its distance matrices computed too
+        self.od_query_cache.clear()
+        if self.demand_mode=="sparse":
+            if "sparse_demand" in vars(self):
+                self.update_travel_demand(np.array([index]))
+            return index
+        for name in ("great_circle_distance_array","road_distance_metric_array","all_demand_pairs_np"):
+            if name in vars(self):
+                setattr(self,name,self.add_pairwise_row_and_column(name))
+        if "great_circle_distance_array" in vars(self):
+            great_circle_terms = geo.Great_Circle_Terms(np.radians(self.airport_latitudes_np),np.radians(self.airport_longitudes_np))
+            self.update_pairwise_row(index,great_circle_terms,update_road_metric=True)
+        if "all_demand_pairs_np" in vars(self):
+            self.update_travel_demand(np.array([index]))
+        return index
+
+    #recompute row and column index of the great circle distance matrix and the distance metric derived from it (the road based metrics do not depend on location unless update_road_metric)
+    #entry (i,j) is computed with row min(i,j), exactly as get_great_circle_distance_matrix does, so the patched matrices equal a full rebuild
+    def update_pairwise_row(self,index : int,great_circle_terms : geo.Great_Circle_Terms,update_road_metric : bool = False) -> None:
+        num_airports = len(self.airport_latitudes_np)
+        distances = np.empty(num_airports)
+        distances[:index] = great_circle_terms.get_tile(slice(0,index),slice(index,index+1))[:,0]
+        distances[index] = 0
+        distances[index+1:] = great_circle_terms.get_tile(slice(index,index+1),slice(index+1,num_airports))[0]
+        self.set_pairwise_row(self.great_circle_distance_array,index,distances)
+        if (self.distance_metric_source=="great_circle" or update_road_metric) and "road_distance_metric_array" in vars(self): #not yet computed by a lazy setup
+            stored_distances = np.asarray(self.great_circle_distance_array[index])[np.newaxis,:] #as stored, so reduced precision storage gives the same metric as a rebuild
+            if isinstance(self.road_distance_metric_array,condensed_matrix.Condensed_Matrix):
+                stored_distances = stored_distances.astype(np.float64)
+            metric = self.get_distance_metric(stored_distances,slice(index,index+1))[0]
+            self.set_pairwise_row(self.road_distance_metric_array,index,metric)
+            flush_matrix(self.road_distance_metric_array)
+        flush_matrix(self.great_circle_distance_array)
+
+    #write values into row and column index of a symmetric pairwise matrix, dense or condensed
+    def set_pairwise_row(self,matrix,index : int,values : np.ndarray) -> None:
+        if isinstance(matrix,condensed_matrix.Condensed_Matrix):
+            matrix.set_row(index,values)
+        else:
+            matrix[index,:] = values
+            matrix[:,index] = values
+
+    #copy a pairwise matrix attribute into storage one row and column larger, the new row and column are left for the caller to fill
+    def add_pairwise_row_and_column(self,name : str):
+        matrix = getattr(self,name)
+        if isinstance(matrix,condensed_matrix.Condensed_Matrix):
+            return matrix.add_row_and_column(np.zeros(matrix.size+1))
+        size = matrix.shape[0]
+        if self.matrix_storage=="memmap": #the new file is written alongside the old one, which stays mapped until the copy is done
+            resized = self.create_pairwise_matrix(name + "_resized")
+            resized[:size,:size] = matrix
+            resized.flush()
+            os.replace(os.path.join(self.matrix_folder,name + "_resized.npy"),os.path.join(self.matrix_folder,name + ".npy"))
+        else:
+            resized = np.zeros((size+1,size+1),dtype=matrix.dtype)
+            resized[:size,:size] = matrix
+        return resized
+
+    #recompute the demand of every origin which depends on the changed airports, in bands, the distance matrices are reused as they are
+    #sparse demand mode is not updated incrementally, the whole top_k demand is rebuilt, as costly as setting it up again
+    #every reachable origin's kept destinations and residual depend on its total over all destinations, so almost every row changes anyway
+    def update_travel_demand(self,changed_indices : np.ndarray,block_rows : int = demand_block_rows) -> None:
+        self.od_query_cache.clear() #cached records may hold the old distances and demand
+        if self.demand_mode=="sparse":
+            self.calculate_sparse_travel_demand(self.demand_top_k,self.demand_share_threshold)
+            return
+        num_airports = len(self.airport_gdps_np)
+        metric_to_changed = np.asarray(self.road_distance_metric_array[np.arange(num_airports)[:,np.newaxis],changed_indices[np.newaxis,:]])
+        dependent = np.any(metric_to_changed!=0,axis=1)
+        dependent[changed_indices] = True
+        for row_start in range(0,num_airports,block_rows):
+            rows = slice(row_start,min(row_start+block_rows,num_airports))
+            if dependent[rows].any():
+                self.calculate_travel_demand_rows(rows,self.all_demand_pairs_np[rows])
+        flush_matrix(self.all_demand_pairs_np)
+
+    #rebuild the distance, metric and demand matrices from scratch for the current airports (in a copy of the network) and return how far the incrementally updated ones are from them
+    #every value is 0 when the incremental updates match a full rebuild exactly
+    def get_rebuild_differences(self) -> dict[str,float]:
+        rebuilt = copy.copy(self)
+        rebuilt.error_logging = False
+        rebuilt.profiler = rebuilt.profiler.__class__(enabled=False)
+        with tempfile.TemporaryDirectory() as matrix_folder:
+            rebuilt.matrix_folder = matrix_folder
+            if self.distance_metric_source!="great_circle":
+                rebuilt.build_road_graph()
+                rebuilt.calculate_road_travel()
+            if self.demand_mode=="sparse":
+                rebuilt.calculate_sparse_travel_demand(self.demand_top_k,self.demand_share_threshold)
+                differences = {"sparse_demand":float(np.abs(rebuilt.sparse_demand.to_dense()-self.sparse_demand.to_dense()).max(initial=0))}
+                return differences
+            rebuilt.calculate_great_circle_distances()
+            rebuilt.calculate_distance_metric()
+            rebuilt.calculate_travel_demand()
+            differences = {}
+            for name in ("great_circle_distance_array","road_distance_metric_array","all_demand_pairs_np"):
+                differences[name] = max((float(np.abs(rebuilt_rows-updated_rows).max(initial=0)) for (rows,rebuilt_rows),(rows,updated_rows) in zip(rebuilt.iterate_matrix_rows(name),self.iterate_matrix_rows(name))),default=0.0)
+            return differences
+
+    #resolve airports given as unique name tuples (name,state,country) or as indices into an index array, in bulk, -1 for unknown names and out of range indices
+    #a single unique name tuple or index gives a 1 element array
+    def get_airport_indices(self,airports) -> np.ndarray:
+        if isinstance(airports,tuple) and len(airports)==3 and all(isinstance(part,str) for part in airports):
+            airports = [airports]
+        if isinstance(airports,np.ndarray) and np.issubdtype(airports.dtype,np.integer):
+            indices = airports.astype(np.int64).ravel()
+        else:
+            airports = list(airports) if not np.isscalar(airports) else [airports]
+            get_index = self.airport_name_indices_dict.get
+            indices = np.fromiter((get_index(airport,-1) if isinstance(airport,tuple) else int(airport) for airport in airports),dtype=np.int64,count=len(airports))
+        indices = np.where((indices>=0)&(indices<len(self.airport_names)),indices,-1)
+        return indices
+
+    #distance, demand and road link records (od_query.od_record_dtype) for batches of origin-destination pairs, given as unique name tuples or indices and broadcast against each other
+    #pairs already queried are served from the least recently used cache, the rest are looked up together in one vectorised pass and added to it
+    def query_od_pairs(self,origins,destinations) -> np.ndarray:
+        origins,destinations = np.broadcast_arrays(self.get_airport_indices(origins),self.get_airport_indices(destinations))
+        if np.any(origins<0) or np.any(destinations<0):
+            self.error_print(str(int(np.sum((origins<0)|(destinations<0)))) + " queried pairs have an unknown origin or destination")
+        records = np.empty(len(origins),dtype=od_query.od_record_dtype)
+        missed = []
+        for position,key in enumerate(zip(origins.tolist(),destinations.tolist())):
+            record = self.od_query_cache.get(key)
+            if record is None:
+                missed.append(position)
+            else:
+                records[position] = record
+        if missed:
+            missed = np.array(missed,dtype=np.int64)
+            records[missed] = self.calculate_od_records(origins[missed],destinations[missed])
+            for position in missed.tolist():
+                record = records[position].copy()
+                if record["origin"]>=0 and record["destination"]>=0:
+                    self.od_query_cache.put((int(record["origin"]),int(record["destination"])),record)
+        return records
+
+    #look up the od records of index arrays of origins and destinations, without the cache
+    def calculate_od_records(self,origins : np.ndarray,destinations : np.ndarray) -> np.ndarray:
+        records = np.zeros(len(origins),dtype=od_query.od_record_dtype)
+        records["origin"] = origins
+        records["destination"] = destinations
+        for field in ("great_circle_distance","demand","road_distance","road_time","road_travel_distance","road_travel_time"):
+            records[field] = np.nan
+        records["road"] = -1
+        valid = (origins>=0)&(destinations>=0)
+        origins = origins[valid]
+        destinations = destinations[valid]
+        if self.demand_mode=="dense":
+            great_circle_distance = self.great_circle_distance_array[origins,destinations]
+        else: #sparse demand mode keeps no distance matrix
+            latitudes = np.radians(self.airport_latitudes_np)
+            longitudes = np.radians(self.airport_longitudes_np)
+            great_circle_distance = geo.get_haversine_distance(latitudes[origins],longitudes[origins],latitudes[destinations],longitudes[destinations])
+        records["great_circle_distance"][valid] = great_circle_distance
+        if self.demand_mode=="sparse":
+            records["demand"][valid] = self.sparse_demand.get_values(origins,destinations)
+        else:
+            records["demand"][valid] = self.all_demand_pairs_np[origins,destinations]
+        get_forward_road = self.road_start_end_indices_dict.get
+        get_reverse_road = self.road_end_start_indices_dict.get
+        roads = np.fromiter((get_forward_road(key,get_reverse_road(key,-1)) for key in zip(origins.tolist(),destinations.tolist())),dtype=np.int64,count=len(origins))
+        linked = roads>=0
+        road_distance = np.full(len(roads),np.nan)
+        road_time = np.full(len(roads),np.nan)
+        road_distance[linked] = np.asarray(self.road_distance,dtype=float)[roads[linked]]
+        road_time[linked] = np.asarray(self.road_time,dtype=float)[roads[linked]]
+        records["road"][valid] = roads
+        records["road_distance"][valid] = road_distance
+        records["road_time"][valid] = road_time
+        if "road_travel_time_array" in vars(self): #road travel is only reported once it has been calculated, it is too slow to calculate for a query
+            records["road_travel_distance"][valid] = self.road_travel_distance_array[origins,destinations]
+            records["road_travel_time"][valid] = self.road_travel_time_array[origins,destinations]
+        return records
+
+    #hit/miss statistics of the od query cache
+    def get_od_query_statistics(self) -> dict[str,float]:
+        return self.od_query_cache.get_statistics()
+
+    #write every origin-destination pair with demand (and its great circle distance) to disk, streamed in chunks so only one chunk of records is held at once
+    #file_format is "csv" for a csv file at path or "columns" for a folder of binary columns (od_export.read_od_columns), returns the number of records written
+    def export_od_pairs(self,path : str,file_format : str = "csv",min_demand : float = None,include_zero : bool = False,chunk_records : int = od_export.default_chunk_records) -> int:
+        if file_format=="csv":
+            return od_export.write_od_csv(self,path,chunk_records,min_demand,include_zero)
+        elif file_format=="columns":
+            return od_export.write_od_columns(self,path,chunk_records,min_demand,include_zero)
+        else:
+            raise ValueError("od export format " + str(file_format) + " is not one of " + str(od_export.od_export_formats))
+
+    #print an error message if we have error logging enabled
+    def error_print(self,message : str) -> None:
+        if self.error_logging:
+            print("ERROR : ",message)
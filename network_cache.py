@@ -0,0 +1,79 @@
+#external packages
+import os
+import shutil
+import hashlib
+import pickle
+import numpy as np
+
+#store a fully computed network on disk so later runs with identical inputs can skip loading and computation
+#each entry is a folder named by the input hash, holding one .npy file per numpy array on the network (memory mapped on load) and a pickle of all other attributes
+
+cache_format_version = 12 #increase whenever the layout of the cached network, or how any cached value is computed, changes so old entries stop matching
+tables_filename = "tables.pkl"
+arrays_foldername = "arrays"
+excluded_attributes = {"error_logging","use_network_cache","network_cache_folder","distance_metric_source","num_workers","profiler","demand_mode","demand_top_k","demand_share_threshold","matrix_storage","matrix_folder","matrix_dtype","parallel_setup","lazy_setup",
+                       "shared_matrices","airport_spatial_index","od_query_cache","road_hierarchy"} #runtime settings taken from the parent simulation, and structures rebuilt on load, never cached
+
+#hash the content of every file in the input folders together with the model constants
+def get_input_hash(folders : list[str],constants : dict[str,float]) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(("version=" + str(cache_format_version)).encode())
+    for folder in folders:
+        for filename in sorted(os.listdir(folder)):
+            filepath = os.path.join(folder,filename)
+            hasher.update(("file=" + filepath + "\n").encode())
+            with open(filepath,'rb') as file:
+                for chunk in iter(lambda: file.read(1<<20),b""):
+                    hasher.update(chunk)
+    for name in sorted(constants):
+        hasher.update(("constant=" + name + "=" + repr(constants[name]) + "\n").encode())
+    return hasher.hexdigest()
+
+#get the folder a cache entry is stored in
+def get_entry_folder(cache_folder : str,key : str) -> str:
+    return os.path.join(cache_folder,key)
+
+#check if there is a complete cache entry for the key
+def has_entry(cache_folder : str,key : str) -> bool:
+    return os.path.isfile(os.path.join(get_entry_folder(cache_folder,key),tables_filename))
+
+#save every numpy array and table of an object (normally a Network) under the key, replacing any older entries
+def save_entry(cache_folder : str,key : str,source : object) -> None:
+    entry_folder = get_entry_folder(cache_folder,key)
+    temporary_folder = entry_folder + ".tmp"
+    shutil.rmtree(temporary_folder,ignore_errors=True)
+    os.makedirs(os.path.join(temporary_folder,arrays_foldername))
+    tables = {}
+    for name,value in vars(source).items():
+        if name in excluded_attributes:
+            continue
+        if isinstance(value,np.ndarray):
+            np.save(os.path.join(temporary_folder,arrays_foldername,name + ".npy"),value,allow_pickle=False)
+        else:
+            tables[name] = value
+    #the tables file is written last, so an entry only counts as complete once everything else is on disk
+    with open(os.path.join(temporary_folder,tables_filename),'wb') as file:
+        pickle.dump(tables,file,protocol=pickle.HIGHEST_PROTOCOL)
+    remove_all_entries(cache_folder,keep=temporary_folder)
+    os.replace(temporary_folder,entry_folder)
+
+#load an entry onto an object (normally a Network), arrays are memory mapped copy-on-write so they can still be modified in memory without touching the file
+def load_entry(cache_folder : str,key : str,target : object) -> None:
+    entry_folder = get_entry_folder(cache_folder,key)
+    with open(os.path.join(entry_folder,tables_filename),'rb') as file:
+        tables = pickle.load(file)
+    for name,value in tables.items():
+        setattr(target,name,value)
+    arrays_folder = os.path.join(entry_folder,arrays_foldername)
+    for filename in os.listdir(arrays_folder):
+        name = os.path.splitext(filename)[0]
+        setattr(target,name,np.load(os.path.join(arrays_folder,filename),mmap_mode='c'))
+
+#delete every entry in the cache folder, except the folder keep if given
+def remove_all_entries(cache_folder : str,keep : str = None) -> None:
+    if not os.path.isdir(cache_folder):
+        return
+    for name in os.listdir(cache_folder):
+        path = os.path.join(cache_folder,name)
+        if os.path.isdir(path) and path!=keep:
+            shutil.rmtree(path,ignore_errors=True)
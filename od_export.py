@@ -0,0 +1,135 @@
+#external packages
+import os
+import json
+import numpy as np
+
+#other project files
+import lazy_import
+import geography as geo
+
+pd = lazy_import.Lazy_Module("pandas") #only needed for csv export
+
+#stream the origin-destination pairs of a network to disk, one band of origins at a time, so only one chunk of records (and one band of each N x N matrix) is ever in memory
+#iterate_od_chunks yields the chunks, write_od_csv writes them as csv with unique names and write_od_columns as a folder of binary columns with airport indices, the names being stored once
+
+default_chunk_records = 1000000 #records per chunk, about 24MB
+od_export_formats = ("csv","columns") #csv file, or folder of binary columns
+od_columns_format_version = 1
+od_columns_schema_filename = "schema.json"
+
+od_export_record_dtype = np.dtype([("origin",np.int32),("destination",np.int32),
+                                   ("great_circle_distance",np.float64), #km
+                                   ("demand",np.float64)]) #k pax/year from origin to destination
+
+#yield the origin-destination records of a network (od_export_record_dtype) in chunks of whole origins, at most chunk_records per chunk unless one origin alone has more
+#pairs with zero demand are skipped unless include_zero, and pairs below min_demand (k pax/year) if it is given, an airport is never paired with itself
+#in sparse demand mode only the kept pairs exist, so include_zero adds nothing there
+def iterate_od_chunks(network,chunk_records : int = default_chunk_records,min_demand : float = None,include_zero : bool = False):
+    if network.demand_mode=="sparse":
+        bands = iterate_sparse_bands(network,chunk_records)
+    else:
+        num_airports = len(network.airport_names)
+        bands = iterate_dense_bands(network,max(chunk_records//max(num_airports,1),1))
+    for origins,destinations,distances,demand in bands:
+        keep = origins!=destinations
+        if not include_zero:
+            keep &= demand!=0
+        if min_demand is not None:
+            keep &= demand>=min_demand
+        chunk = np.empty(int(np.count_nonzero(keep)),dtype=od_export_record_dtype)
+        chunk["origin"] = origins[keep]
+        chunk["destination"] = destinations[keep]
+        chunk["great_circle_distance"] = distances[keep]
+        chunk["demand"] = demand[keep]
+        if len(chunk)>0:
+            yield chunk
+
+#every pair of a band of origins from the N x N distance and demand matrices, as flat origin, destination, distance and demand arrays
+def iterate_dense_bands(network,block_rows : int):
+    num_airports = len(network.airport_names)
+    distance_bands = network.iterate_matrix_rows("great_circle_distance_array",block_rows)
+    demand_bands = network.iterate_matrix_rows("all_demand_pairs_np",block_rows)
+    for (rows,distance_band),(_,demand_band) in zip(distance_bands,demand_bands):
+        origins = np.repeat(np.arange(rows.start,rows.stop,dtype=np.int32),num_airports)
+        destinations = np.tile(np.arange(num_airports,dtype=np.int32),rows.stop-rows.start)
+        yield origins,destinations,distance_band.astype(np.float64).ravel(),demand_band.astype(np.float64).ravel()
+
+#the kept pairs of a band of origins from sparse demand, with their great circle distances calculated as query_od_pairs does, since there is no distance matrix
+#origins have different numbers of kept pairs, so bands are cut to hold at most chunk_records pairs (or one whole origin) rather than a fixed number of rows
+def iterate_sparse_bands(network,chunk_records : int):
+    sparse_demand = network.sparse_demand
+    latitudes = np.radians(network.airport_latitudes_np)
+    longitudes = np.radians(network.airport_longitudes_np)
+    row_start = 0
+    while row_start<sparse_demand.num_airports:
+        row_end = int(np.searchsorted(sparse_demand.indptr,sparse_demand.indptr[row_start]+chunk_records,side='right'))-1
+        row_end = min(max(row_end,row_start+1),sparse_demand.num_airports)
+        start = sparse_demand.indptr[row_start]
+        end = sparse_demand.indptr[row_end]
+        origins = np.repeat(np.arange(row_start,row_end,dtype=np.int32),np.diff(sparse_demand.indptr[row_start:row_end+1]))
+        destinations = sparse_demand.indices[start:end].astype(np.int32)
+        distances = geo.get_haversine_distance(latitudes[origins],longitudes[origins],latitudes[destinations],longitudes[destinations])
+        yield origins,destinations,distances,sparse_demand.data[start:end].astype(np.float64)
+        row_start = row_end
+
+#write the origin-destination records of a network to a csv file, one row per pair with the origin and destination unique names, returns the number of records written
+def write_od_csv(network,filepath : str,chunk_records : int = default_chunk_records,min_demand : float = None,include_zero : bool = False) -> int:
+    names = np.array(network.airport_names,dtype=object)
+    states = np.array(network.airport_states,dtype=object)
+    countries = np.array(network.airport_countries,dtype=object)
+    num_records = 0
+    temporary_filepath = filepath + ".tmp" #written whole then renamed, so a crash never leaves a partial export behind
+    with open(temporary_filepath,'w',newline='') as file:
+        header = True
+        for chunk in iterate_od_chunks(network,chunk_records,min_demand,include_zero):
+            df = pd.DataFrame({"Origin":names[chunk["origin"]],"Origin State":states[chunk["origin"]],"Origin Country":countries[chunk["origin"]],
+                               "Destination":names[chunk["destination"]],"Destination State":states[chunk["destination"]],"Destination Country":countries[chunk["destination"]],
+                               "Distance (km)":chunk["great_circle_distance"],"Demand (k pax/year)":chunk["demand"]})
+            df.to_csv(file,header=header,index=False)
+            header = False
+            num_records += len(chunk)
+        if header: #no records, still write the header so the file can be read back
+            pd.DataFrame(columns=["Origin","Origin State","Origin Country","Destination","Destination State","Destination Country","Distance (km)","Demand (k pax/year)"]).to_csv(file,index=False)
+    os.replace(temporary_filepath,filepath)
+    return num_records
+
+#write the origin-destination records of a network to a folder holding one raw little endian binary file per record field (<field>.bin) and a schema.json
+#the schema gives the field dtypes, the number of records and the unique name of every airport index, it is written last so a folder without one is incomplete
+#returns the number of records written, read the folder back with read_od_columns
+def write_od_columns(network,folder : str,chunk_records : int = default_chunk_records,min_demand : float = None,include_zero : bool = False) -> int:
+    os.makedirs(folder,exist_ok=True)
+    schema_filepath = os.path.join(folder,od_columns_schema_filename)
+    if os.path.isfile(schema_filepath): #the old export stops being readable before its columns are overwritten
+        os.remove(schema_filepath)
+    column_dtypes = {name:od_export_record_dtype[name].newbyteorder("<") for name in od_export_record_dtype.names}
+    files = {name:open(os.path.join(folder,name + ".bin"),'wb') for name in column_dtypes}
+    num_records = 0
+    try:
+        for chunk in iterate_od_chunks(network,chunk_records,min_demand,include_zero):
+            for name,file in files.items():
+                chunk[name].astype(column_dtypes[name]).tofile(file)
+            num_records += len(chunk)
+    finally:
+        for file in files.values():
+            file.close()
+    schema = {"version":od_columns_format_version,"num_records":num_records,"columns":{name:dtype.str for name,dtype in column_dtypes.items()},
+              "airports":[list(unique_name) for unique_name in network.airport_unique_names]}
+    with open(schema_filepath + ".tmp",'w') as file:
+        json.dump(schema,file)
+    os.replace(schema_filepath + ".tmp",schema_filepath)
+    return num_records
+
+#read a folder written by write_od_columns, returning each field as a read only memory mapped array and the unique name of every airport index
+def read_od_columns(folder : str) -> tuple[dict[str,np.ndarray],list[tuple[str,str,str]]]:
+    with open(os.path.join(folder,od_columns_schema_filename)) as file:
+        schema = json.load(file)
+    if schema["version"]!=od_columns_format_version:
+        raise ValueError("od export in " + folder + " has format version " + str(schema["version"]) + ", expected " + str(od_columns_format_version))
+    columns = {}
+    for name,dtype in schema["columns"].items():
+        if schema["num_records"]==0: #an empty file cannot be memory mapped
+            columns[name] = np.empty(0,dtype=np.dtype(dtype))
+        else:
+            columns[name] = np.memmap(os.path.join(folder,name + ".bin"),dtype=np.dtype(dtype),mode='r',shape=(schema["num_records"],))
+    airports = [tuple(unique_name) for unique_name in schema["airports"]]
+    return columns,airports
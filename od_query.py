@@ -0,0 +1,62 @@
+#external packages
+from collections import OrderedDict
+import numpy as np
+
+#batched origin-destination queries against a network, answered from a least recently used (LRU) cache of pair records where possible
+
+default_max_entries = 100000 #pairs kept in the cache, about 7MB of records
+
+#one record per origin-destination pair, origin/destination -1 (and every value NaN) where a name could not be resolved
+od_record_dtype = np.dtype([("origin",np.int64),("destination",np.int64),
+                            ("great_circle_distance",np.float64), #km
+                            ("demand",np.float64), #k pax/year from origin to destination, 0 for pairs dropped in sparse demand mode
+                            ("road",np.int64), #index of a road directly linking the pair (in either direction), -1 if there is none
+                            ("road_distance",np.float64), #km along that road, NaN if there is none
+                            ("road_time",np.float64), #hrs along that road, NaN if there is none
+                            ("road_travel_distance",np.float64), #km along the fastest road route, inf if unreachable, NaN if road travel has not been calculated
+                            ("road_travel_time",np.float64)]) #hrs along the fastest road route, inf if unreachable, NaN if road travel has not been calculated
+
+#least recently used cache of od records keyed by (origin,destination), holding at most max_entries records
+class OD_Query_Cache():
+    def __init__(self,max_entries : int = default_max_entries):
+        self.max_entries = max_entries
+        self.records : OrderedDict[tuple[int,int],np.void] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    #cached record of a pair, counting the hit or miss, None on a miss
+    def get(self,key : tuple[int,int]):
+        record = self.records.get(key)
+        if record is None:
+            self.misses += 1
+            return None
+        self.records.move_to_end(key)
+        self.hits += 1
+        return record
+
+    #store a record, evicting the least recently used ones beyond max_entries
+    def put(self,key : tuple[int,int],record : np.void) -> None:
+        if self.max_entries<=0:
+            return
+        self.records[key] = record
+        self.records.move_to_end(key)
+        while len(self.records)>self.max_entries:
+            self.records.popitem(last=False)
+            self.evictions += 1
+
+    #drop every record, eg when the network data changes, the statistics are kept
+    def clear(self) -> None:
+        self.records.clear()
+
+    #hit/miss statistics of the cache
+    def get_statistics(self) -> dict[str,float]:
+        lookups = self.hits+self.misses
+        return {"hits":self.hits,"misses":self.misses,"hit_rate":self.hits/lookups if lookups>0 else 0.0,"evictions":self.evictions,
+                "entries":len(self.records),"max_entries":self.max_entries,"bytes":len(self.records)*od_record_dtype.itemsize}
+
+    #reset the statistics
+    def reset_statistics(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
@@ -0,0 +1,126 @@
+#external packages
+import copy
+import os
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+#other project files
+import lazy_import
+import geography as geo
+
+tqdm = lazy_import.Lazy_Module("tqdm")
+
+#compute the N x N matrices of network setup in row bands across a process pool, every worker writing its bands straight into shared buffers
+#bands are cut and computed exactly as the serial code cuts and computes them, so the results are bit identical to a serial setup
+#matrices live in multiprocessing shared memory ("memory" storage) or their .npy files ("memmap" storage) while setup runs, and are copied back into ordinary arrays at the end
+
+shared_matrix_names = ("great_circle_distance_array","road_travel_time_array","road_travel_distance_array","road_distance_metric_array","all_demand_pairs_np") #every N x N matrix a band may read or write
+
+#the shared matrices of a network while its setup runs in parallel, used as a context manager around the setup stages
+#while active it is the network's shared_matrices attribute, which the matrix stages check to decide whether to run in parallel
+class Shared_Matrices():
+    def __init__(self,network,num_workers : int = None):
+        self.network = network
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+        self.memories : dict[str,shared_memory.SharedMemory] = {} #shared memory blocks by matrix name, memmap matrices need none
+        self.locations : dict[str,tuple] = {} #how a worker finds each matrix, ("shared_memory",block name,shape,dtype) or ("memmap",filepath)
+
+    def __enter__(self):
+        self.network.shared_matrices = self
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback) -> None:
+        self.network.shared_matrices = None
+        self.release()
+
+    #allocate an N x N matrix of the network's matrix_dtype which workers can write to, and set it as the network attribute name
+    def create(self,name : str) -> np.ndarray:
+        if self.network.matrix_storage=="memmap":
+            matrix = self.network.create_pairwise_matrix(name)
+            self.locations[name] = ("memmap",matrix.filename)
+        else:
+            num_airports = len(self.network.airport_latitudes_np)
+            matrix = self.create_shared_array(name,(num_airports,num_airports),np.dtype(self.network.matrix_dtype))
+        setattr(self.network,name,matrix)
+        return matrix
+
+    #copy an existing N x N matrix attribute into shared memory so workers can read it
+    def share(self,name : str) -> np.ndarray:
+        matrix = getattr(self.network,name)
+        shared = self.create_shared_array(name,matrix.shape,matrix.dtype)
+        shared[...] = matrix
+        setattr(self.network,name,shared)
+        return shared
+
+    #a numpy array over a new shared memory block
+    def create_shared_array(self,name : str,shape : tuple,dtype : np.dtype) -> np.ndarray:
+        memory = shared_memory.SharedMemory(create=True,size=max(int(np.prod(shape))*dtype.itemsize,1))
+        self.memories[name] = memory
+        self.locations[name] = ("shared_memory",memory.name,shape,dtype.str)
+        return np.ndarray(shape,dtype=dtype,buffer=memory.buf)
+
+    #copy every shared memory matrix back into an ordinary array (so it outlives the shared blocks) and free the blocks, memmap matrices are flushed
+    def release(self) -> None:
+        for name,location in self.locations.items():
+            matrix = getattr(self.network,name)
+            if location[0]=="memmap":
+                matrix.flush()
+            else:
+                setattr(self.network,name,np.array(matrix))
+        for memory in self.memories.values():
+            memory.close()
+            memory.unlink()
+        self.memories = {}
+        self.locations = {}
+
+    #run one matrix stage over every band of block_rows rows in the worker pool
+    def run_bands(self,stage : str,block_rows : int,description : str) -> None:
+        num_airports = len(self.network.airport_latitudes_np)
+        block_rows = max(block_rows,1)
+        tasks = [(stage,row_start,block_rows) for row_start in range(0,num_airports,block_rows)]
+        #workers get a copy of the network without its N x N matrices, which they attach to themselves
+        worker_network = copy.copy(self.network)
+        for name in shared_matrix_names:
+            if name in vars(worker_network): #not hasattr, which would compute a lazy stage
+                setattr(worker_network,name,None)
+        worker_network.profiler = None
+        worker_network.shared_matrices = None
+        worker_network.airport_spatial_index = None
+        with Pool(min(self.num_workers,max(len(tasks),1)),initializer=initialise_worker,initargs=(worker_network,self.locations)) as pool:
+            with tqdm.tqdm(total=len(tasks),desc=description,disable=self.network.error_logging==False) as progress:
+                for _ in pool.imap_unordered(calculate_band,tasks):
+                    progress.update(1)
+
+#network and matrices of a worker process, set once by the pool initializer
+worker_state = {}
+
+def initialise_worker(network,locations : dict[str,tuple]) -> None:
+    memories = []
+    for name,location in locations.items():
+        if location[0]=="memmap":
+            matrix = np.load(location[1],mmap_mode='r+')
+        else:
+            memory = shared_memory.SharedMemory(name=location[1])
+            memories.append(memory)
+            matrix = np.ndarray(location[2],dtype=np.dtype(location[3]),buffer=memory.buf)
+        setattr(network,name,matrix)
+    worker_state["memories"] = memories #keep the shared memory open for the life of the worker
+    worker_state["network"] = network
+    worker_state["great_circle_terms"] = geo.Great_Circle_Terms(np.radians(network.airport_latitudes_np),np.radians(network.airport_longitudes_np))
+
+#compute one band of a matrix stage inside a worker, with the same calls the serial stage makes for that band
+def calculate_band(task : tuple[str,int,int]) -> int:
+    stage,row_start,block_rows = task
+    network = worker_state["network"]
+    num_airports = len(network.airport_latitudes_np)
+    rows = slice(row_start,min(row_start+block_rows,num_airports))
+    if stage=="great_circle":
+        geo.fill_great_circle_tile_row(worker_state["great_circle_terms"],network.great_circle_distance_array,row_start,block_rows)
+    elif stage=="distance_metric":
+        network.road_distance_metric_array[rows] = network.get_distance_metric(network.great_circle_distance_array[rows],rows)
+    elif stage=="travel_demand":
+        network.calculate_travel_demand_rows(rows,network.all_demand_pairs_np[rows])
+    else:
+        raise ValueError("unknown matrix stage " + str(stage))
+    return rows.stop-rows.start
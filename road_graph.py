@@ -0,0 +1,50 @@
+#external packages
+import numpy as np
+
+#compressed sparse row (CSR) form of the road/ferry network, roads are undirected so every road appears once in the adjacency of each of its end nodes
+#node i's neighbours are neighbors[offsets[i]:offsets[i+1]], reached along the roads edges[offsets[i]:offsets[i+1]], in the same order as Network.road_attached_nodes_dict_int
+class Road_Graph():
+    def __init__(self,num_nodes : int,road_start_indices : list[int],road_end_indices : list[int],road_distance : list[float],road_time : list[float],road_speed : list[float],road_has_ferry : list[bool],road_ferry_index : list[list[int]]):
+        self.num_nodes : int = num_nodes #number of nodes (airports) in the graph, including those without roads
+        self.num_roads : int = len(road_start_indices)
+        #per road attributes
+        self.road_start : np.ndarray = np.asarray(road_start_indices,dtype=np.int64) #start node of each road
+        self.road_end : np.ndarray = np.asarray(road_end_indices,dtype=np.int64) #end node of each road
+        self.road_distance : np.ndarray = np.asarray(road_distance,dtype=float) #distance in km
+        self.road_time : np.ndarray = np.asarray(road_time,dtype=float) #default travel time, hrs
+        self.road_speed : np.ndarray = np.asarray(road_speed,dtype=float) #travel speed in km/h
+        self.road_has_ferry : np.ndarray = np.asarray(road_has_ferry,dtype=bool) #does the road have a ferry
+        #ferries used by each road, road r uses ferries road_ferry_ids[road_ferry_offsets[r]:road_ferry_offsets[r+1]], roads without a ferry have none (rather than the -1 placeholder)
+        ferry_counts = np.array([len(ferry_indices) if has_ferry else 0 for ferry_indices,has_ferry in zip(road_ferry_index,road_has_ferry)],dtype=np.int64)
+        self.road_ferry_offsets : np.ndarray = np.concatenate(([0],np.cumsum(ferry_counts)))
+        self.road_ferry_ids : np.ndarray = np.array([ferry for ferry_indices,has_ferry in zip(road_ferry_index,road_has_ferry) if has_ferry for ferry in ferry_indices],dtype=np.int64)
+        #adjacency, each road r contributes start->end then end->start, a stable sort by source node keeps that order within each node
+        sources = np.column_stack((self.road_start,self.road_end)).ravel()
+        targets = np.column_stack((self.road_end,self.road_start)).ravel()
+        roads = np.repeat(np.arange(self.num_roads,dtype=np.int64),2)
+        order = np.argsort(sources,kind='stable')
+        self.offsets : np.ndarray = np.concatenate(([0],np.cumsum(np.bincount(sources,minlength=num_nodes)))).astype(np.int64)
+        self.neighbors : np.ndarray = targets[order]
+        self.edges : np.ndarray = roads[order]
+
+    #nodes attached to a node and the roads reaching them
+    def get_neighbors(self,node : int) -> tuple[np.ndarray,np.ndarray]:
+        start = self.offsets[node]
+        end = self.offsets[node+1]
+        return self.neighbors[start:end],self.edges[start:end]
+
+    #number of roads attached to every node
+    def get_degrees(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    #source node of every entry in neighbors/edges, useful for building sparse matrices or edge lists
+    def get_edge_sources(self) -> np.ndarray:
+        return np.repeat(np.arange(self.num_nodes,dtype=np.int64),self.get_degrees())
+
+    #indices of the ferries used by a road (empty if it has none)
+    def get_road_ferries(self,road : int) -> np.ndarray:
+        return self.road_ferry_ids[self.road_ferry_offsets[road]:self.road_ferry_offsets[road+1]]
+
+    #the road from which each entry in road_ferry_ids comes
+    def get_ferry_roads(self) -> np.ndarray:
+        return np.repeat(np.arange(self.num_roads,dtype=np.int64),np.diff(self.road_ferry_offsets))
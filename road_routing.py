@@ -0,0 +1,121 @@
+#external packages
+import os
+import heapq
+import math
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+#other project files
+import lazy_import
+import road_graph
+
+tqdm = lazy_import.Lazy_Module("tqdm")
+
+hours_per_week = 168
+sources_per_task = 64 #single source searches handed to a worker at a time
+
+#travel time (hrs) to traverse each road, including the crossing, car loading/unloading and expected wait for any ferries on it
+#ferries run ferry_frequency times a week, so a driver arriving at a random time waits half the interval between sailings on average
+def get_road_travel_times(graph : road_graph.Road_Graph,ferry_transport_time : list[float],ferry_load_time_car : list[float],ferry_frequency : list[float]) -> np.ndarray:
+    ferry_time = np.asarray(ferry_transport_time,dtype=float)+np.asarray(ferry_load_time_car,dtype=float)+(hours_per_week/np.asarray(ferry_frequency,dtype=float))/2
+    road_times = graph.road_time.copy()
+    np.add.at(road_times,graph.get_ferry_roads(),ferry_time[graph.road_ferry_ids])
+    return road_times
+
+#distance (km) along each road, including the distance sailed by any ferries on it
+def get_road_travel_distances(graph : road_graph.Road_Graph,ferry_distance : list[float]) -> np.ndarray:
+    road_distances = graph.road_distance.copy()
+    np.add.at(road_distances,graph.get_ferry_roads(),np.asarray(ferry_distance,dtype=float)[graph.road_ferry_ids])
+    return road_distances
+
+#dijkstra search from one node, returning the shortest travel time to every node and the distance along that fastest route, inf where unreachable
+#the graph is passed as python lists since indexing them is much faster than indexing numpy arrays one element at a time
+def get_single_source_road_travel(source : int,offsets : list[int],neighbors : list[int],edges : list[int],edge_times : list[float],edge_distances : list[float]) -> tuple[list[float],list[float]]:
+    num_nodes = len(offsets)-1
+    times = [math.inf]*num_nodes
+    distances = [math.inf]*num_nodes
+    visited = bytearray(num_nodes)
+    times[source] = 0.0
+    distances[source] = 0.0
+    heap = [(0.0,source)]
+    while heap:
+        time,node = heapq.heappop(heap)
+        if visited[node]:
+            continue
+        visited[node] = 1
+        distance = distances[node]
+        for k in range(offsets[node],offsets[node+1]):
+            neighbor = neighbors[k]
+            road = edges[k]
+            new_time = time+edge_times[road]
+            if new_time<times[neighbor]:
+                times[neighbor] = new_time
+                distances[neighbor] = distance+edge_distances[road]
+                heapq.heappush(heap,(new_time,neighbor))
+    return times,distances
+
+#the graph and edge costs as the python lists get_single_source_road_travel searches
+def get_graph_lists(graph : road_graph.Road_Graph,edge_times : np.ndarray,edge_distances : np.ndarray) -> tuple:
+    return (graph.offsets.tolist(),graph.neighbors.tolist(),graph.edges.tolist(),np.asarray(edge_times,dtype=float).tolist(),np.asarray(edge_distances,dtype=float).tolist())
+
+#road travel time (hrs) and distance (km) from each of sources to every node, one row per source, the rows get_all_pairs_road_travel gives for them
+#used to stream road travel a band of origins at a time without building the N x N matrices
+def get_road_travel_rows(graph_lists : tuple,sources : range) -> tuple[np.ndarray,np.ndarray]:
+    num_nodes = len(graph_lists[0])-1
+    times = np.empty((len(sources),num_nodes),dtype=np.float64)
+    distances = np.empty((len(sources),num_nodes),dtype=np.float64)
+    for row,source in enumerate(sources):
+        times[row],distances[row] = get_single_source_road_travel(source,*graph_lists)
+    return times,distances
+
+#graph and output buffers of a worker process, set once by the pool initializer
+worker_state = {}
+
+def initialise_worker(time_memory_name : str,distance_memory_name : str,num_nodes : int,graph_lists : tuple) -> None:
+    time_memory = shared_memory.SharedMemory(name=time_memory_name)
+    distance_memory = shared_memory.SharedMemory(name=distance_memory_name)
+    worker_state["memory"] = (time_memory,distance_memory) #keep the shared memory open for the life of the worker
+    worker_state["times"] = np.ndarray((num_nodes,num_nodes),dtype=np.float64,buffer=time_memory.buf)
+    worker_state["distances"] = np.ndarray((num_nodes,num_nodes),dtype=np.float64,buffer=distance_memory.buf)
+    worker_state["graph_lists"] = graph_lists
+
+#run the searches for a block of sources inside a worker, writing the rows straight into the shared output matrices
+def calculate_source_block(sources : range) -> int:
+    for source in sources:
+        times,distances = get_single_source_road_travel(source,*worker_state["graph_lists"])
+        worker_state["times"][source] = times
+        worker_state["distances"][source] = distances
+    return len(sources)
+
+#shortest road travel time (hrs) and the distance (km) of that route between every pair of nodes, inf where no road route exists
+#searches are spread over num_workers processes (None uses every core) which write into shared memory, num_workers = 1 runs in this process
+def get_all_pairs_road_travel(graph : road_graph.Road_Graph,edge_times : np.ndarray,edge_distances : np.ndarray,num_workers : int = None,verbose=True) -> tuple[np.ndarray,np.ndarray]:
+    num_nodes = graph.num_nodes
+    graph_lists = get_graph_lists(graph,edge_times,edge_distances)
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    source_blocks = [range(start,min(start+sources_per_task,num_nodes)) for start in range(0,num_nodes,sources_per_task)]
+    if num_workers<=1 or len(source_blocks)<=1:
+        times = np.empty((num_nodes,num_nodes),dtype=np.float64)
+        distances = np.empty((num_nodes,num_nodes),dtype=np.float64)
+        for source in tqdm.tqdm(range(num_nodes),desc="Calculating Road Travel Times",disable=verbose==False):
+            times[source],distances[source] = get_single_source_road_travel(source,*graph_lists)
+        return times,distances
+    matrix_bytes = max(num_nodes*num_nodes*8,1)
+    time_memory = shared_memory.SharedMemory(create=True,size=matrix_bytes)
+    distance_memory = shared_memory.SharedMemory(create=True,size=matrix_bytes)
+    try:
+        with Pool(num_workers,initializer=initialise_worker,initargs=(time_memory.name,distance_memory.name,num_nodes,graph_lists)) as pool:
+            with tqdm.tqdm(total=num_nodes,desc="Calculating Road Travel Times",disable=verbose==False) as progress:
+                for num_done in pool.imap_unordered(calculate_source_block,source_blocks):
+                    progress.update(num_done)
+        #copy out of shared memory so the result outlives the shared buffers
+        times = np.ndarray((num_nodes,num_nodes),dtype=np.float64,buffer=time_memory.buf).copy()
+        distances = np.ndarray((num_nodes,num_nodes),dtype=np.float64,buffer=distance_memory.buf).copy()
+    finally:
+        time_memory.close()
+        time_memory.unlink()
+        distance_memory.close()
+        distance_memory.unlink()
+    return times,distances
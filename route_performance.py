@@ -0,0 +1,125 @@
+#external packages
+import os
+import hashlib
+import numpy as np
+
+#other project files
+import aircraft_simulation as air
+
+#block time, fuel and cost of a route for one aircraft type, precomputed once over a distance x payload grid and interpolated for every airport pair
+#each grid point is flown as a level cruise at cruise_altitude and cruise_speed, trimmed by Plane.calculate_level_flight_trim_array, and integrated backwards from landing so the fuel needed is found without iterating
+#climb and descent are not modelled, taxi_time is added on to every block time instead
+
+performance_cache_folder = "performance_cache"
+performance_format_version = 2 #increase whenever the mission model changes so old cached tables stop matching
+cruise_altitude = 11000 #m
+cruise_speed = 250 #m/s, true airspeed
+taxi_time = 0.5 #hrs added to every block for taxiing, takeoff and landing
+reserve_time = 0.75 #hrs of cruise fuel carried on top of the trip fuel, counts towards the fuel and takeoff mass limits but is not burnt
+fuel_price = 0.8 #$ per kg of fuel
+hourly_cost = 6000 #$ per block hour for crew, maintenance and ownership
+default_max_distance = 16000 #km
+default_distance_step = 100 #km
+default_payload_step = 5000 #kg
+num_segments = 64 #cruise segments integrated per route
+
+#combined thrust (N) holding an aircraft of total_mass (kg) in level cruise, and whether it can be held there
+def get_cruise_thrust(plane : air.Plane,total_mass : np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+    pitch,thrust,feasible,stall,over_max_thrust = plane.calculate_level_flight_trim_array(total_mass-plane.structure.empty_mass,cruise_speed,cruise_altitude)
+    return thrust,feasible
+
+#block time (hrs), trip fuel (kg) and trip cost ($) over a grid of route distances (km) x payloads (kg), for a plane whose fuel and takeoff mass are limited
+class Performance_Table():
+    def __init__(self,distances : np.ndarray,payloads : np.ndarray,block_time : np.ndarray,fuel : np.ndarray,cost : np.ndarray,feasible : np.ndarray):
+        self.distances = distances #km, evenly spaced
+        self.payloads = payloads #kg, evenly spaced
+        self.block_time = block_time #hrs, shape (distances,payloads)
+        self.fuel = fuel #kg burnt, shape (distances,payloads)
+        self.cost = cost #$, shape (distances,payloads)
+        self.feasible = feasible #False where the route cannot be flown (too heavy to take off, not enough fuel capacity, or not enough lift/thrust), the other tables are NaN there
+
+    #build the table by flying every grid point at once
+    @classmethod
+    def from_plane(cls,plane : air.Plane,max_fuel_mass : float,max_takeoff_mass : float,max_distance : float = default_max_distance,distance_step : float = default_distance_step,payload_step : float = default_payload_step):
+        distances = np.arange(0,max_distance+distance_step,distance_step,dtype=float)
+        payloads = np.arange(0,max_takeoff_mass-plane.structure.empty_mass+payload_step,payload_step,dtype=float)
+        segment_time = (distances[:,np.newaxis]*1000/num_segments)/cruise_speed #s
+        landing_mass = np.broadcast_to(plane.structure.empty_mass+payloads[np.newaxis,:],(len(distances),len(payloads)))
+        #reserve fuel is what would be burnt holding at landing mass for reserve_time
+        thrust,feasible = get_cruise_thrust(plane,landing_mass)
+        reserve_fuel = plane.calculate_fuel_flow_array(thrust,cruise_speed)*reserve_time*3600
+        mass = landing_mass+reserve_fuel
+        for segment in range(num_segments): #backwards from landing, each segment's burn is found at its midpoint mass
+            thrust,_ = get_cruise_thrust(plane,mass)
+            half_burn = plane.calculate_fuel_flow_array(thrust,cruise_speed)*segment_time/2
+            thrust,segment_feasible = get_cruise_thrust(plane,mass+half_burn)
+            burn = plane.calculate_fuel_flow_array(thrust,cruise_speed)*segment_time
+            feasible = feasible&segment_feasible
+            mass = mass+np.where(segment_feasible,burn,0) #stop adding to points which cannot be flown, so the remaining segments stay within the solver's bracket
+        fuel = mass-landing_mass-reserve_fuel
+        feasible = feasible&(mass<=max_takeoff_mass)&(fuel+reserve_fuel<=max_fuel_mass)
+        block_time = distances[:,np.newaxis]*1000/cruise_speed/3600+taxi_time+np.zeros_like(fuel)
+        cost = fuel*fuel_price+block_time*hourly_cost
+        block_time,fuel,cost = (np.where(feasible,table,np.nan) for table in (block_time,fuel,cost))
+        return cls(distances,payloads,block_time,fuel,cost,feasible)
+
+    #bilinearly interpolate block time, fuel and cost for arrays of distances (km) and payloads (kg), which are broadcast against each other
+    #eg a whole (N,N) great circle distance matrix with one payload, routes off the grid or next to an infeasible grid point give NaN
+    def get_performance(self,distances : np.ndarray,payloads) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+        distances,payloads = np.broadcast_arrays(np.asarray(distances,dtype=np.float64),np.asarray(payloads,dtype=np.float64))
+        distance_position = (distances-self.distances[0])/(self.distances[1]-self.distances[0])
+        payload_position = (payloads-self.payloads[0])/(self.payloads[1]-self.payloads[0]) if len(self.payloads)>1 else np.zeros_like(payloads)
+        outside = (distance_position<0)|(distance_position>len(self.distances)-1)|(payload_position<0)|(payload_position>len(self.payloads)-1)
+        distance_index = np.clip(np.floor(distance_position).astype(np.int64),0,max(len(self.distances)-2,0))
+        payload_index = np.clip(np.floor(payload_position).astype(np.int64),0,max(len(self.payloads)-2,0))
+        distance_fraction = distance_position-distance_index
+        payload_fraction = payload_position-payload_index
+        next_payload_index = np.minimum(payload_index+1,len(self.payloads)-1)
+        corners = ((distance_index,payload_index,(1-distance_fraction)*(1-payload_fraction)),(distance_index,next_payload_index,(1-distance_fraction)*payload_fraction),
+                   (distance_index+1,payload_index,distance_fraction*(1-payload_fraction)),(distance_index+1,next_payload_index,distance_fraction*payload_fraction))
+        results = []
+        for table in (self.block_time,self.fuel,self.cost):
+            value = np.zeros(distances.shape)
+            for corner_distance_index,corner_payload_index,weight in corners:
+                value += np.where(weight>0,weight*table[corner_distance_index,corner_payload_index],0) #corners with no weight are skipped, so an infeasible neighbour does not turn an exact grid point NaN
+            value[outside] = np.nan
+            results.append(value)
+        return tuple(results)
+
+    #write the table to a single .npz file
+    def save(self,filepath : str) -> None:
+        temporary_filepath = filepath + ".tmp.npz" #written whole then renamed, so a crash never leaves a partial table behind
+        np.savez(temporary_filepath,distances=self.distances,payloads=self.payloads,block_time=self.block_time,fuel=self.fuel,cost=self.cost,feasible=self.feasible)
+        os.replace(temporary_filepath,filepath)
+
+    #read a table written by save
+    @classmethod
+    def load(cls,filepath : str):
+        with np.load(filepath) as arrays:
+            return cls(arrays["distances"],arrays["payloads"],arrays["block_time"],arrays["fuel"],arrays["cost"],arrays["feasible"])
+
+#hash of everything a table depends on, the plane's parameters, its limits, the grid and the mission model
+def get_performance_table_key(plane : air.Plane,max_fuel_mass : float,max_takeoff_mass : float,max_distance : float,distance_step : float,payload_step : float) -> str:
+    hasher = hashlib.sha256()
+    constants = {"version":performance_format_version,"num_engines":plane.num_engines,"max_fuel_mass":max_fuel_mass,"max_takeoff_mass":max_takeoff_mass,
+                 "max_distance":max_distance,"distance_step":distance_step,"payload_step":payload_step,"cruise_altitude":cruise_altitude,"cruise_speed":cruise_speed,
+                 "taxi_time":taxi_time,"reserve_time":reserve_time,"fuel_price":fuel_price,"hourly_cost":hourly_cost,"num_segments":num_segments}
+    for prefix,parameters in (("structure.",vars(plane.structure)),("engine.",vars(plane.engine)),("",constants)):
+        for name in sorted(parameters):
+            hasher.update((prefix + name + "=" + repr(parameters[name]) + "\n").encode())
+    return hasher.hexdigest()
+
+#get the performance table for a plane, loading it from the cache folder if it has been built before and building (then saving) it otherwise
+def get_performance_table(plane : air.Plane,max_fuel_mass : float,max_takeoff_mass : float,max_distance : float = default_max_distance,distance_step : float = default_distance_step,payload_step : float = default_payload_step,cache_folder : str = performance_cache_folder) -> Performance_Table:
+    key = get_performance_table_key(plane,max_fuel_mass,max_takeoff_mass,max_distance,distance_step,payload_step)
+    filepath = os.path.join(cache_folder,key + ".npz")
+    if os.path.isfile(filepath):
+        return Performance_Table.load(filepath)
+    table = Performance_Table.from_plane(plane,max_fuel_mass,max_takeoff_mass,max_distance,distance_step,payload_step)
+    os.makedirs(cache_folder,exist_ok=True)
+    table.save(filepath)
+    return table
+
+#the B787 table, the first aircraft type with known limits
+def get_B787_performance_table(cache_folder : str = performance_cache_folder) -> Performance_Table:
+    return get_performance_table(air.B787,air.B787_max_fuel_mass,air.B787_max_takeoff_mass,cache_folder=cache_folder)
@@ -1,8 +1,9 @@
 #external packages
-import pandas as pd
 import numpy as np
 #other project files
 import network as net
+import instrumentation
+import flight_operations
 
 
 #simulation class to store the overall simulation
@@ -10,11 +11,43 @@ class Simulation():
     #create the simulation class
     def __init__(self) -> None:
         self.error_logging : bool = True
+        self.use_network_cache : bool = True #load the compiled network from disk when the input csvs are unchanged
+        self.network_cache_folder : str = 'network_cache' #folder the compiled network is stored in
+        self.distance_metric_source : str = "great_circle" #base travel demand on great circle distance, or "road_distance"/"road_time" for the fastest road route
+        self.num_workers : int = None #processes used by parallel network stages, None uses every core
+        self.lazy_setup : bool = False #only load the input csvs during setup, each N x N matrix (and travel demand) is computed the first time it is read
+        self.parallel_setup : bool = False #load the input csvs concurrently and compute the N x N matrices across num_workers processes, giving bit identical results
+        self.matrix_storage : str = "memory" #"memmap" backs the N x N matrices with files in matrix_folder, for networks larger than RAM, "condensed" stores only the upper triangle of the symmetric ones
+        self.matrix_folder : str = 'network_matrices' #folder memory mapped matrices are stored in
+        self.matrix_dtype : type = np.float64 #precision the N x N matrices are stored at, np.float32 halves their memory (combine with "condensed" storage for roughly a quarter)
+        self.demand_mode : str = "dense" #"dense" keeps every origin-destination pair, "sparse" only each origin's top destinations (for very large networks)
+        self.demand_top_k : int = 200 #destinations kept per origin in sparse demand mode
+        self.demand_share_threshold : float = None #smallest share of an origin's demand kept in sparse demand mode, None for no threshold
+        self.od_query_cache_size : int = 100000 #origin-destination pair records kept by the network's query cache
+        self.fleet_size : int = 100 #aircraft put on the busiest airport pairs when flight operations are set up
+        self.aircraft_seats : int = flight_operations.default_seats #seats per aircraft
+        self.turnaround_time : float = flight_operations.default_turnaround_time #hrs on the ground between an arrival and the next departure
+        self.flight_operations : flight_operations.Flight_Operations = None #discrete event simulation of the flights and ferry sailings, see setup_flight_operations
+        self.profiler : instrumentation.Profiler = instrumentation.Profiler(enabled=False) #per stage timing and memory of network setup, see enable_profiling
     
     #setup the network class
     def setup_transport_network(self) -> None:
-        self.network : net.Network = net.Network(self)
-        self.network.setup_network()
+        with self.profiler.stage("setup_transport_network"):
+            self.network : net.Network = net.Network(self)
+            self.network.setup_network()
+
+    #start the event simulation of flight operations at time 0, with fleet_size aircraft on the airport pairs with the most demand, the network must be set up first
+    def setup_flight_operations(self) -> None:
+        self.flight_operations = flight_operations.Flight_Operations(self.network,self.turnaround_time)
+        self.flight_operations.assign_fleet_by_demand(self.fleet_size,self.aircraft_seats)
+
+    #resume the event simulation of flight operations from a checkpoint written by Flight_Operations.save, the network must be set up first
+    def load_flight_operations(self,filepath : str) -> None:
+        self.flight_operations = flight_operations.Flight_Operations.load(self.network,filepath)
+
+    #record the wall time, cpu time, peak memory (if track_memory) and arrays created by each stage of network setup into self.profiler
+    def enable_profiling(self,track_memory : bool = True) -> None:
+        self.profiler = instrumentation.Profiler(enabled=True,track_memory=track_memory)
 
     #print an error message if we have error logging enabled
     def error_print(self,message : str) -> None:
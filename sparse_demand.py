@@ -0,0 +1,68 @@
+#external packages
+import numpy as np
+
+#origin-destination travel demand keeping only each origin's largest destinations, in compressed sparse row (CSR) form
+#origin i's kept destinations are indices[indptr[i]:indptr[i+1]] (in increasing order) with demand data[indptr[i]:indptr[i+1]]
+#the demand that was dropped from each origin is kept in residual, so row totals are still exact
+class Sparse_Demand():
+    def __init__(self,num_airports : int,indptr : np.ndarray,indices : np.ndarray,data : np.ndarray,residual : np.ndarray):
+        self.num_airports = num_airports
+        self.indptr : np.ndarray = indptr #row start offsets, length num_airports+1
+        self.indices : np.ndarray = indices #destination of each kept entry
+        self.data : np.ndarray = data #demand of each kept entry, k pax/year
+        self.residual : np.ndarray = residual #demand dropped from each origin, k pax/year
+        self.keys : np.ndarray = np.repeat(np.arange(num_airports,dtype=np.int64),np.diff(indptr))*num_airports+indices #origin*num_airports+destination of each kept entry, increasing, for get_values
+
+    #destinations and demand kept for one origin
+    def get_row(self,origin : int) -> tuple[np.ndarray,np.ndarray]:
+        start = self.indptr[origin]
+        end = self.indptr[origin+1]
+        return self.indices[start:end],self.data[start:end]
+
+    #demand between arrays of origins and destinations, 0 for pairs that were not kept, looked up with one search of the sorted entry keys
+    def get_values(self,origins : np.ndarray,destinations : np.ndarray) -> np.ndarray:
+        origins,destinations = np.broadcast_arrays(np.asarray(origins,dtype=np.int64),np.asarray(destinations,dtype=np.int64))
+        query_keys = origins*self.num_airports+destinations
+        if len(self.keys)==0:
+            return np.zeros(query_keys.shape)
+        found = np.minimum(np.searchsorted(self.keys,query_keys),len(self.keys)-1)
+        return np.where(self.keys[found]==query_keys,self.data[found],0.0)
+
+    #total demand from every origin, including the dropped residual
+    def get_row_totals(self) -> np.ndarray:
+        return np.add.reduceat(np.append(self.data,0),self.indptr[:-1])*(np.diff(self.indptr)>0)+self.residual
+
+    #fraction of all demand that was kept
+    def get_kept_fraction(self) -> float:
+        total = self.data.sum()+self.residual.sum()
+        return float(self.data.sum()/total) if total>0 else 1.0
+
+    #number of kept entries
+    def get_num_entries(self) -> int:
+        return int(self.indptr[-1])
+
+    #the kept demand as a dense (num_airports,num_airports) matrix, only for small networks and checking
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros((self.num_airports,self.num_airports))
+        rows = np.repeat(np.arange(self.num_airports),np.diff(self.indptr))
+        dense[rows,self.indices] = self.data
+        return dense
+
+#select the entries of a band of demand rows to keep, the top_k largest of each row (if top_k is given) that are also at least share_threshold of the row total (if given)
+#zero demand is never kept, returns the kept entries of the band in CSR form (counts per row, column indices, values) and the dropped demand of each row
+def select_band_entries(band : np.ndarray,top_k : int = None,share_threshold : float = None) -> tuple[np.ndarray,np.ndarray,np.ndarray,np.ndarray]:
+    num_rows,num_columns = band.shape
+    keep = band>0
+    if top_k is not None and top_k<num_columns:
+        top_columns = np.argpartition(band,num_columns-top_k,axis=1)[:,num_columns-top_k:]
+        in_top_k = np.zeros(band.shape,dtype=bool)
+        np.put_along_axis(in_top_k,top_columns,True,axis=1)
+        keep &= in_top_k
+    row_totals = band.sum(axis=1)
+    if share_threshold is not None:
+        keep &= band>=(share_threshold*row_totals)[:,np.newaxis]
+    kept_rows,kept_columns = np.nonzero(keep) #row major, so columns are increasing within each row
+    kept_values = band[kept_rows,kept_columns]
+    counts = np.bincount(kept_rows,minlength=num_rows)
+    residual = row_totals-np.bincount(kept_rows,weights=kept_values,minlength=num_rows)
+    return counts,kept_columns,kept_values,residual
@@ -0,0 +1,176 @@
+#external packages
+import numpy as np
+#internal packages
+import geography as geo
+
+default_leaf_size = 16 #points per leaf of the tree, leaves are scanned with vectorised distance calculations
+
+#convert latitudes and longitudes (degrees) into points on the unit sphere, straight line (chord) distance between them increases with great circle distance
+def get_unit_vectors(latitudes : np.ndarray,longitudes : np.ndarray) -> np.ndarray:
+    latitudes = np.radians(np.asarray(latitudes,dtype=float))
+    longitudes = np.radians(np.asarray(longitudes,dtype=float))
+    cos_latitudes = np.cos(latitudes)
+    return np.stack((cos_latitudes*np.cos(longitudes),cos_latitudes*np.sin(longitudes),np.sin(latitudes)),axis=-1)
+
+#chord length on the unit sphere equivalent to a great circle distance (km), distances past the antipode are capped at the diameter
+def get_chord_length(distance):
+    angle = np.minimum(np.asarray(distance,dtype=float)/geo.radius,np.pi)
+    return 2*np.sin(angle/2)
+
+#k-d tree over points on the unit sphere (3D coordinates), answering nearest k and radius queries in O(log N) each
+#the tree is stored as flat arrays, node n covers the points order[node_start[n]:node_end[n]] and has children node_left[n],node_right[n] (-1 for a leaf)
+#distances returned are great circle distances (km) from geography's haversine formula, the tree only uses chord lengths to decide which points to look at
+class Spherical_Index():
+    def __init__(self,latitudes : np.ndarray,longitudes : np.ndarray,leaf_size : int = default_leaf_size):
+        self.latitudes = np.asarray(latitudes,dtype=float) #degrees
+        self.longitudes = np.asarray(longitudes,dtype=float) #degrees
+        self.num_points = len(self.latitudes)
+        self.leaf_size = leaf_size
+        self.points = get_unit_vectors(self.latitudes,self.longitudes)
+        self.build_tree()
+
+    #split the points recursively at the median of the widest dimension until each node holds at most leaf_size points
+    def build_tree(self) -> None:
+        self.order = np.arange(self.num_points,dtype=np.int64)
+        node_start = [0]
+        node_end = [self.num_points]
+        node_left = [-1]
+        node_right = [-1]
+        pending = [0] if self.num_points>self.leaf_size else []
+        while pending:
+            node = pending.pop()
+            start = node_start[node]
+            end = node_end[node]
+            members = self.order[start:end]
+            points = self.points[members]
+            dimension = int(np.argmax(points.max(axis=0)-points.min(axis=0)))
+            middle = (end-start)//2
+            self.order[start:end] = members[np.argpartition(points[:,dimension],middle)]
+            for child_start,child_end in ((start,start+middle),(start+middle,end)):
+                child = len(node_start)
+                node_start.append(child_start)
+                node_end.append(child_end)
+                node_left.append(-1)
+                node_right.append(-1)
+                if child_end-child_start>self.leaf_size:
+                    pending.append(child)
+            node_left[node] = len(node_start)-2
+            node_right[node] = len(node_start)-1
+        self.node_start = np.array(node_start,dtype=np.int64)
+        self.node_end = np.array(node_end,dtype=np.int64)
+        self.node_left = np.array(node_left,dtype=np.int64)
+        self.node_right = np.array(node_right,dtype=np.int64)
+        #bounding box of every node, used to skip nodes which cannot hold a close enough point
+        self.node_lower = np.empty((len(node_start),3))
+        self.node_upper = np.empty((len(node_start),3))
+        for node in range(len(node_start)):
+            points = self.points[self.order[node_start[node]:node_end[node]]]
+            if len(points)>0:
+                self.node_lower[node] = points.min(axis=0)
+                self.node_upper[node] = points.max(axis=0)
+            else:
+                self.node_lower[node] = np.inf
+                self.node_upper[node] = -np.inf
+        self.ordered_points = self.points[self.order]
+
+    #smallest squared chord length from a point to anything inside a node's bounding box
+    def get_node_distance_squared(self,point : np.ndarray,node : int) -> float:
+        gap = np.maximum(np.maximum(self.node_lower[node]-point,point-self.node_upper[node]),0)
+        return float(gap@gap)
+
+    #squared chord lengths from a point to every point of a leaf, with the leaf's positions in order
+    def get_leaf_distances_squared(self,point : np.ndarray,node : int) -> tuple[np.ndarray,np.ndarray]:
+        positions = np.arange(self.node_start[node],self.node_end[node])
+        difference = self.ordered_points[positions]-point
+        return positions,np.einsum('ij,ij->i',difference,difference)
+
+    #positions (in order) of the k points closest to one point, closest first
+    def get_nearest_positions(self,point : np.ndarray,k : int) -> np.ndarray:
+        if k<=0:
+            return np.empty(0,dtype=np.int64)
+        best_positions = np.empty(0,dtype=np.int64)
+        best_distances = np.empty(0)
+        worst = np.inf #squared chord length of the kth best point so far
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self.get_node_distance_squared(point,node)>worst:
+                continue
+            if self.node_left[node]<0:
+                positions,distances = self.get_leaf_distances_squared(point,node)
+                best_positions = np.concatenate((best_positions,positions))
+                best_distances = np.concatenate((best_distances,distances))
+                if len(best_distances)>k:
+                    keep = np.argpartition(best_distances,k-1)[:k]
+                    best_positions = best_positions[keep]
+                    best_distances = best_distances[keep]
+                if len(best_distances)==k:
+                    worst = best_distances.max()
+                continue
+            #visit the nearer child first so the kth best distance shrinks sooner
+            left = self.node_left[node]
+            right = self.node_right[node]
+            if self.get_node_distance_squared(point,left)<self.get_node_distance_squared(point,right):
+                stack.extend((right,left))
+            else:
+                stack.extend((left,right))
+        return best_positions[np.argsort(best_distances,kind='stable')]
+
+    #positions (in order) of every point within a squared chord length of one point
+    def get_radius_positions(self,point : np.ndarray,max_distance_squared : float) -> np.ndarray:
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self.get_node_distance_squared(point,node)>max_distance_squared:
+                continue
+            if self.node_left[node]<0:
+                positions,distances = self.get_leaf_distances_squared(point,node)
+                found.append(positions[distances<=max_distance_squared])
+            else:
+                stack.extend((self.node_left[node],self.node_right[node]))
+        return np.concatenate(found) if found else np.empty(0,dtype=np.int64)
+
+    #great circle distance (km) from one point (degrees) to indexed points
+    def get_distances(self,latitude : float,longitude : float,indices : np.ndarray) -> np.ndarray:
+        return geo.get_haversine_distance(np.radians(latitude),np.radians(longitude),np.radians(self.latitudes[indices]),np.radians(self.longitudes[indices]))
+
+    #the k nearest indexed points to each query point (degrees), as (Q,k) arrays of indices and great circle distances (km), closest first
+    #k is capped at the number of indexed points
+    def query_nearest(self,latitudes,longitudes,k : int = 1) -> tuple[np.ndarray,np.ndarray]:
+        latitudes = np.atleast_1d(np.asarray(latitudes,dtype=float))
+        longitudes = np.atleast_1d(np.asarray(longitudes,dtype=float))
+        k = min(k,self.num_points)
+        query_points = get_unit_vectors(latitudes,longitudes)
+        indices = np.empty((len(query_points),k),dtype=np.int64)
+        distances = np.empty((len(query_points),k))
+        for query,point in enumerate(query_points):
+            nearest = self.order[self.get_nearest_positions(point,k)]
+            query_distances = self.get_distances(latitudes[query],longitudes[query],nearest)
+            ranking = np.argsort(query_distances,kind='stable') #chord and haversine agree on order up to rounding
+            indices[query] = nearest[ranking]
+            distances[query] = query_distances[ranking]
+        return indices,distances
+
+    #every indexed point within radius (km) of each query point (degrees), in compressed sparse row form like Sparse_Demand
+    #query q's matches are indices[indptr[q]:indptr[q+1]] with great circle distances distances[indptr[q]:indptr[q+1]], closest first
+    def query_radius(self,latitudes,longitudes,radius : float) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+        latitudes = np.atleast_1d(np.asarray(latitudes,dtype=float))
+        longitudes = np.atleast_1d(np.asarray(longitudes,dtype=float))
+        query_points = get_unit_vectors(latitudes,longitudes)
+        #search slightly wider than the radius in chord terms, the haversine distance then decides exactly which points are inside
+        max_distance_squared = (get_chord_length(radius)*(1+1e-9)+1e-12)**2
+        indptr = np.zeros(len(query_points)+1,dtype=np.int64)
+        found_indices = []
+        found_distances = []
+        for query,point in enumerate(query_points):
+            candidates = self.order[self.get_radius_positions(point,max_distance_squared)]
+            query_distances = self.get_distances(latitudes[query],longitudes[query],candidates)
+            inside = query_distances<=radius
+            ranking = np.argsort(query_distances[inside],kind='stable')
+            found_indices.append(candidates[inside][ranking])
+            found_distances.append(query_distances[inside][ranking])
+            indptr[query+1] = indptr[query]+len(ranking)
+        indices = np.concatenate(found_indices) if found_indices else np.empty(0,dtype=np.int64)
+        distances = np.concatenate(found_distances) if found_distances else np.empty(0)
+        return indptr,indices,distances
@@ -0,0 +1,113 @@
+#external packages
+import os
+import heapq
+import numpy as np
+import pytest
+
+#other project files
+import simulation
+import flight_operations as fo
+
+#the batched engine must give exactly the results of popping its event keys one at a time from a heap
+
+@pytest.fixture(scope="module")
+def network():
+    working_directory = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) #the input csv folders are relative to the project
+    try:
+        sim = simulation.Simulation()
+        sim.error_logging = False
+        sim.use_network_cache = False
+        sim.setup_transport_network()
+    finally:
+        os.chdir(working_directory)
+    return sim.network
+
+#process the events of operations one by one in key order up to and including end_time (s), the reference for run_until
+def run_one_by_one(operations : fo.Flight_Operations,end_time : int) -> None:
+    events = operations.events.tolist()
+    heapq.heapify(events)
+    turnaround_seconds = operations.get_turnaround_seconds()
+    while events and events[0]>>fo.time_shift<=end_time:
+        key = heapq.heappop(events)
+        time = key>>fo.time_shift
+        kind = (key>>fo.entity_bits)&fo.kind_mask
+        entity = key&fo.entity_mask
+        operations.event_counts[kind] += 1
+        if kind==fo.departure_event:
+            route = operations.aircraft_route[entity]
+            operations.aircraft_load[entity] = operations.board_passengers(np.array([route]),np.array([time]),operations.aircraft_seats[entity:entity+1])[0]
+            operations.aircraft_state[entity] = fo.airborne_state
+            heapq.heappush(events,int(fo.get_event_key(time+operations.route_block_time[route],fo.arrival_event,entity)))
+        elif kind==fo.arrival_event:
+            route = operations.aircraft_route[entity]
+            operations.route_carried[route] += operations.aircraft_load[entity]
+            operations.aircraft_passengers[entity] += operations.aircraft_load[entity]
+            operations.aircraft_load[entity] = 0
+            operations.aircraft_flights[entity] += 1
+            operations.aircraft_block_time[entity] += operations.route_block_time[route]
+            operations.aircraft_state[entity] = fo.on_ground_state
+            heapq.heappush(events,int(fo.get_event_key(time+turnaround_seconds,fo.turnaround_event,entity)))
+        elif kind==fo.turnaround_event:
+            operations.aircraft_route[entity] = operations.route_reverse[operations.aircraft_route[entity]]
+            heapq.heappush(events,int(fo.get_event_key(time,fo.departure_event,entity)))
+        else:
+            operations.ferry_sailings[entity] += 1
+            heapq.heappush(events,int(fo.get_event_key(time+operations.ferry_interval[entity],fo.ferry_sailing_event,entity)))
+    operations.events = np.sort(np.array(events,dtype=np.int64))
+    operations.time = max(operations.time,end_time)
+
+def assert_same_state(batched : fo.Flight_Operations,reference : fo.Flight_Operations) -> None:
+    for name in fo.route_columns+fo.aircraft_columns+fo.ferry_columns+("event_counts","events"):
+        assert np.array_equal(getattr(batched,name),getattr(reference,name)),name
+
+#an aircraft finishing its turnaround onto a route in the same second another aircraft's queued departure on that route is popped
+#the queued departure (kind 0) comes before the turnaround (kind 2), so it boards first even though its aircraft has the larger id
+def test_queued_departure_boards_before_turnaround_departure(network):
+    engines = []
+    for run in ("batched","reference"):
+        operations = fo.Flight_Operations(network,turnaround_time=1.0)
+        operations.add_aircraft(1,0,seats=1000) #id 0, turns around onto 0->1
+        turnaround_end = int(operations.route_block_time[0])+operations.get_turnaround_seconds()
+        operations.add_aircraft(0,1,seats=1000,departure_times=turnaround_end/fo.seconds_per_hour) #id 1, departs 0->1 at the same second
+        if run=="batched":
+            operations.run_until(turnaround_end)
+        else:
+            run_one_by_one(operations,turnaround_end)
+        engines.append(operations)
+    batched,reference = engines
+    assert reference.aircraft_load[1]>reference.aircraft_load[0]
+    assert_same_state(batched,reference)
+
+#shared routes, staggered and simultaneous departures, with and without turnaround time, over several runs
+@pytest.mark.parametrize("turnaround_time",[1.0,0.0])
+def test_batched_matches_one_by_one(network,turnaround_time):
+    engines = []
+    for run in ("batched","reference"):
+        rng = np.random.default_rng(0)
+        num_airports = len(network.airport_names)
+        operations = fo.Flight_Operations(network,turnaround_time)
+        operations.assign_fleet_by_demand(20)
+        operations.add_aircraft(rng.integers(0,num_airports,30),rng.integers(0,num_airports,30),seats=rng.integers(50,400,30),departure_times=rng.integers(0,4,30)*0.5)
+        operations.add_aircraft([0,0,0,1],[1,1,1,0],seats=[100,150,200,50])
+        for end_time in (50*fo.seconds_per_hour,300*fo.seconds_per_hour):
+            if run=="batched":
+                operations.run_until(end_time)
+            else:
+                run_one_by_one(operations,end_time)
+        engines.append(operations)
+    assert_same_state(*engines)
+
+#a run saved part way and resumed ends in the same state as one run straight through
+def test_checkpoint_resume(network,tmp_path):
+    straight = fo.Flight_Operations(network)
+    straight.assign_fleet_by_demand(30)
+    straight.run(240)
+    resumed = fo.Flight_Operations(network)
+    resumed.assign_fleet_by_demand(30)
+    resumed.run(100)
+    resumed.save(str(tmp_path/"operations.npz"))
+    resumed = fo.Flight_Operations.load(network,str(tmp_path/"operations.npz"))
+    resumed.run(140)
+    assert_same_state(resumed,straight)
+    assert resumed.time==straight.time
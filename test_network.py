@@ -0,0 +1,53 @@
+#external packages
+import os
+import numpy as np
+import pytest
+
+#other project files
+import simulation
+
+pairwise_matrices = ("great_circle_distance_array","road_distance_metric_array","all_demand_pairs_np")
+new_airport = ("X","Y","Z",-30.0,140.0,1e5,5e4)
+
+#a network set up from the bundled csvs without the compiled network cache, so a lazy setup really leaves its matrix stages to first use
+def setup_network(lazy_setup : bool,**settings):
+    working_directory = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) #the input csv folders are relative to the project
+    try:
+        sim = simulation.Simulation()
+        sim.error_logging = False
+        sim.use_network_cache = False
+        sim.lazy_setup = lazy_setup
+        for name,value in settings.items():
+            setattr(sim,name,value)
+        sim.setup_transport_network()
+    finally:
+        os.chdir(working_directory)
+    return sim.network
+
+#adding an airport to a lazy network, with none, some or all of its matrix stages computed, gives the matrices of adding it to an eager network and of a full rebuild
+@pytest.mark.parametrize("computed_before",[(),("great_circle_distance_array",),pairwise_matrices])
+def test_lazy_add_airport_matches_rebuild(computed_before):
+    eager = setup_network(False)
+    eager.add_airport(*new_airport)
+    assert all(difference==0 for difference in eager.get_rebuild_differences().values())
+    lazy = setup_network(True)
+    for name in computed_before:
+        getattr(lazy,name)
+    index = lazy.add_airport(*new_airport)
+    assert index==len(eager.airport_names)-1
+    for name in pairwise_matrices:
+        assert np.array_equal(np.asarray(getattr(lazy,name)),np.asarray(getattr(eager,name))),name
+
+#sparse demand with a road based metric streams road travel band by band, never building the N x N road travel matrices
+#the result is exactly that of reading the rows from the road travel matrices, and keeping every pair gives the dense demand (up to summation order)
+@pytest.mark.parametrize("distance_metric_source",["road_time","road_distance"])
+def test_sparse_road_metric_is_streamed(distance_metric_source):
+    sparse = setup_network(False,distance_metric_source=distance_metric_source,demand_mode="sparse",demand_top_k=None)
+    assert "road_travel_time_array" not in vars(sparse) and "road_travel_distance_array" not in vars(sparse)
+    streamed = sparse.sparse_demand.to_dense()
+    sparse.calculate_road_travel()
+    sparse.calculate_sparse_travel_demand(None,None)
+    assert np.array_equal(streamed,sparse.sparse_demand.to_dense())
+    dense = setup_network(False,distance_metric_source=distance_metric_source)
+    assert np.allclose(streamed,np.asarray(dense.all_demand_pairs_np),rtol=1e-12,atol=0)
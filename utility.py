@@ -1,6 +1,9 @@
 #external packages
 import os
-import pandas as pd
+#other project files
+import lazy_import
+
+pd = lazy_import.Lazy_Module("pandas")
 
 
 def display_matrix_data(data):